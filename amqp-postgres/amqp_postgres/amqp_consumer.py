@@ -40,16 +40,26 @@ logger = logging.getLogger(__name__)
 
 
 class AMQPLogsEventsConsumer(object):
-
-    def __init__(self, message_processor):
+    """Consume logs and events, and pass them to the message processor.
+
+    :param message_processor: callable that stores the message; it is
+                              responsible for acking the message afterwards
+    :param prefetch_count: maximum number of unacked messages; rabbitmq
+                           stops delivering when the processor falls behind
+                           by this much
+    """
+    def __init__(self, message_processor, prefetch_count=None):
         self.queue = 'cloudify-logs-events'
         self._message_processor = message_processor
+        self._prefetch_count = prefetch_count
 
         # This is here because AMQPConnection expects it
         self.routing_key = ''
 
     def register(self, connection, channel):
         channel.confirm_delivery()
+        if self._prefetch_count:
+            channel.basic_qos(prefetch_count=self._prefetch_count)
         channel.queue_declare(queue=self.queue,
                               durable=True,
                               auto_delete=False)
@@ -72,6 +82,9 @@ class AMQPLogsEventsConsumer(object):
         except Exception as e:
             logger.warn('Failed message processing: %s', e)
             logger.debug('Message was: %s', body)
+            # the message won't be stored, so it must not keep taking up
+            # a prefetch slot
+            channel.basic_nack(method.delivery_tag, requeue=False)
 
     def _bind_queue_to_exchange(self,
                                 channel,
@@ -22,7 +22,12 @@ from cloudify.amqp_client import get_client
 from manager_rest import config
 
 from .amqp_consumer import AMQPLogsEventsConsumer, AckingAMQPConnection
-from .postgres_publisher import DBLogEventPublisher
+from .postgres_publisher import (
+    DBLogEventPublisherPool,
+    EXECUTIONS_CACHE_SIZE,
+    EXECUTIONS_CACHE_TTL,
+    MAX_QUEUE_SIZE,
+)
 
 logger = logging.getLogger(__name__)
 BROKER_PORT_SSL = 5671
@@ -32,7 +37,8 @@ DEFAULT_LOG_PATH = '/var/log/cloudify/amqp-postgres/amqp_postgres.log'
 CONFIG_PATH = '/opt/manager/cloudify-rest.conf'
 
 
-def _create_connections():
+def _create_connections(workers=1, prefetch_count=MAX_QUEUE_SIZE,
+                        **publisher_kwargs):
     acks_queue = queue.Queue()
     cfy_config = config.instance
     port = BROKER_PORT_SSL if cfy_config.amqp_ca_path else BROKER_PORT_NO_SSL
@@ -47,9 +53,14 @@ def _create_connections():
         cls=AckingAMQPConnection
     )
     amqp_client.acks_queue = acks_queue
-    db_publisher = DBLogEventPublisher(config.instance, amqp_client)
+    db_publisher = DBLogEventPublisherPool(
+        config.instance, amqp_client,
+        workers=workers,
+        max_queue_size=prefetch_count,
+        **publisher_kwargs)
     amqp_consumer = AMQPLogsEventsConsumer(
-        message_processor=db_publisher.process
+        message_processor=db_publisher.process,
+        prefetch_count=prefetch_count
     )
 
     amqp_client.add_handler(amqp_consumer)
@@ -64,7 +75,12 @@ def main(args):
         format="%(asctime)s %(message)s")
     config.instance.load_from_file(args['config'])
     config.instance.load_from_db()
-    amqp_client, db_publisher = _create_connections()
+    amqp_client, db_publisher = _create_connections(
+        workers=args.get('workers', 1),
+        use_copy=args.get('use_copy', True),
+        prefetch_count=args.get('prefetch_count', MAX_QUEUE_SIZE),
+        cache_size=args.get('cache_size', EXECUTIONS_CACHE_SIZE),
+        cache_ttl=args.get('cache_ttl', EXECUTIONS_CACHE_TTL))
 
     logger.info('Starting consuming...')
     amqp_client.consume()
@@ -81,6 +97,24 @@ def cli():
                         help='Path to the log file')
     parser.add_argument('--log-level', dest='loglevel', default='INFO',
                         help='Logging level')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of DB writer threads. Each worker '
+                             'uses its own database connection, and stores '
+                             'the logs and events of a subset of the '
+                             'executions')
+    parser.add_argument('--no-copy', dest='use_copy', action='store_false',
+                        help='Store batches using INSERT statements instead '
+                             'of COPY')
+    parser.add_argument('--prefetch-count', type=int, default=MAX_QUEUE_SIZE,
+                        help='Maximum number of logs and events received '
+                             'but not yet stored in the database')
+    parser.add_argument('--cache-size', type=int,
+                        default=EXECUTIONS_CACHE_SIZE,
+                        help='Number of executions to cache (per worker)')
+    parser.add_argument('--cache-ttl', type=float,
+                        default=EXECUTIONS_CACHE_TTL,
+                        help='Time (in seconds) for which executions '
+                             'are cached')
     args = parser.parse_args()
     main(vars(args))
 
@@ -15,6 +15,7 @@
 ############
 
 import json
+import zlib
 import logging
 from time import time
 from threading import Thread, Lock
@@ -24,7 +25,7 @@ import psycopg2.errorcodes
 from psycopg2.extras import execute_values, DictCursor
 from collections import OrderedDict
 
-from cloudify._compat import queue
+from cloudify._compat import queue, text_type, StringIO
 from cloudify.constants import EVENTS_EXCHANGE_NAME, LOGS_EXCHANGE_NAME
 
 
@@ -32,8 +33,27 @@ logger = logging.getLogger(__name__)
 
 BATCH_DELAY = 0.5
 
+# the batch size adapts to the inbound rate: it grows when batches fill up
+# before the queue empties, and shrinks back when the queue goes idle
+MIN_BATCH_SIZE = 100
+MAX_BATCH_SIZE = 2000
+
+# messages waiting to be stored; when this is reached, the AMQP consumer
+# is blocked until the database catches up
+MAX_QUEUE_SIZE = 5000
+
+METRICS_LOG_INTERVAL = 60  # seconds
+
+EXECUTIONS_CACHE_SIZE = 1000
+EXECUTIONS_CACHE_TTL = 300  # seconds
+# "execution not found" results are only cached very briefly, because the
+# execution might well exist on the next batch
+EXECUTIONS_NEGATIVE_CACHE_TTL = BATCH_DELAY
+
+# events and logs are stored directly in the partition of the table that
+# they belong in, see PARTITIONS_QUERY
 EVENT_INSERT_QUERY = """
-    INSERT INTO events (
+    INSERT INTO {table} (
         timestamp,
         reported_timestamp,
         _execution_fk,
@@ -70,7 +90,7 @@ EVENT_VALUES_TEMPLATE = """(
 """
 
 LOG_INSERT_QUERY = """
-    INSERT INTO logs (
+    INSERT INTO {table} (
         timestamp,
         reported_timestamp,
         _execution_fk,
@@ -106,6 +126,65 @@ LOG_VALUES_TEMPLATE = """(
     )
 """
 
+# The events and logs tables are partitioned by `timestamp`, which is set
+# to the transaction's now(), so all the items of a batch belong in the
+# same partition of each table. get_events_partition (created by the
+# 5.1 migration) returns its name, creating the partition if needed.
+# COPY can't evaluate expressions, so `timestamp` is also fetched here.
+PARTITIONS_QUERY = """
+    SELECT
+        now() at time zone 'utc' AS timestamp,
+        get_events_partition('events', now() at time zone 'utc') AS events,
+        get_events_partition('logs', now() at time zone 'utc') AS logs
+"""
+
+# for COPY: (column, item key) pairs
+
+EVENT_COPY_FIELDS = [
+    ('reported_timestamp', 'timestamp'),
+    ('_execution_fk', 'execution_id'),
+    ('_tenant_id', 'tenant_id'),
+    ('_creator_id', 'creator_id'),
+    ('event_type', 'event_type'),
+    ('message', 'message'),
+    ('message_code', 'message_code'),
+    ('operation', 'operation'),
+    ('node_id', 'node_id'),
+    ('error_causes', 'error_causes'),
+    ('visibility', 'visibility'),
+    ('source_id', 'source_id'),
+    ('target_id', 'target_id'),
+]
+
+LOG_COPY_FIELDS = [
+    ('reported_timestamp', 'timestamp'),
+    ('_execution_fk', 'execution_id'),
+    ('_tenant_id', 'tenant_id'),
+    ('_creator_id', 'creator_id'),
+    ('logger', 'logger'),
+    ('level', 'level'),
+    ('message', 'message'),
+    ('message_code', 'message_code'),
+    ('operation', 'operation'),
+    ('node_id', 'node_id'),
+    ('visibility', 'visibility'),
+    ('source_id', 'source_id'),
+    ('target_id', 'target_id'),
+]
+
+COPY_QUERY = 'COPY {table} (timestamp, {columns}) FROM STDIN'
+
+# REST service event streams listen on this channel (see
+# manager_rest.events_listener); the payload is the _storage_id of an
+# execution that had new events or logs stored. Notifications are sent
+# when the transaction commits.
+EVENTS_NOTIFY_CHANNEL = 'cloudify_events'
+
+EVENTS_NOTIFY_QUERY = """
+    SELECT pg_notify(%s, CAST(execution_fk AS TEXT))
+    FROM unnest(%s) AS execution_fk
+"""
+
 EXECUTION_SELECT_QUERY = """
     SELECT
         id,
@@ -117,6 +196,17 @@ EXECUTION_SELECT_QUERY = """
     WHERE id = %s
 """
 
+EXECUTIONS_SELECT_QUERY = """
+    SELECT
+        id,
+        _storage_id,
+        _creator_id,
+        _tenant_id,
+        visibility
+    FROM executions
+    WHERE id = ANY(%s)
+"""
+
 
 def _strip_nul(text):
     """Remove NUL values from the text, so that it can be treated as text
@@ -126,34 +216,62 @@ def _strip_nul(text):
     return text.replace('\x00', '<NUL>')
 
 
+def _copy_value(value):
+    """Format the value for the COPY text format"""
+    if value is None:
+        return '\\N'
+    return (text_type(value)
+            .replace('\\', '\\\\')
+            .replace('\t', '\\t')
+            .replace('\n', '\\n')
+            .replace('\r', '\\r'))
+
+
 class DBLogEventPublisher(object):
+    """Store logs and events from AMQP in the database, in batches.
+
+    :param config: the manager config, used for connecting to the database
+    :param connection: the AMQP connection, messages are acked through it
+    :param use_copy: store batches using COPY FROM STDIN, instead of
+                     multi-row INSERT statements
+    :param max_queue_size: maximum number of messages waiting to be stored,
+                           before `process` starts blocking
+    :param cache_size: maximum number of executions to cache
+    :param cache_ttl: time (in seconds) for which executions are cached
+    """
     COMMIT_DELAY = 0.1  # seconds
 
-    def __init__(self, config, connection):
+    def __init__(self, config, connection, use_copy=True,
+                 max_queue_size=MAX_QUEUE_SIZE,
+                 cache_size=EXECUTIONS_CACHE_SIZE,
+                 cache_ttl=EXECUTIONS_CACHE_TTL):
+        self._use_copy = use_copy
         self._lock = Lock()
-        self._batch = queue.Queue()
+        self._batch = queue.Queue(maxsize=max_queue_size)
+        self._batch_size = MIN_BATCH_SIZE
 
         self._last_commit = time()
+        self._last_metrics_log = time()
+        self._metrics = {
+            'batches': 0,
+            'items': 0,
+            'last_batch_size': 0,
+            'last_commit_latency': 0,
+            'max_commit_latency': 0,
+            'queue_full': 0,
+        }
         self.config = config
         self._amqp_connection = connection
         self._started = queue.Queue()
-        self._reset_cache()
+        self._executions_cache = ExecutionsCache(
+            size=cache_size,
+            ttl=cache_ttl,
+            negative_ttl=EXECUTIONS_NEGATIVE_CACHE_TTL)
         # exception stored here will be raised by the main thread
         self.error_exit = None
 
     def _reset_cache(self):
-        self._executions_cache = LimitedSizeDict(100)
-
-    def _sanitize_cache(self):
-        """Drop None executions from the cache.
-
-        This is to be run after every batch of items, so that the cached
-        result that "the execution doesn't exist" can be dropped, because
-        the execution might well exist on the next batch.
-        """
-        for key, execution in list(self._executions_cache.items()):
-            if execution is None:
-                self._executions_cache.pop(key)
+        self._executions_cache.clear()
 
     def start(self):
         self.error_exit = None
@@ -173,7 +291,47 @@ class DBLogEventPublisher(object):
                 raise started
 
     def process(self, message, exchange, tag):
-        self._batch.put((message, exchange, tag))
+        try:
+            self._batch.put_nowait((message, exchange, tag))
+        except queue.Full:
+            # block the consumer until the database catches up; this also
+            # stops reading from the AMQP connection, so rabbitmq will
+            # hold the messages for us
+            self._metrics['queue_full'] += 1
+            logger.warning('%d logs+events waiting to be stored, blocking',
+                           self._batch.qsize())
+            self._batch.put((message, exchange, tag))
+
+    def get_metrics(self):
+        """Current batching metrics of this publisher.
+
+        - batch_size: the current target batch size
+        - queue_depth: number of messages waiting to be stored
+        - batches, items: number of batches and items stored so far
+        - last_batch_size: number of items in the last batch
+        - last_commit_latency, max_commit_latency: time (in seconds) it took
+          to store a batch
+        - queue_full: how many times the consumer was blocked because the
+          queue was full
+        - cache_hits, cache_misses: execution lookups served from the cache,
+          and executions that had to be fetched from the database
+        - cache_size: number of currently cached executions
+        """
+        metrics = dict(self._metrics)
+        metrics['batch_size'] = self._batch_size
+        metrics['queue_depth'] = self._batch.qsize()
+        metrics['cache_hits'] = self._executions_cache.hits
+        metrics['cache_misses'] = self._executions_cache.misses
+        metrics['cache_size'] = len(self._executions_cache)
+        return metrics
+
+    def _log_metrics(self):
+        if time() - self._last_metrics_log < METRICS_LOG_INTERVAL:
+            return
+        self._last_metrics_log = time()
+        logger.info('Publisher metrics: %s', ', '.join(
+            '{0}={1}'.format(k, v)
+            for k, v in sorted(self.get_metrics().items())))
 
     def connect(self):
         host, _, port = self.config.postgresql_host.partition(':')
@@ -207,33 +365,102 @@ class DBLogEventPublisher(object):
         else:
             self._started.put(True)
         items = []
+        first_item_time = None
         while True:
+            if items:
+                # wait at most until the batch is due
+                timeout = max(0, first_item_time + self.COMMIT_DELAY - time())
+            else:
+                timeout = BATCH_DELAY / 2
             try:
-                items.append(self._batch.get(timeout=BATCH_DELAY / 2))
+                items.append(self._batch.get(timeout=timeout))
             except queue.Empty:
                 pass
-            if len(items) > 100 or \
-                    (items and (time() - self._last_commit > BATCH_DELAY)):
+            # take everything that's already waiting, up to the batch size
+            while 0 < len(items) < self._batch_size:
                 try:
-                    self._store(conn, items)
-                except psycopg2.OperationalError as e:
-                    self.on_db_connection_error(e)
-                except Exception:
-                    logger.info('Error storing %d logs+events in batch',
-                                len(items))
-                    conn.rollback()
-                    # in case the integrityError was caused by stale cache,
-                    # clean it entirely before trying to insert without
-                    # batching.
-                    # This happens rarely.
-                    self._reset_cache()
-                    self._store_nobatch(conn, items)
-                items = []
-                self._last_commit = time()
-                self._sanitize_cache()
+                    items.append(self._batch.get_nowait())
+                except queue.Empty:
+                    break
+            if not items:
+                self._log_metrics()
+                continue
+            if first_item_time is None:
+                first_item_time = time()
+
+            if len(items) >= self._batch_size:
+                # messages are coming in faster than we're storing them:
+                # use bigger batches, to make fewer round-trips
+                self._batch_size = min(self._batch_size * 2, MAX_BATCH_SIZE)
+            elif self._batch.empty() and \
+                    time() - first_item_time >= self.COMMIT_DELAY:
+                # the queue is idle: flush now, and go back to small batches
+                self._batch_size = max(self._batch_size // 2, MIN_BATCH_SIZE)
+            elif time() - first_item_time < BATCH_DELAY:
+                continue
+
+            commit_start = time()
+            try:
+                self._store(conn, items)
+            except psycopg2.OperationalError as e:
+                self.on_db_connection_error(e)
+            except Exception:
+                logger.info('Error storing %d logs+events in batch',
+                            len(items))
+                conn.rollback()
+                # in case the integrityError was caused by stale cache,
+                # clean it entirely before trying to insert without
+                # batching.
+                # This happens rarely.
+                self._reset_cache()
+                self._store_nobatch(conn, items)
+            self._last_commit = time()
+            self._update_metrics(len(items), self._last_commit - commit_start)
+            items = []
+            first_item_time = None
+            self._log_metrics()
+
+    def _update_metrics(self, batch_size, latency):
+        self._metrics['batches'] += 1
+        self._metrics['items'] += batch_size
+        self._metrics['last_batch_size'] = batch_size
+        self._metrics['last_commit_latency'] = latency
+        self._metrics['max_commit_latency'] = max(
+            latency, self._metrics['max_commit_latency'])
+
+    def _prefetch_executions(self, conn, items):
+        """Load all the executions of this batch that aren't cached yet.
+
+        This fetches them all using a single query, instead of making
+        a round-trip for every execution in _get_execution.
+        """
+        execution_ids = set()
+        for message, _, _ in items:
+            try:
+                execution_ids.add(message['context']['execution_id'])
+            except (KeyError, TypeError):
+                continue
+        missing = self._executions_cache.missing(execution_ids)
+        if not missing:
+            return
+        with conn.cursor() as cur:
+            cur.execute(EXECUTIONS_SELECT_QUERY, (list(missing), ))
+            executions = cur.fetchall()
+        found = {}
+        for execution in executions:
+            found.setdefault(execution['id'], []).append(execution)
+        for execution_id in missing:
+            found_executions = found.get(execution_id, [])
+            if len(found_executions) > 1:
+                # let _get_execution deal with it
+                continue
+            self._executions_cache.set(
+                execution_id,
+                found_executions[0] if found_executions else None)
 
     def _get_execution(self, conn, execution_id):
-        if execution_id not in self._executions_cache:
+        execution = self._executions_cache.get(execution_id, _NOT_CACHED)
+        if execution is _NOT_CACHED:
             with conn.cursor() as cur:
                 cur.execute(EXECUTION_SELECT_QUERY, (execution_id, ))
                 executions = cur.fetchall()
@@ -244,8 +471,8 @@ class DBLogEventPublisher(object):
                 execution = None
             else:
                 execution = executions[0]
-            self._executions_cache[execution_id] = execution
-        return self._executions_cache[execution_id]
+            self._executions_cache.set(execution_id, execution)
+        return execution
 
     def _get_db_item(self, conn, message, exchange):
         execution_id = message['context']['execution_id']
@@ -265,6 +492,7 @@ class DBLogEventPublisher(object):
     def _store(self, conn, items):
         events, logs = [], []
 
+        self._prefetch_executions(conn, items)
         acks = []
         for message, exchange, ack in items:
             acks.append(ack)
@@ -275,8 +503,10 @@ class DBLogEventPublisher(object):
             target.append(item)
 
         with conn.cursor() as cur:
-            self._insert_events(cur, events)
-            self._insert_logs(cur, logs)
+            partitions = self._get_partitions(cur)
+            self._insert_events(cur, events, partitions)
+            self._insert_logs(cur, logs, partitions)
+            self._notify(cur, events + logs)
         logger.debug('commit %s', len(logs) + len(events))
         conn.commit()
         for ack in acks:
@@ -288,16 +518,23 @@ class DBLogEventPublisher(object):
         This is to be used in the anomalous cases where inserting the whole
         batch throws an IntegrityError - we fall back to inserting the items
         one by one, so that only the errorneous message is dropped.
+        All the messages are acked afterwards, including the dropped ones,
+        so that they don't keep taking up prefetch slots.
         """
+        acks = []
         for message, exchange, ack in items:
-            item = self._get_db_item(conn, message, exchange)
-            if item is None:
-                continue
-            insert = (self._insert_events if exchange == EVENTS_EXCHANGE_NAME
-                      else self._insert_logs)
+            acks.append(ack)
+            item = None
             try:
+                item = self._get_db_item(conn, message, exchange)
+                if item is None:
+                    continue
+                insert = (self._insert_events
+                          if exchange == EVENTS_EXCHANGE_NAME
+                          else self._insert_logs)
                 with conn.cursor() as cur:
-                    insert(cur, [item])
+                    insert(cur, [item], self._get_partitions(cur))
+                    self._notify(cur, [item])
                 conn.commit()
             except psycopg2.OperationalError as e:
                 self.on_db_connection_error(e)
@@ -316,18 +553,67 @@ class DBLogEventPublisher(object):
                 logger.exception('Unexpected error while storing %s: %s',
                                  exchange, item)
                 conn.rollback()
+        for ack in acks:
+            self._amqp_connection.acks_queue.put(ack)
+
+    def _notify(self, cursor, items):
+        """Let event streams know that the items' executions have new events
+        """
+        execution_fks = sorted({item['execution_id'] for item in items})
+        if not execution_fks:
+            return
+        cursor.execute(EVENTS_NOTIFY_QUERY,
+                       (EVENTS_NOTIFY_CHANNEL, execution_fks))
+
+    @staticmethod
+    def _get_partitions(cursor):
+        cursor.execute(PARTITIONS_QUERY)
+        return cursor.fetchone()
 
-    def _insert_events(self, cursor, events):
+    def _insert_events(self, cursor, events, partitions):
         if not events:
             return
-        execute_values(cursor, EVENT_INSERT_QUERY, events,
-                       template=EVENT_VALUES_TEMPLATE)
+        if self._use_copy:
+            self._copy_items(cursor, partitions['events'], EVENT_COPY_FIELDS,
+                             events, partitions['timestamp'])
+        else:
+            execute_values(cursor,
+                           EVENT_INSERT_QUERY.format(
+                               table=partitions['events']),
+                           events,
+                           template=EVENT_VALUES_TEMPLATE)
 
-    def _insert_logs(self, cursor, logs):
+    def _insert_logs(self, cursor, logs, partitions):
         if not logs:
             return
-        execute_values(cursor, LOG_INSERT_QUERY, logs,
-                       template=LOG_VALUES_TEMPLATE)
+        if self._use_copy:
+            self._copy_items(cursor, partitions['logs'], LOG_COPY_FIELDS,
+                             logs, partitions['timestamp'])
+        else:
+            execute_values(cursor,
+                           LOG_INSERT_QUERY.format(table=partitions['logs']),
+                           logs,
+                           template=LOG_VALUES_TEMPLATE)
+
+    def _copy_items(self, cursor, table, fields, items, timestamp):
+        """Stream the items into the table using COPY FROM STDIN.
+
+        The rows are serialized into an in-memory buffer in the COPY text
+        format, and sent to the server in a single COPY statement.
+        """
+        timestamp = _copy_value(timestamp)
+        buf = StringIO()
+        for item in items:
+            buf.write(timestamp)
+            for _, key in fields:
+                buf.write('\t')
+                buf.write(_copy_value(item[key]))
+            buf.write('\n')
+        buf.seek(0)
+        query = COPY_QUERY.format(
+            table=table,
+            columns=', '.join(column for column, _ in fields))
+        cursor.copy_expert(query, buf)
 
     def on_db_connection_error(self, err):
         logger.critical('Database down - cannot continue')
@@ -385,22 +671,108 @@ class DBLogEventPublisher(object):
             return None
 
 
-class LimitedSizeDict(OrderedDict):
+class DBLogEventPublisherPool(object):
+    """Distribute logs and events between several DB publishers.
+
+    Each worker is a separate DBLogEventPublisher, with its own database
+    connection, batch and publisher thread. Messages are partitioned by
+    their execution id, so all the logs and events of a single execution
+    are stored by the same worker, in the order they were received.
+
+    Acks are put on the shared AMQP connection's acks queue by whichever
+    worker stored the message; they are sent one by one (not with the
+    `multiple` flag), so the order in which workers commit doesn't matter.
     """
-    A FIFO dictionary with a maximum size limit. If number of keys reaches
-    the limit, the elements added first will be popped
-    Implementation taken from https://stackoverflow.com/a/2437645/978089
+    def __init__(self, config, connection, workers=1, **kwargs):
+        if workers < 1:
+            raise ValueError('At least one worker is required, got {0}'
+                             .format(workers))
+        self._workers = [DBLogEventPublisher(config, connection, **kwargs)
+                         for _ in range(workers)]
+
+    @property
+    def error_exit(self):
+        for worker in self._workers:
+            if worker.error_exit is not None:
+                return worker.error_exit
+        return None
+
+    def start(self):
+        for worker in self._workers:
+            worker.start()
+
+    def process(self, message, exchange, tag):
+        self._get_worker(message).process(message, exchange, tag)
+
+    def get_metrics(self):
+        return [worker.get_metrics() for worker in self._workers]
+
+    def _get_worker(self, message):
+        if len(self._workers) == 1:
+            return self._workers[0]
+        try:
+            execution_id = message['context']['execution_id']
+        except (KeyError, TypeError):
+            # malformed messages will be dropped by the worker anyway
+            execution_id = None
+        key = text_type(execution_id).encode('utf-8')
+        # crc32 rather than hash(), so that the partitioning is stable
+        index = (zlib.crc32(key) & 0xffffffff) % len(self._workers)
+        return self._workers[index]
+
+
+class ExecutionsCache(object):
+    """An LRU cache of executions, by execution id, with a TTL.
+
+    A cached value of None means that the execution doesn't exist; those
+    are kept for `negative_ttl` seconds, instead of `ttl`.
     """
-    def __init__(self, size_limit=None, *args, **kwds):
-        self.size_limit = size_limit
-        OrderedDict.__init__(self, *args, **kwds)
-        self._check_size_limit()
-
-    def __setitem__(self, key, value):
-        OrderedDict.__setitem__(self, key, value)
-        self._check_size_limit()
-
-    def _check_size_limit(self):
-        if self.size_limit is not None:
-            while len(self) > self.size_limit:
-                self.popitem(last=False)
+    def __init__(self, size, ttl, negative_ttl):
+        self.size = size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        # execution id: (expiry time, execution), least recently used first
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def clear(self):
+        self._items.clear()
+
+    def _lookup(self, key):
+        try:
+            expires, value = self._items.pop(key)
+        except KeyError:
+            return _NOT_CACHED
+        if expires < time():
+            return _NOT_CACHED
+        # re-insert, to mark it as the most recently used
+        self._items[key] = (expires, value)
+        return value
+
+    def get(self, key, default=None):
+        value = self._lookup(key)
+        if value is _NOT_CACHED:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def missing(self, keys):
+        """Return the keys which aren't cached, and count them as misses"""
+        missing = [key for key in keys if self._lookup(key) is _NOT_CACHED]
+        self.misses += len(missing)
+        return missing
+
+    def set(self, key, value):
+        ttl = self.negative_ttl if value is None else self.ttl
+        self._items.pop(key, None)
+        self._items[key] = (time() + ttl, value)
+        while len(self._items) > self.size:
+            self._items.popitem(last=False)
+
+
+_NOT_CACHED = object()
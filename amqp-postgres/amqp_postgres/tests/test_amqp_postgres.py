@@ -15,6 +15,8 @@
 ############
 
 import mock
+import psycopg2
+import unittest
 from uuid import uuid4
 from time import sleep
 from dateutil import parser as date_parser
@@ -22,26 +24,34 @@ from dateutil import parser as date_parser
 from cloudify.models_states import VisibilityState
 from cloudify.amqp_client import create_events_publisher
 
-from manager_rest.storage import models
+from manager_rest.storage import db, models
 from manager_rest.config import instance
+from manager_rest.events_listener import EventsListener
 from manager_rest.amqp_manager import AMQPManager
 from manager_rest.utils import get_formatted_timestamp
 from manager_rest.test.base_test import BaseServerTestCase
 
 
 from amqp_postgres.main import _create_connections
-from amqp_postgres.postgres_publisher import BATCH_DELAY
+from amqp_postgres.amqp_consumer import AMQPLogsEventsConsumer
+from amqp_postgres.postgres_publisher import (BATCH_DELAY,
+                                              DBLogEventPublisher,
+                                              ExecutionsCache)
 
 LOG_MESSAGE = 'log'
 EVENT_MESSAGE = 'event'
 
 
 class TestAMQPPostgres(BaseServerTestCase):
+    WORKERS = 1
+    USE_COPY = True
+
     def setUp(self):
         super(TestAMQPPostgres, self).setUp()
         with mock.patch('amqp_postgres.main.config.instance',
                         self.server_configuration):
-            amqp_client, _ = _create_connections()
+            amqp_client, self.db_publisher = _create_connections(
+                workers=self.WORKERS, use_copy=self.USE_COPY)
             amqp_client.consume_in_thread()
             self.addCleanup(amqp_client.close)
             self.events_publisher = create_events_publisher()
@@ -73,6 +83,45 @@ class TestAMQPPostgres(BaseServerTestCase):
         self._assert_log(log, db_log)
         self._assert_event(event, db_event)
 
+    def test_insert_special_characters(self):
+        execution_id = str(uuid4())
+        self._create_execution(execution_id)
+        text = u'tab\there\nnew line\r\\N backslash \\ \u05e9\x00'
+        log = self._get_log(execution_id, message=text)
+        self.publish_messages([(log, LOG_MESSAGE)])
+
+        db_log = self._get_db_element(models.Log)
+        self.assertEqual(db_log.message, text.replace('\x00', '<NUL>'))
+
+    def test_metrics(self):
+        execution_id = str(uuid4())
+        self._create_execution(execution_id)
+        self.publish_messages([
+            (self._get_log(execution_id), LOG_MESSAGE) for _ in range(10)
+        ])
+
+        metrics = self.db_publisher.get_metrics()
+        self.assertEqual(len(metrics), self.WORKERS)
+        self.assertEqual(sum(m['items'] for m in metrics), 10)
+        self.assertEqual(sum(m['queue_depth'] for m in metrics), 0)
+        for worker_metrics in metrics:
+            self.assertGreaterEqual(worker_metrics['batch_size'], 1)
+
+    def test_executions_cache(self):
+        execution_ids = [str(uuid4()) for _ in range(3)]
+        for execution_id in execution_ids:
+            self._create_execution(execution_id)
+        self.publish_messages([
+            (self._get_log(execution_id), LOG_MESSAGE)
+            for execution_id in execution_ids for _ in range(5)
+        ])
+        self.assertEqual(len(self.sm.list(models.Log)), 15)
+
+        metrics = self.db_publisher.get_metrics()
+        # every execution was only fetched from the db once
+        self.assertEqual(sum(m['cache_misses'] for m in metrics), 3)
+        self.assertEqual(sum(m['cache_hits'] for m in metrics), 15)
+
     def test_missing_execution(self):
         execution_id = str(uuid4())
         self._create_execution(execution_id)
@@ -106,6 +155,80 @@ class TestAMQPPostgres(BaseServerTestCase):
 
         self._assert_log(log_2, execution_2_logs[0])
 
+    def test_insert_error_causes(self):
+        execution_id = str(uuid4())
+        self._create_execution(execution_id)
+        event = self._get_event(execution_id)
+        event['context']['task_error_causes'] = [
+            {'message': 'error\twith\ttabs', 'traceback': 'line1\nline2'}
+        ]
+        self.publish_messages([(event, EVENT_MESSAGE)])
+
+        db_event = self._get_db_element(models.Event)
+        self.assertEqual(db_event.error_causes,
+                         event['context']['task_error_causes'])
+
+    def test_ordering_within_execution(self):
+        execution_ids = [str(uuid4()) for _ in range(5)]
+        for execution_id in execution_ids:
+            self._create_execution(execution_id)
+
+        messages = []
+        for i in range(10):
+            for execution_id in execution_ids:
+                log = self._get_log(execution_id, message='log {0}'.format(i))
+                messages.append((log, LOG_MESSAGE))
+        self.publish_messages(messages)
+
+        for execution_id in execution_ids:
+            logs = self.sm.list(models.Log,
+                                filters={'execution_id': execution_id},
+                                get_all_results=True)
+            stored = [log.message for log in
+                      sorted(logs, key=lambda log: log._storage_id)]
+            self.assertEqual(stored,
+                             ['log {0}'.format(i) for i in range(10)])
+
+    def test_stored_in_partition(self):
+        execution_id = str(uuid4())
+        self._create_execution(execution_id)
+        self.publish_messages([
+            (self._get_event(execution_id), EVENT_MESSAGE),
+            (self._get_log(execution_id), LOG_MESSAGE)
+        ])
+        for table in ['events', 'logs']:
+            partition, = db.session.execute(
+                "SELECT get_events_partition("
+                ":table, now() at time zone 'utc')",
+                {'table': table}).fetchone()
+            self.assertNotEqual(partition, table)
+            counts = db.session.execute(
+                'SELECT (SELECT count(*) FROM ONLY {0}), '
+                '(SELECT count(*) FROM {1})'.format(table, partition))
+            self.assertEqual(tuple(counts.fetchone()), (0, 1))
+        # the partitions are included when querying the tables
+        self.assertEqual(len(self.sm.list(models.Event)), 1)
+        self.assertEqual(len(self.sm.list(models.Log)), 1)
+
+    def test_notify_stored(self):
+        execution_id = str(uuid4())
+        self._create_execution(execution_id)
+        execution = self.sm.get(models.Execution, execution_id)
+        listener = EventsListener(db.engine)
+        listener.start()
+        for _ in range(50):
+            if listener.connected:
+                break
+            sleep(0.1)
+        self.assertTrue(listener.connected)
+
+        position = listener.position
+        self.publish_messages([(self._get_log(execution_id), LOG_MESSAGE)])
+        self.assertTrue(listener.wait([execution._storage_id], position, 5))
+        # only the executions that had events stored are notified about
+        self.assertFalse(
+            listener.wait([execution._storage_id + 1], position, 0.1))
+
     @staticmethod
     def _get_amqp_manager():
         return AMQPManager(
@@ -212,3 +335,67 @@ class TestAMQPPostgres(BaseServerTestCase):
             },
             'timestamp': get_formatted_timestamp()
         }
+
+
+class TestAMQPPostgresWorkers(TestAMQPPostgres):
+    WORKERS = 3
+
+
+class TestAMQPPostgresInsertValues(TestAMQPPostgres):
+    USE_COPY = False
+
+
+class TestExecutionsCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = ExecutionsCache(size=2, ttl=60, negative_ttl=1)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')  # 'b' is now the least recently used
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.hits, 3)
+        self.assertEqual(cache.misses, 1)
+
+    def test_ttl(self):
+        cache = ExecutionsCache(size=10, ttl=60, negative_ttl=1)
+        with mock.patch('amqp_postgres.postgres_publisher.time',
+                        return_value=1000):
+            cache.set('found', {'id': 'found'})
+            cache.set('not found', None)
+        with mock.patch('amqp_postgres.postgres_publisher.time',
+                        return_value=1030):
+            self.assertEqual(cache.missing(['found', 'not found']),
+                             ['not found'])
+        with mock.patch('amqp_postgres.postgres_publisher.time',
+                        return_value=1070):
+            self.assertEqual(cache.missing(['found']), ['found'])
+
+
+class TestAcks(unittest.TestCase):
+    def test_store_nobatch_acks_all(self):
+        connection = mock.Mock(acks_queue=mock.Mock())
+        publisher = DBLogEventPublisher(mock.Mock(), connection)
+        items = [({}, 'cloudify-logs', 'skipped'),
+                 ({}, 'cloudify-logs', 'failed'),
+                 ({}, 'cloudify-logs', 'stored')]
+        with mock.patch.object(publisher, '_get_db_item',
+                               side_effect=[None, {'execution_id': 1},
+                                            {'execution_id': 2}]), \
+                mock.patch.object(publisher, '_get_partitions'), \
+                mock.patch.object(publisher, '_notify'), \
+                mock.patch.object(publisher, '_insert_logs',
+                                  side_effect=[psycopg2.IntegrityError(),
+                                               None]):
+            publisher._store_nobatch(mock.MagicMock(), items)
+        self.assertEqual(
+            [c[0][0] for c in connection.acks_queue.put.call_args_list],
+            ['skipped', 'failed', 'stored'])
+
+    def test_unparsable_message_nacked(self):
+        consumer = AMQPLogsEventsConsumer(mock.Mock())
+        channel = mock.Mock()
+        consumer.process(channel, mock.Mock(delivery_tag=5), None,
+                         'not json')
+        channel.basic_nack.assert_called_once_with(5, requeue=False)
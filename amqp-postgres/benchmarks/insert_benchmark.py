@@ -0,0 +1,155 @@
+########
+# Copyright (c) 2020 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+"""Compare the INSERT and COPY paths of DBLogEventPublisher.
+
+Runs against a local Postgres. The logs and events are stored in temporary
+tables shadowing the manager's `logs` and `events` tables, so the benchmark
+doesn't need (or touch) the manager schema.
+
+    python benchmarks/insert_benchmark.py --rows 50000 --batch-size 500
+"""
+
+import argparse
+from time import time
+from uuid import uuid4
+from datetime import datetime
+
+from amqp_postgres.postgres_publisher import DBLogEventPublisher
+
+CREATE_TABLES_QUERY = """
+    CREATE TEMPORARY TABLE events (
+        _storage_id serial PRIMARY KEY,
+        timestamp timestamp NOT NULL,
+        reported_timestamp timestamp NOT NULL,
+        _execution_fk integer NOT NULL,
+        _tenant_id integer NOT NULL,
+        _creator_id integer NOT NULL,
+        event_type text,
+        message text,
+        message_code text,
+        operation text,
+        node_id text,
+        error_causes text,
+        visibility text,
+        source_id text,
+        target_id text
+    );
+    CREATE TEMPORARY TABLE logs (
+        _storage_id serial PRIMARY KEY,
+        timestamp timestamp NOT NULL,
+        reported_timestamp timestamp NOT NULL,
+        _execution_fk integer NOT NULL,
+        _tenant_id integer NOT NULL,
+        _creator_id integer NOT NULL,
+        logger text,
+        level text,
+        message text,
+        message_code text,
+        operation text,
+        node_id text,
+        visibility text,
+        source_id text,
+        target_id text
+    );
+"""
+
+
+class BenchmarkConfig(object):
+    postgresql_ssl_enabled = False
+
+    def __init__(self, args):
+        self.postgresql_host = args.host
+        self.postgresql_db_name = args.db_name
+        self.postgresql_username = args.username
+        self.postgresql_password = args.password
+
+
+def _make_messages(count):
+    execution = {
+        '_storage_id': 1,
+        '_tenant_id': 0,
+        '_creator_id': 0,
+        'visibility': 'tenant',
+    }
+    logs, events = [], []
+    for i in range(count):
+        message = {
+            'timestamp': datetime.utcnow().isoformat(),
+            'logger': 'ctx.{0}'.format(uuid4()),
+            'level': 'info',
+            'event_type': 'task_succeeded',
+            'message': {'text': 'Message {0}\twith a tab'.format(i)},
+            'context': {
+                'execution_id': 'benchmark',
+                'node_id': 'vm_{0}'.format(i % 100),
+                'operation': 'cloudify.interfaces.lifecycle.create',
+            }
+        }
+        logs.append(DBLogEventPublisher._get_log(message, execution))
+        events.append(DBLogEventPublisher._get_event(message, execution))
+    return logs, events
+
+
+def _run(publisher, conn, logs, events, batch_size):
+    start = time()
+    for offset in range(0, len(logs), batch_size):
+        # the temporary tables, rather than the manager's partitions, which
+        # would be created by get_events_partition
+        partitions = {
+            'timestamp': datetime.utcnow(),
+            'events': 'events',
+            'logs': 'logs',
+        }
+        with conn.cursor() as cur:
+            publisher._insert_logs(
+                cur, logs[offset:offset + batch_size], partitions)
+            publisher._insert_events(
+                cur, events[offset:offset + batch_size], partitions)
+        conn.commit()
+    return time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--db-name', default='cloudify_db')
+    parser.add_argument('--username', default='cloudify')
+    parser.add_argument('--password', default='cloudify')
+    parser.add_argument('--rows', type=int, default=20000,
+                        help='Number of logs (and events) to store')
+    parser.add_argument('--batch-size', type=int, default=100)
+    args = parser.parse_args()
+
+    config = BenchmarkConfig(args)
+    logs, events = _make_messages(args.rows)
+    for name, use_copy in [('INSERT', False), ('COPY', True)]:
+        publisher = DBLogEventPublisher(config, None, use_copy=use_copy)
+        conn = publisher.connect()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(CREATE_TABLES_QUERY)
+            conn.commit()
+            elapsed = _run(publisher, conn, logs, events, args.batch_size)
+        finally:
+            conn.close()
+        rows = len(logs) + len(events)
+        print('{0:>6}: {1} rows in {2:.2f}s, {3:.0f} rows/sec'.format(
+            name, rows, elapsed, rows / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -15,8 +15,10 @@
 ############
 
 import os
+import time
 import yaml
 import logging
+import threading
 from distutils.version import StrictVersion
 
 from cloudify.manager import get_rest_client
@@ -33,6 +35,8 @@ logger = logging.getLogger('mgmtworker')
 class HookConsumer(CloudifyOperationConsumer):
     routing_key = 'events.hooks'
     HOOKS_CONFIG_PATH = '/opt/mgmtworker/config/hooks.conf'
+    # How long the plugin of a hook implementation is cached for, in seconds
+    PLUGINS_CACHE_TTL = 60
 
     def __init__(self, queue_name, registry, max_workers=5):
         super(HookConsumer, self).__init__(queue_name,
@@ -41,6 +45,13 @@ class HookConsumer(CloudifyOperationConsumer):
                                            threadpool_size=max_workers)
         self.queue = queue_name
         self.exchange = EVENTS_EXCHANGE_NAME
+        self._lock = threading.Lock()
+        # The hooks config is only parsed again when the file changes:
+        # the hooks are kept by event type, with the file's mtime and size
+        self._hooks = {}
+        self._hooks_config_stat = None
+        # {(tenant_name, package_name): (expiry time, plugin)}
+        self._plugins = {}
 
     def handle_task(self, full_task):
         event_type = full_task['event_type']
@@ -63,28 +74,46 @@ class HookConsumer(CloudifyOperationConsumer):
         return result
 
     def _get_hook(self, event_type):
-        if not os.path.exists(self.HOOKS_CONFIG_PATH):
-            logger.warn("The hook consumer received `{0}` event but the "
-                        "hooks config file doesn't exist".format(event_type))
-            return None
+        hook = self._load_hooks().get(event_type)
+        if not hook:
+            logger.debug("The hook consumer received `{0}` event but didn't "
+                         "find a compatible hook in the configuration"
+                         .format(event_type))
+        return hook
 
-        with open(self.HOOKS_CONFIG_PATH) as hooks_conf_file:
+    def _load_hooks(self):
+        """The hooks by event type, parsed again if the config changed."""
+        try:
+            stat = os.stat(self.HOOKS_CONFIG_PATH)
+            config_stat = (stat.st_mtime, stat.st_size)
+        except OSError:
+            config_stat = None
+
+        with self._lock:
+            if config_stat == self._hooks_config_stat:
+                return self._hooks
+            self._hooks_config_stat = config_stat
+            self._hooks = {}
+            if config_stat is None:
+                logger.warn("The hooks config file {0} doesn't exist"
+                            .format(self.HOOKS_CONFIG_PATH))
+                return self._hooks
             try:
-                hooks_yaml = yaml.safe_load(hooks_conf_file)
-                hooks_conf = hooks_yaml.get('hooks', {}) if hooks_yaml else {}
-            except yaml.YAMLError:
-                logger.error(
-                    "The hook consumer received `{0}` event but the hook "
-                    "config file is invalid yaml".format(event_type)
-                )
-                return None
-
-        for hook in hooks_conf:
-            if hook.get('event_type') == event_type:
-                return hook
-        logger.info("The hook consumer received `{0}` event but didn't find a "
-                    "compatible hook in the configuration".format(event_type))
-        return None
+                with open(self.HOOKS_CONFIG_PATH) as hooks_conf_file:
+                    hooks_yaml = yaml.safe_load(hooks_conf_file)
+            except (IOError, yaml.YAMLError) as e:
+                logger.error('The hooks config file {0} is invalid: {1}'
+                             .format(self.HOOKS_CONFIG_PATH, e))
+                return self._hooks
+
+            hooks_conf = hooks_yaml.get('hooks', {}) if hooks_yaml else {}
+            for hook in hooks_conf:
+                # the first hook of an event type is the one that is used
+                self._hooks.setdefault(hook.get('event_type'), hook)
+            logger.info('Loaded the hooks config, with hooks for the events: '
+                        '{0}'.format(', '.join(
+                            str(event_type) for event_type in self._hooks)))
+            return self._hooks
 
     def _get_task(self, full_task, hook):
         hook_context, operation_context = self._get_contexts(
@@ -130,6 +159,18 @@ class HookConsumer(CloudifyOperationConsumer):
 
     def _get_plugin(self, tenant_name, implementation):
         package_name = implementation.split('.')[0]
+        key = (tenant_name, package_name)
+        with self._lock:
+            expiry, plugin = self._plugins.get(key, (0, None))
+        if expiry <= time.time():
+            plugin = self._get_latest_plugin(tenant_name, package_name)
+            with self._lock:
+                self._plugins[key] = (
+                    time.time() + self.PLUGINS_CACHE_TTL, plugin)
+        # the context of the operation gets a copy of its own
+        return dict(plugin)
+
+    def _get_latest_plugin(self, tenant_name, package_name):
         filter_plugin = {'package_name': package_name}
         admin_api_token = get_admin_api_token()
         rest_client = get_rest_client(tenant=tenant_name,
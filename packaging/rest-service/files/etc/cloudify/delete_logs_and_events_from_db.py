@@ -24,6 +24,12 @@ RESTSERVICE_CONFIG_PATH = '/opt/manager/cloudify-rest.conf'
 DEFAULT_SAVE_PERIOD = 5
 EVENTS_TABLE_NAME = 'events'
 LOGS_TABLE_NAME = 'logs'
+PARTITIONS_QUERY = """
+    SELECT child.relname
+    FROM pg_inherits
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    WHERE pg_inherits.inhparent = CAST(%s AS regclass)
+"""
 
 
 def _connect():
@@ -43,18 +49,41 @@ def _connect():
 
 
 def delete_old_logs_and_events():
-    _delete_rows_from_table(DEFAULT_SAVE_PERIOD, EVENTS_TABLE_NAME)
-    _delete_rows_from_table(DEFAULT_SAVE_PERIOD, LOGS_TABLE_NAME)
+    last_date_to_keep = datetime.utcnow() - timedelta(days=DEFAULT_SAVE_PERIOD)
+    with _connect() as conn:
+        for table in [EVENTS_TABLE_NAME, LOGS_TABLE_NAME]:
+            _drop_expired_partitions(conn, table, last_date_to_keep)
+            _delete_rows_from_table(conn, table, last_date_to_keep)
 
 
-def _delete_rows_from_table(save_period, table):
-    last_date_to_keep = str(datetime.today() - timedelta(days=save_period))
-    with _connect() as conn:
-        with conn.cursor() as cur:
-            query = "DELETE FROM {0} WHERE reported_timestamp < '{1}'"\
-                .format(table, last_date_to_keep)
-            cur.execute(query)
-            conn.commit()
+def _drop_expired_partitions(conn, table, last_date_to_keep):
+    """Drop the partitions that only have rows older than last_date_to_keep
+
+    Partitions are named after the date they start at (see
+    get_events_partition in the 5.1 migration), and every partition ends
+    where the next one starts, so a partition has expired if the next one
+    starts before last_date_to_keep. The newest partition is never dropped.
+    """
+    with conn.cursor() as cur:
+        cur.execute(PARTITIONS_QUERY, (table, ))
+        partitions = sorted(name for name, in cur.fetchall())
+        for partition, next_partition in zip(partitions, partitions[1:]):
+            next_start = datetime.strptime(
+                next_partition[len(table) + 1:], '%Y%m%d')
+            if next_start > last_date_to_keep:
+                break
+            cur.execute('DROP TABLE {0}'.format(partition))
+
+
+def _delete_rows_from_table(conn, table, last_date_to_keep):
+    """Delete old rows that were stored in the table itself
+
+    Those are rows stored before the table was partitioned, or not by
+    amqp-postgres.
+    """
+    with conn.cursor() as cur:
+        cur.execute('DELETE FROM ONLY {0} WHERE timestamp < %s'.format(table),
+                    (last_date_to_keep, ))
 
 
 if __name__ == '__main__':
@@ -3,6 +3,10 @@
 - Add usage_collector table
 - Adding inter deployment dependencies table
 - Add unique indexes
+- Add an index on executions.status
+- Add events and logs indexes for ordering by timestamp per execution
+- Partition the events and logs tables by week
+- Add status_reports table
 
 Revision ID: 7b883ec574ea
 Revises: 62a8d746d13b
@@ -38,6 +42,57 @@ VISIBILITY_ENUM = postgresql.ENUM(VisibilityState.PRIVATE,
 
 Base = declarative_base()
 
+# Returns the name of the partition of the `parent` table (events or logs)
+# that rows with the timestamp `ts` belong in, creating it if needed.
+# Partitions are child tables inheriting from the parent, one per week,
+# with a CHECK constraint on the timestamp, so that queries filtering by
+# timestamp only scan the relevant partitions. Indexes and foreign keys of
+# the parent are copied to every new partition.
+EVENTS_PARTITION_FUNCTION = """
+CREATE OR REPLACE FUNCTION get_events_partition(parent text, ts timestamp)
+RETURNS text AS $$
+DECLARE
+    start_date date := date_trunc('week', ts)::date;
+    partition_name text := parent || '_' || to_char(start_date, 'YYYYMMDD');
+    foreign_key record;
+BEGIN
+    PERFORM 1 FROM pg_tables
+        WHERE schemaname = current_schema() AND tablename = partition_name;
+    IF FOUND THEN
+        RETURN partition_name;
+    END IF;
+    -- several amqp-postgres workers might be creating it at once
+    PERFORM pg_advisory_xact_lock(hashtext(partition_name));
+    PERFORM 1 FROM pg_tables
+        WHERE schemaname = current_schema() AND tablename = partition_name;
+    IF FOUND THEN
+        RETURN partition_name;
+    END IF;
+    EXECUTE format(
+        'CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING INDEXES, '
+        'CHECK ("timestamp" >= %L AND "timestamp" < %L))',
+        partition_name, parent, start_date, start_date + 7);
+    FOR foreign_key IN
+        SELECT pg_get_constraintdef(oid) AS definition
+        FROM pg_constraint
+        WHERE conrelid = parent::regclass AND contype = 'f'
+    LOOP
+        EXECUTE format('ALTER TABLE %I ADD %s',
+                       partition_name, foreign_key.definition);
+    END LOOP;
+    EXECUTE format('ALTER TABLE %I INHERIT %I', partition_name, parent);
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+EVENTS_PARTITIONS_QUERY = """
+    SELECT child.relname
+    FROM pg_inherits
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    WHERE pg_inherits.inhparent = CAST(:parent AS regclass)
+"""
+
 
 class Config(Base):
     __tablename__ = 'config'
@@ -62,6 +117,10 @@ def upgrade():
     _create_inter_deployment_dependencies_table()
     _create_unique_indexes()
     _add_plugins_title_column()
+    _add_executions_status_index()
+    _create_events_execution_timestamp_indexes()
+    _create_events_partition_function()
+    _create_status_reports_table()
 
     bind = op.get_bind()
     session = orm.Session(bind=bind)
@@ -78,6 +137,10 @@ def upgrade():
 
 
 def downgrade():
+    _drop_status_reports_table()
+    _drop_events_partitions()
+    _drop_events_execution_timestamp_indexes()
+    _drop_executions_status_index()
     _drop_usage_collector_table()
     _drop_inter_deployment_dependencies_table()
     _drop_unique_indexes()
@@ -103,6 +166,21 @@ def _drop_usage_collector_table():
     op.drop_table('usage_collector')
 
 
+def _create_status_reports_table():
+    op.create_table(
+        'status_reports',
+        sa.Column('node_type', sa.Text(), nullable=False),
+        sa.Column('node_id', sa.Text(), nullable=False),
+        sa.Column('report', JSONString(), nullable=False),
+        sa.PrimaryKeyConstraint('node_type', 'node_id',
+                                name=op.f('status_reports_pkey'))
+    )
+
+
+def _drop_status_reports_table():
+    op.drop_table('status_reports')
+
+
 def _create_inter_deployment_dependencies_table():
     op.create_table(
         'inter_deployment_dependencies',
@@ -249,3 +327,49 @@ def _add_plugins_title_column():
 
 def _drop_plugins_title_column():
     op.drop_column(u'plugins', 'title')
+
+
+def _add_executions_status_index():
+    op.create_index(op.f('executions_status_idx'),
+                    'executions',
+                    ['status'],
+                    unique=False)
+
+
+def _drop_executions_status_index():
+    op.drop_index(op.f('executions_status_idx'), table_name='executions')
+
+
+def _create_events_execution_timestamp_indexes():
+    op.create_index(op.f('events__execution_fk_timestamp__storage_id_idx'),
+                    'events',
+                    ['_execution_fk', 'timestamp', '_storage_id'],
+                    unique=False)
+    op.create_index(op.f('logs__execution_fk_timestamp__storage_id_idx'),
+                    'logs',
+                    ['_execution_fk', 'timestamp', '_storage_id'],
+                    unique=False)
+
+
+def _drop_events_execution_timestamp_indexes():
+    op.drop_index(op.f('logs__execution_fk_timestamp__storage_id_idx'),
+                  table_name='logs')
+    op.drop_index(op.f('events__execution_fk_timestamp__storage_id_idx'),
+                  table_name='events')
+
+
+def _create_events_partition_function():
+    op.execute(EVENTS_PARTITION_FUNCTION)
+
+
+def _drop_events_partitions():
+    """Move the rows of every partition back to its parent table"""
+    bind = op.get_bind()
+    for parent in ['events', 'logs']:
+        partitions = bind.execute(
+            sa.text(EVENTS_PARTITIONS_QUERY), parent=parent).fetchall()
+        for partition, in partitions:
+            op.execute('INSERT INTO {0} SELECT * FROM ONLY {1}'
+                       .format(parent, partition))
+            op.execute('DROP TABLE {0}'.format(partition))
+    op.execute('DROP FUNCTION get_events_partition(text, timestamp)')
@@ -0,0 +1,157 @@
+#########
+# Copyright (c) 2020 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+"""Measure the time it takes to create deployments with many node instances.
+
+For every number of instances, a blueprint with a single node, deployed
+that many times, is uploaded, and the time of the create deployment
+requests is reported. The deployments and the blueprints are deleted at
+the end, unless --keep is passed:
+
+    python benchmarks/deployment_benchmark.py --url https://manager \\
+        --instances 10 1000 10000 --deployments 3
+"""
+
+import io
+import time
+import tarfile
+import argparse
+
+import requests
+
+from manager_rest.constants import (CLOUDIFY_AUTH_TOKEN_HEADER,
+                                    CLOUDIFY_TENANT_HEADER)
+
+BLUEPRINT = """
+tosca_definitions_version: cloudify_dsl_1_3
+
+node_types:
+  benchmark.Node: {{}}
+
+node_templates:
+  node:
+    type: benchmark.Node
+    capabilities:
+      scalable:
+        properties:
+          default_instances: {0}
+"""
+
+
+def _get_token(args):
+    response = requests.get(
+        '{0}/api/v3.1/tokens'.format(args.url),
+        auth=(args.username, args.password),
+        headers={CLOUDIFY_TENANT_HEADER: args.tenant},
+        verify=args.ca_cert or False)
+    response.raise_for_status()
+    return response.json()['value']
+
+
+def _blueprint_archive(instances):
+    content = BLUEPRINT.format(instances).encode('utf-8')
+    archive = io.BytesIO()
+    with tarfile.open(fileobj=archive, mode='w:gz') as tar:
+        info = tarfile.TarInfo('blueprint/blueprint.yaml')
+        info.size = len(content)
+        tar.addfile(info, io.BytesIO(content))
+    return archive.getvalue()
+
+
+def _wait(check, timeout=600):
+    deadline = time.time() + timeout
+    while not check():
+        if time.time() > deadline:
+            raise RuntimeError('Timed out waiting')
+        time.sleep(1)
+
+
+def _environment_created(session, url, deployment_id):
+    response = session.get('{0}/executions'.format(url), params={
+        'deployment_id': deployment_id,
+        'workflow_id': 'create_deployment_environment',
+        '_include_system_workflows': True,
+    })
+    response.raise_for_status()
+    return all(execution['status'] in ('terminated', 'failed', 'cancelled')
+               for execution in response.json()['items'])
+
+
+def _deleted(session, url, deployment_id):
+    response = session.get('{0}/deployments/{1}'.format(url, deployment_id))
+    return response.status_code == 404
+
+
+def _cleanup(session, url, blueprint_id, deployment_ids):
+    for deployment_id in deployment_ids:
+        _wait(lambda: _environment_created(session, url, deployment_id))
+        session.delete('{0}/deployments/{1}'.format(
+            url, deployment_id)).raise_for_status()
+    for deployment_id in deployment_ids:
+        _wait(lambda: _deleted(session, url, deployment_id))
+    session.delete('{0}/blueprints/{1}'.format(
+        url, blueprint_id)).raise_for_status()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--url', default='http://localhost')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin')
+    parser.add_argument('--tenant', default='default_tenant')
+    parser.add_argument('--ca-cert', default=None)
+    parser.add_argument('--instances', type=int, nargs='+',
+                        default=[10, 1000, 10000])
+    parser.add_argument('--deployments', type=int, default=3,
+                        help='deployments created for every number of '
+                             'instances')
+    parser.add_argument('--keep', action='store_true')
+    args = parser.parse_args()
+
+    session = requests.Session()
+    session.verify = args.ca_cert or False
+    session.headers.update({
+        CLOUDIFY_AUTH_TOKEN_HEADER: _get_token(args),
+        CLOUDIFY_TENANT_HEADER: args.tenant,
+    })
+    url = '{0}/api/v3.1'.format(args.url)
+    prefix = 'benchmark-{0}'.format(int(time.time()))
+
+    for instances in args.instances:
+        blueprint_id = '{0}-{1}'.format(prefix, instances)
+        session.put(
+            '{0}/blueprints/{1}'.format(url, blueprint_id),
+            params={'application_file_name': 'blueprint.yaml'},
+            data=_blueprint_archive(instances)).raise_for_status()
+
+        deployment_ids = []
+        durations = []
+        for i in range(args.deployments):
+            deployment_id = '{0}-{1}'.format(blueprint_id, i)
+            start = time.time()
+            session.put(
+                '{0}/deployments/{1}'.format(url, deployment_id),
+                json={'blueprint_id': blueprint_id}).raise_for_status()
+            durations.append(time.time() - start)
+            deployment_ids.append(deployment_id)
+        print('{0} instances: min {1:.2f}s, max {2:.2f}s per deployment'
+              .format(instances, min(durations), max(durations)))
+
+        if not args.keep:
+            _cleanup(session, url, blueprint_id, deployment_ids)
+
+
+if __name__ == '__main__':
+    main()
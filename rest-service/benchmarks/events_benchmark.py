@@ -0,0 +1,109 @@
+#########
+# Copyright (c) 2020 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+"""Measure the latency of paging through the events of an execution.
+
+Every page of events and logs of the execution is fetched in turn, either
+by `_offset`, or by `_cursor`, and the p50/p99 latencies are reported:
+
+    python benchmarks/events_benchmark.py --url https://manager \\
+        --execution-id <execution id> --size 100 --paging cursor
+"""
+
+import argparse
+from time import time
+
+import requests
+
+from manager_rest.constants import (CLOUDIFY_AUTH_TOKEN_HEADER,
+                                    CLOUDIFY_TENANT_HEADER)
+
+
+def _get_token(args):
+    response = requests.get(
+        '{0}/api/v3.1/tokens'.format(args.url),
+        auth=(args.username, args.password),
+        headers={CLOUDIFY_TENANT_HEADER: args.tenant},
+        verify=args.ca_cert or False)
+    response.raise_for_status()
+    return response.json()['value']
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100.0))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--url', default='http://localhost')
+    parser.add_argument('--execution-id', required=True)
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin')
+    parser.add_argument('--tenant', default='default_tenant')
+    parser.add_argument('--ca-cert', default=None)
+    parser.add_argument('--size', type=int, default=100)
+    parser.add_argument('--count', default='exact',
+                        choices=['exact', 'estimate', 'none'])
+    parser.add_argument('--paging', default='cursor',
+                        choices=['cursor', 'offset'])
+    args = parser.parse_args()
+
+    session = requests.Session()
+    session.verify = args.ca_cert or False
+    session.headers.update({
+        CLOUDIFY_AUTH_TOKEN_HEADER: _get_token(args),
+        CLOUDIFY_TENANT_HEADER: args.tenant,
+    })
+    url = '{0}/api/v3.1/events'.format(args.url)
+    params = {
+        'execution_id': args.execution_id,
+        'type': ['cloudify_event', 'cloudify_log'],
+        '_sort': '@timestamp',
+        '_size': args.size,
+        '_count': args.count,
+    }
+    if args.paging == 'cursor':
+        params['_cursor'] = ''
+    else:
+        params['_offset'] = 0
+
+    latencies = []
+    fetched = 0
+    while True:
+        start = time()
+        response = session.get(url, params=params)
+        latencies.append(time() - start)
+        response.raise_for_status()
+        body = response.json()
+        fetched += len(body['items'])
+        if args.paging == 'cursor':
+            next_cursor = body['metadata']['pagination'].get('next_cursor')
+            if not next_cursor:
+                break
+            params['_cursor'] = next_cursor
+        else:
+            if len(body['items']) < args.size:
+                break
+            params['_offset'] += args.size
+
+    print('{0} events in {1} pages: p50 {2:.1f}ms, p99 {3:.1f}ms'
+          .format(fetched, len(latencies),
+                  _percentile(latencies, 50) * 1000,
+                  _percentile(latencies, 99) * 1000))
+
+
+if __name__ == '__main__':
+    main()
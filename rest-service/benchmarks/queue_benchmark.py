@@ -0,0 +1,173 @@
+#########
+# Copyright (c) 2020 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+"""Measure the time it takes to drain a deep queue of executions.
+
+The queued executions are spread over the existing deployments of the
+tenant. Every round, all the running executions end, and the scheduler
+picks the queued executions to start, until the queue is empty; no
+workflow is actually run. "naive" checks every queued execution in turn,
+which is what start_queued_executions used to do; "lanes" is the current
+scheduler, execution_admission.get_startable_executions. The benchmark
+executions are deleted at the end. The schedulers would pick the other
+queued executions as well, so the manager must not have any.
+
+Run it with the manager's python, on the manager:
+
+    /opt/manager/env/bin/python benchmarks/queue_benchmark.py \\
+        --executions 10000 --deployments 100 --scheduler lanes
+"""
+
+import argparse
+import uuid
+from os import environ
+from time import time
+
+from cloudify.models_states import ExecutionState
+
+from manager_rest import execution_admission, utils
+from manager_rest.constants import SECURITY_FILE_LOCATION
+from manager_rest.flask_utils import setup_flask_app
+from manager_rest.storage import db, models
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100.0))]
+
+
+def _create_queued_executions(count, deployments, creator, prefix):
+    for i in range(count):
+        deployment = deployments[i % len(deployments)]
+        db.session.add(models.Execution(
+            id='{0}{1}'.format(prefix, i),
+            status=ExecutionState.QUEUED,
+            created_at=utils.get_formatted_timestamp(),
+            workflow_id='install',
+            error='',
+            parameters={},
+            is_system_workflow=False,
+            blueprint_id=deployment.blueprint_id,
+            _deployment_fk=deployment._storage_id,
+            _tenant_id=deployment._tenant_id,
+            _creator_id=creator.id,
+            visibility=deployment.visibility,
+        ))
+    db.session.commit()
+
+
+def _naive_schedule():
+    queued = (
+        models.Execution.query
+        .filter_by(status=ExecutionState.QUEUED)
+        .order_by(models.Execution.created_at)
+        .all()
+    )
+    started = []
+    for execution in queued:
+        if execution_admission.get_system_wide_executions(
+                ExecutionState.ACTIVE_STATES, limit=1):
+            continue
+        if execution_admission.get_deployment_executions(
+                execution.deployment_id, execution._tenant_id,
+                ExecutionState.ACTIVE_STATES):
+            continue
+        execution.status = ExecutionState.STARTED
+        db.session.flush()
+        started.append(execution)
+    return started
+
+
+def _lanes_schedule():
+    started = execution_admission.get_startable_executions()
+    for execution in started:
+        execution.status = ExecutionState.STARTED
+    return started
+
+
+def _end_running(prefix):
+    (
+        models.Execution.query
+        .filter(models.Execution.id.like('{0}%'.format(prefix)),
+                models.Execution.status == ExecutionState.STARTED)
+        .update({'status': ExecutionState.TERMINATED},
+                synchronize_session=False)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--executions', type=int, default=10000)
+    parser.add_argument('--deployments', type=int, default=100)
+    parser.add_argument('--tenant', default='default_tenant')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--scheduler', default='lanes',
+                        choices=['lanes', 'naive'])
+    args = parser.parse_args()
+
+    environ['MANAGER_REST_CONFIG_PATH'] = '/opt/manager/cloudify-rest.conf'
+    environ['MANAGER_REST_SECURITY_CONFIG_PATH'] = SECURITY_FILE_LOCATION
+    setup_flask_app()
+
+    tenant = models.Tenant.query.filter_by(name=args.tenant).one()
+    creator = models.User.query.filter_by(username=args.username).one()
+    deployments = (
+        models.Deployment.query
+        .filter_by(_tenant_id=tenant.id)
+        .limit(args.deployments)
+        .all()
+    )
+    if not deployments:
+        raise SystemExit('No deployments in tenant {0}'.format(args.tenant))
+    if execution_admission.get_executions([ExecutionState.QUEUED], limit=1):
+        raise SystemExit('There are queued executions on the manager')
+    schedule = _lanes_schedule if args.scheduler == 'lanes' \
+        else _naive_schedule
+
+    prefix = 'queue-benchmark-{0}-'.format(uuid.uuid4().hex[:8])
+    _create_queued_executions(args.executions, deployments, creator, prefix)
+    latencies = []
+    try:
+        started = 0
+        start_all = time()
+        while started < args.executions:
+            _end_running(prefix)
+            start = time()
+            round_started = schedule()
+            db.session.commit()
+            latencies.append(time() - start)
+            if not round_started:
+                raise SystemExit('Queue stalled after starting {0} '
+                                 'executions'.format(started))
+            started += len(round_started)
+        total = time() - start_all
+    finally:
+        db.session.rollback()
+        (
+            models.Execution.query
+            .filter(models.Execution.id.like('{0}%'.format(prefix)))
+            .delete(synchronize_session=False)
+        )
+        db.session.commit()
+
+    print('{0} executions over {1} deployments drained in {2} rounds, '
+          '{3:.1f}s: p50 {4:.1f}ms, p99 {5:.1f}ms per round'
+          .format(args.executions, len(deployments), len(latencies), total,
+                  _percentile(latencies, 50) * 1000,
+                  _percentile(latencies, 99) * 1000))
+
+
+if __name__ == '__main__':
+    main()
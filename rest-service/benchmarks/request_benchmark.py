@@ -0,0 +1,94 @@
+#########
+# Copyright (c) 2020 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+"""Measure requests/sec of a trivial authenticated GET on a running manager.
+
+This mostly measures the per-request overhead of the REST service: db
+connection checkout, authentication, tenant and role lookups, and the
+maintenance mode check. Run it before and after a change, against the
+same manager:
+
+    python benchmarks/request_benchmark.py --url https://manager \\
+        --username admin --password admin --requests 2000 --concurrency 8
+"""
+
+import argparse
+import threading
+from time import time
+
+import requests
+
+from manager_rest.constants import (CLOUDIFY_AUTH_TOKEN_HEADER,
+                                    CLOUDIFY_TENANT_HEADER)
+
+
+def _get_token(args):
+    response = requests.get(
+        '{0}/api/v3.1/tokens'.format(args.url),
+        auth=(args.username, args.password),
+        headers={CLOUDIFY_TENANT_HEADER: args.tenant},
+        verify=args.ca_cert or False)
+    response.raise_for_status()
+    return response.json()['value']
+
+
+def _worker(args, headers, count, errors):
+    session = requests.Session()
+    session.headers.update(headers)
+    session.verify = args.ca_cert or False
+    url = '{0}{1}'.format(args.url, args.path)
+    for _ in range(count):
+        response = session.get(url)
+        if not response.ok:
+            errors.append(response.status_code)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--url', default='http://localhost')
+    parser.add_argument('--path', default='/api/v3.1/version')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin')
+    parser.add_argument('--tenant', default='default_tenant')
+    parser.add_argument('--ca-cert', default=None)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    headers = {
+        CLOUDIFY_AUTH_TOKEN_HEADER: _get_token(args),
+        CLOUDIFY_TENANT_HEADER: args.tenant,
+    }
+    per_thread = args.requests // args.concurrency
+    errors = []
+    threads = [
+        threading.Thread(target=_worker,
+                         args=(args, headers, per_thread, errors))
+        for _ in range(args.concurrency)
+    ]
+    start = time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time() - start
+
+    total = per_thread * args.concurrency
+    print('{0} requests in {1:.2f}s: {2:.1f} requests/sec, {3} errors'
+          .format(total, elapsed, total / elapsed, len(errors)))
+
+
+if __name__ == '__main__':
+    main()
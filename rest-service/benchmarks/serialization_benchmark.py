@@ -0,0 +1,80 @@
+#########
+# Copyright (c) 2020 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+"""Measure the per-row cost of serializing models with to_response().
+
+"uncached" recomputes the fields from the mapper for every row, which is
+what to_response() used to do; "cached" is the current to_response(),
+using the per-class fields and the precompiled attribute getter.
+
+    python benchmarks/serialization_benchmark.py --rows 10000
+"""
+
+import argparse
+from time import time
+
+from manager_rest.storage import models
+
+
+def _make_node_instances(count):
+    return [
+        models.NodeInstance(
+            id='node_{0}'.format(i),
+            host_id='host_{0}'.format(i),
+            index=i,
+            relationships=[],
+            runtime_properties={'ip': '10.0.0.{0}'.format(i % 256)},
+            scaling_groups=[],
+            state='started',
+            version=1,
+            visibility='tenant',
+        )
+        for i in range(count)
+    ]
+
+
+def _uncached_to_response(instance):
+    fields = instance._get_response_fields()
+    return {f: getattr(instance, f) for f in fields}
+
+
+def _cached_to_response(instance):
+    return instance.to_response()
+
+
+def _measure(serialize, instances):
+    start = time()
+    for instance in instances:
+        serialize(instance)
+    return time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    args = parser.parse_args()
+
+    instances = _make_node_instances(args.rows)
+    # warm up, so that both variants run with configured mappers
+    _cached_to_response(instances[0])
+    for name, serialize in [('uncached', _uncached_to_response),
+                            ('cached', _cached_to_response)]:
+        elapsed = _measure(serialize, instances)
+        print('{0:>8}: {1} rows in {2:.3f}s, {3:.1f}us/row'.format(
+            name, args.rows, elapsed, elapsed / args.rows * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+#########
+# Copyright (c) 2020 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+"""Long-lived AMQP connections, used for publishing from the REST service.
+
+Connecting to the broker (over TLS) takes much longer than publishing a
+message, so instead of connecting for every message, each process keeps a
+pool of open connections and reuses them. A pika connection must not be
+used by several threads at once, so every publish checks a connection out
+of the pool, and returns it when done.
+"""
+
+import os
+import ssl
+import json
+import socket
+import logging
+import threading
+from time import time
+
+import pika
+from pika.exceptions import AMQPError
+
+from cloudify._compat import queue
+from cloudify.constants import (
+    BROKER_PORT_SSL,
+    EVENTS_EXCHANGE_NAME,
+    LOGS_EXCHANGE_NAME,
+)
+
+from manager_rest import config
+
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = 3
+# how long to wait for a free connection, when all of them are in use
+CHECKOUT_TIMEOUT = 10
+# heartbeats aren't sent while a connection is idle in the pool, so instead
+# of relying on them, connections idle for longer than this are reopened
+MAX_IDLE_TIME = 60
+
+EXCHANGE_SETTINGS = {'durable': True, 'auto_delete': False}
+
+# exchange, exchange type and routing key of each type of sent events
+EVENT_DESTINATIONS = {
+    'event': (EVENTS_EXCHANGE_NAME, 'topic', 'events'),
+    'hook': (EVENTS_EXCHANGE_NAME, 'topic', 'events.hooks'),
+    'log': (LOGS_EXCHANGE_NAME, 'fanout', ''),
+}
+
+
+class PublishError(Exception):
+    pass
+
+
+class _Publisher(object):
+    """A single broker connection, with a channel in confirm mode"""
+
+    def __init__(self, connection_params):
+        self._connection_params = connection_params
+        self._connection = None
+        self._channel = None
+        self._declared = set()
+        self.last_used = 0
+
+    @property
+    def is_open(self):
+        return (self._channel is not None and self._channel.is_open and
+                time() - self.last_used < MAX_IDLE_TIME)
+
+    def connect(self):
+        self.close()
+        error = None
+        # try the brokers in order, use the first one that is available
+        for params in self._connection_params:
+            try:
+                self._connection = pika.BlockingConnection(params)
+                break
+            except (AMQPError, socket.error) as e:
+                error = e
+        else:
+            raise error
+        self._channel = self._connection.channel()
+        self._channel.confirm_delivery()
+        self._declared = set()
+
+    def close(self):
+        connection = self._connection
+        self._connection = self._channel = None
+        if connection is not None and connection.is_open:
+            try:
+                connection.close()
+            except (AMQPError, socket.error):
+                pass
+
+    def declare_exchange(self, exchange, exchange_type):
+        if exchange in self._declared:
+            return
+        self._channel.exchange_declare(exchange=exchange,
+                                       exchange_type=exchange_type,
+                                       **EXCHANGE_SETTINGS)
+        self._declared.add(exchange)
+
+    def declare_delayed_queue(self, exchange, queue_name, ttl,
+                              target_exchange, target_routing_key):
+        """Declare a queue that forwards its messages after `ttl` ms"""
+        self.declare_exchange(exchange, 'direct')
+        self.declare_exchange(target_exchange, 'direct')
+        self._channel.queue_declare(queue=queue_name,
+                                    durable=True,
+                                    arguments={
+                                        'x-message-ttl': ttl,
+                                        'x-dead-letter-exchange':
+                                            target_exchange,
+                                        'x-dead-letter-routing-key':
+                                            target_routing_key,
+                                    })
+        self._channel.queue_bind(queue=queue_name,
+                                 exchange=exchange,
+                                 routing_key=queue_name)
+
+    def publish(self, exchange, routing_key, body):
+        confirmed = self._channel.basic_publish(
+            exchange=exchange,
+            routing_key=routing_key,
+            body=body,
+            properties=pika.BasicProperties(delivery_mode=2))
+        self.last_used = time()
+        if not confirmed:
+            raise PublishError(
+                'The broker did not confirm the message sent to {0}'
+                .format(exchange))
+
+
+class AMQPPublisherPool(object):
+    """A thread-safe pool of up to `size` broker connections.
+
+    Connections are opened lazily, and reopened when they're found broken.
+    A publish that fails on a broken connection is retried once, on a new
+    connection; messages are only considered sent after the broker
+    confirmed them.
+
+    :param connection_params: A list of pika connection parameters, one per
+                              broker; the first available broker is used
+    :param size: Maximum number of open connections
+    """
+
+    def __init__(self, connection_params, size=4,
+                 checkout_timeout=CHECKOUT_TIMEOUT):
+        self._connection_params = connection_params
+        self._size = size
+        self._checkout_timeout = checkout_timeout
+        # LIFO, so that the most recently used connections are reused, and
+        # the rest can stay idle
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._metrics = {
+            'connects': 0,
+            'reconnects': 0,
+            'published': 0,
+            'errors': 0,
+            'checkout_waits': 0,
+        }
+
+    def publish(self, message, exchange, routing_key='',
+                exchange_type='direct'):
+        """Send `message` (serialized to JSON) to `exchange`"""
+        self.publish_many([message], exchange, routing_key, exchange_type)
+
+    def publish_many(self, messages, exchange, routing_key='',
+                     exchange_type='direct'):
+        """Send all of `messages` to `exchange`, over a single connection"""
+        self._publish(messages, exchange, routing_key,
+                      lambda publisher: publisher.declare_exchange(
+                          exchange, exchange_type))
+
+    def publish_delayed(self, message, exchange, ttl,
+                        target_exchange, target_routing_key):
+        """Send `message` to `target_exchange`, after `ttl` milliseconds.
+
+        The message waits in a queue with a TTL, that has `target_exchange`
+        as its dead letter exchange (see `workflow_executor`).
+        """
+        queue_name = exchange + '_queue'
+        self._publish([message], exchange, queue_name,
+                      lambda publisher: publisher.declare_delayed_queue(
+                          exchange, queue_name, ttl,
+                          target_exchange, target_routing_key))
+
+    def get_metrics(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['open'] = self._created
+        metrics['idle'] = self._idle.qsize()
+        metrics['size'] = self._size
+        return metrics
+
+    def close(self):
+        while True:
+            try:
+                publisher = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            publisher.close()
+            with self._lock:
+                self._created -= 1
+
+    def _publish(self, messages, exchange, routing_key, declare):
+        bodies = [json.dumps(message) for message in messages]
+        sent = 0
+        publisher = self._checkout()
+        try:
+            for attempt in range(2):
+                try:
+                    if not publisher.is_open:
+                        self._count('reconnects' if publisher.last_used
+                                    else 'connects')
+                        publisher.connect()
+                    declare(publisher)
+                    # after a reconnect, only send what wasn't confirmed
+                    for body in bodies[sent:]:
+                        publisher.publish(exchange, routing_key, body)
+                        sent += 1
+                    break
+                except (AMQPError, socket.error) as e:
+                    self._count('errors')
+                    publisher.close()
+                    if attempt:
+                        raise
+                    logger.warning('Publishing to %s failed, reconnecting: '
+                                   '%s', exchange, e)
+        except PublishError:
+            self._count('errors')
+            raise
+        finally:
+            self._count('published', sent)
+            self._idle.put(publisher)
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self._size:
+                self._created += 1
+                return _Publisher(self._connection_params)
+            self._metrics['checkout_waits'] += 1
+        try:
+            return self._idle.get(timeout=self._checkout_timeout)
+        except queue.Empty:
+            raise PublishError(
+                'All {0} broker connections are busy'.format(self._size))
+
+    def _count(self, metric, value=1):
+        with self._lock:
+            self._metrics[metric] += value
+
+
+def _get_connection_params():
+    hosts = config.instance.amqp_host
+    if not isinstance(hosts, list):
+        hosts = [hosts]
+    credentials = pika.PlainCredentials(config.instance.amqp_username,
+                                        config.instance.amqp_password)
+    ssl_options = {'ca_certs': config.instance.amqp_ca_path,
+                   'cert_reqs': ssl.CERT_REQUIRED}
+    return [
+        pika.ConnectionParameters(host=host,
+                                  port=BROKER_PORT_SSL,
+                                  virtual_host='/',
+                                  credentials=credentials,
+                                  ssl=True,
+                                  ssl_options=ssl_options,
+                                  socket_timeout=CONNECT_TIMEOUT,
+                                  # see MAX_IDLE_TIME
+                                  heartbeat=0)
+        for host in hosts
+    ]
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_publisher_pool():
+    """Return the publisher pool of the current process.
+
+    Connections can't be shared with forked processes, so a process that
+    was forked after the pool was created gets a new pool.
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # not closing the old pool's connections: they belong to the
+            # parent process
+            _pool = AMQPPublisherPool(
+                _get_connection_params(),
+                size=config.instance.amqp_publisher_pool_size)
+            _pool_pid = os.getpid()
+        return _pool
@@ -14,26 +14,25 @@
 #  * limitations under the License.
 
 import copy
-import json
-from os import path, makedirs
+import threading
 from datetime import datetime, timedelta
 
+from cachetools import TTLCache
 from flask import current_app
+from sqlalchemy.dialects.postgresql import insert
 
 from cloudify.cluster_status import (ServiceStatus,
                                      CloudifyNodeType,
                                      NodeServiceStatus)
 
 from manager_rest import manager_exceptions
-from manager_rest.storage import models, get_storage_manager
+from manager_rest.storage import db, models, get_storage_manager
 from manager_rest.rest.rest_utils import parse_datetime_string
 
 try:
     from cloudify_premium import syncthing_utils
-    from cloudify_premium.ha import utils as ha_utils
 except ImportError:
     syncthing_utils = None
-    ha_utils = None
 
 
 STATUS = 'status'
@@ -44,7 +43,15 @@ DB_SERVICE_KEY = 'PostgreSQL'
 BROKER_SERVICE_KEY = 'RabbitMQ'
 PATRONI_SERVICE_KEY = 'Patroni'
 UNINITIALIZED_STATUS = 'Uninitialized'
-CLUSTER_STATUS_PATH = '/opt/manager/cluster_statuses'
+
+# Monitoring asks for the cluster status all the time, so it's only computed
+# once in a while in every process. A status report written by this process
+# invalidates it right away; reports written by other processes (or other
+# managers) are seen within the TTL.
+CLUSTER_STATUS_CACHE_TTL = 5
+_cluster_status_cache = TTLCache(1, CLUSTER_STATUS_CACHE_TTL)
+_cluster_status_lock = threading.Lock()
+_cluster_status_generation = 0
 
 
 # region Syncthing Status Helpers
@@ -127,12 +134,6 @@ def get_syncthing_status():
             {'connection_check': 'No device was seen recently'})
 
 
-def get_report_path(node_type, node_id):
-    return '{status_path}/{node_type}_{node_id}.json'.format(
-        status_path=CLUSTER_STATUS_PATH, node_type=node_type, node_id=node_id
-    )
-
-
 def _are_keys_in_dict(dictionary, keys):
     return all(key in dictionary for key in keys)
 
@@ -150,8 +151,15 @@ def _generate_cluster_status_structure():
     }
 
 
+def _get_status_reports():
+    return {
+        (status_report.node_type, status_report.node_id): status_report.report
+        for status_report in db.session.query(models.StatusReport)
+    }
+
+
 def _generate_service_nodes_status(service_type, service_nodes,
-                                   cloudify_version):
+                                   cloudify_version, status_reports):
     formatted_nodes = {}
     missing_status_reports = {}
     for node in service_nodes:
@@ -159,7 +167,8 @@ def _generate_service_nodes_status(service_type, service_nodes,
                                           service_type,
                                           formatted_nodes,
                                           cloudify_version,
-                                          missing_status_reports)
+                                          missing_status_reports,
+                                          status_reports)
         if not node_status:
             continue
 
@@ -170,9 +179,9 @@ def _generate_service_nodes_status(service_type, service_nodes,
 
 
 def _read_status_report(node, service_type, formatted_nodes, cloudify_version,
-                        missing_status_reports):
-    status_file_path = get_report_path(service_type, node.node_id)
-    if not path.exists(status_file_path):
+                        missing_status_reports, status_reports):
+    node_status = status_reports.get((service_type, node.node_id))
+    if node_status is None:
         _add_missing_status_reports(node,
                                     formatted_nodes,
                                     service_type,
@@ -180,17 +189,8 @@ def _read_status_report(node, service_type, formatted_nodes, cloudify_version,
                                     cloudify_version)
         return None
 
-    try:
-        with open(status_file_path, 'r') as status_file:
-            node_status = json.load(status_file)
-
-        if _is_report_valid(node_status):
-            return node_status
-    except ValueError:
-        current_app.logger.error(
-            'Failed getting the node status from the report {0}, it is not '
-            'a valid json file'.format(status_file_path)
-        )
+    if _is_report_valid(node_status):
+        return node_status
 
     _generate_node_status(node, formatted_nodes, cloudify_version,
                           status=ServiceStatus.FAIL)
@@ -454,24 +454,45 @@ def _verify_identical_broker_cluster_status(active_nodes):
 
 
 def get_cluster_status():
+    """Get the cluster status, computed at most once per cache TTL."""
+    with _cluster_status_lock:
+        cluster_status = _cluster_status_cache.get(STATUS)
+        generation = _cluster_status_generation
+    if cluster_status is not None:
+        return cluster_status
+
+    cluster_status = _generate_cluster_status()
+    with _cluster_status_lock:
+        # don't cache a status computed before a report was written
+        if generation == _cluster_status_generation:
+            _cluster_status_cache[STATUS] = cluster_status
+    return cluster_status
+
+
+def _invalidate_cluster_status():
+    global _cluster_status_generation
+    with _cluster_status_lock:
+        _cluster_status_cache.clear()
+        _cluster_status_generation += 1
+
+
+def _generate_cluster_status():
     """
     Generate the cluster status using:
     1. The DB tables (managers, rabbitmq_brokers, db_nodes) for the
        structure of the cluster.
-    2. The status reports (saved on the file system) each reporter sends
+    2. The status reports (the status_reports table) each reporter sends
        with the most updated status of the node.
     """
     cluster_services = {}
-    if not path.isdir(CLUSTER_STATUS_PATH):
-        return {STATUS: ServiceStatus.DEGRADED, SERVICES: cluster_services}
-
     cluster_structure = _generate_cluster_status_structure()
     cloudify_version = cluster_structure[CloudifyNodeType.MANAGER][0].version
+    status_reports = _get_status_reports()
     missing_status_reports = {}
 
     for service_type, service_nodes in cluster_structure.items():
         formatted_nodes, missing_reports = _generate_service_nodes_status(
-            service_type, service_nodes, cloudify_version
+            service_type, service_nodes, cloudify_version, status_reports
         )
         cluster_services[service_type] = {
             STATUS: _get_service_status(formatted_nodes),
@@ -508,12 +529,14 @@ def _verify_status_report_schema(node_id, report):
                 node_id))
 
 
-def _verify_report_newer_than_current(node_id, report_time, status_path):
-    if not (path.exists(status_path) and path.isfile(status_path)):
-        # Nothing to do if the file does not exists
+def _get_current_report(node_id, node_type):
+    return db.session.query(models.StatusReport.report).filter_by(
+        node_type=node_type, node_id=node_id).scalar()
+
+
+def _verify_report_newer_than_current(node_id, report_time, current_report):
+    if current_report is None:
         return
-    with open(status_path) as current_report_file:
-        current_report = json.load(current_report_file)
     if report_time < parse_datetime_string(current_report['timestamp']):
         current_app.logger.error('The status report for {0} at {1} is before'
                                  ' the latest report'.
@@ -534,24 +557,32 @@ def _verify_node_exists(node_id, model):
             'The given node id {0} is invalid'.format(node_id))
 
 
-def _create_statues_folder_if_needed():
-    if not path.exists(CLUSTER_STATUS_PATH):
-        makedirs(CLUSTER_STATUS_PATH)
-
+def _merge_delta_report(node_id, report, current_report):
+    """Merge a delta report into the current report of the node.
 
-def _save_report(report_path, report_dict):
-    with open(report_path, 'w') as report_file:
-        json.dump(report_dict, report_file)
+    A delta report only has the services that changed since the previous
+    report of the node, which are updated in the current report.
+    """
+    if current_report is None:
+        raise manager_exceptions.BadParametersError(
+            'The status report for {0} is a delta report, but there is no '
+            'previous report to apply it to'.format(node_id))
+    services = dict(current_report['report'][SERVICES])
+    services.update(report['report'][SERVICES])
+    return {
+        'reporting_freq': report['reporting_freq'],
+        'timestamp': report['timestamp'],
+        'report': {STATUS: report['report'][STATUS], SERVICES: services}
+    }
 
 
-def _verify_syncthing_status():
-    if not (ha_utils and ha_utils.is_clustered()):
-        return
-    syncthing_status, _ = get_syncthing_status()
-    if syncthing_status == NodeServiceStatus.INACTIVE:
-        raise manager_exceptions.FileSyncServiceError(
-            "Can't update the status report when Syncthing is not healthy"
-        )
+def _save_report(node_id, node_type, report_dict):
+    query = insert(models.StatusReport).values(
+        node_type=node_type, node_id=node_id, report=report_dict)
+    db.session.execute(query.on_conflict_do_update(
+        index_elements=['node_type', 'node_id'],
+        set_={'report': query.excluded.report}))
+    db.session.commit()
 
 
 # endregion
@@ -560,14 +591,15 @@ def _verify_syncthing_status():
 def write_status_report(node_id, model, node_type, report):
     current_app.logger.debug('Received new status report for '
                              '{0} of type {1}...'.format(node_id, node_type))
-    _verify_syncthing_status()
-    _create_statues_folder_if_needed()
     _verify_node_exists(node_id, model)
     _verify_status_report_schema(node_id, report)
     report_time = parse_datetime_string(report['timestamp'])
     _verify_timestamp(node_id, report_time)
-    report_path = get_report_path(node_type, node_id)
-    _verify_report_newer_than_current(node_id, report_time, report_path)
-    _save_report(report_path, report)
+    current_report = _get_current_report(node_id, node_type)
+    _verify_report_newer_than_current(node_id, report_time, current_report)
+    if report.get('delta'):
+        report = _merge_delta_report(node_id, report, current_report)
+    _save_report(node_id, node_type, report)
+    _invalidate_cluster_status()
     current_app.logger.debug('Successfully updated the status report for '
                              '{0} of type {1}'.format(node_id, node_type))
@@ -95,6 +95,8 @@ class Config(object):
     amqp_username = Setting('amqp_username', from_db=False)
     amqp_password = Setting('amqp_password', from_db=False)
     amqp_ca_path = Setting('amqp_ca_path', from_db=False)
+    # max number of broker connections kept open by each REST service worker
+    amqp_publisher_pool_size = Setting('amqp_publisher_pool_size', default=4)
 
     # LDAP settings
     ldap_server = Setting('ldap_server')
@@ -146,6 +148,16 @@ class Config(object):
     # max number of threads that will be used in a `restore snapshot` wf
     snapshot_restore_threads = Setting('snapshot_restore_threads', default=15)
 
+    # max number of active executions of every tenant, when executions are
+    # queued; 0 means no limit
+    max_concurrent_executions_per_tenant = Setting(
+        'max_concurrent_executions_per_tenant', default=0)
+
+    # max number of event streams open at once, by all the workers of the
+    # rest service; every stream holds a worker, so this must be lower
+    # than the number of workers
+    max_event_streams = Setting('max_event_streams', default=2)
+
     warnings = Setting('warnings', default=[])
 
     def load_configuration(self, from_db=True):
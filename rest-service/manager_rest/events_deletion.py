@@ -0,0 +1,233 @@
+#########
+# Copyright (c) 2020 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+"""Delete the events and logs of a deployment, in batches.
+
+The events of every execution are deleted DELETE_BATCH_SIZE at a time, in
+(timestamp, _storage_id) order, each batch in a transaction of its own: the
+batch is selected, appended to the archive file if there is one, and then
+deleted by _storage_id. This keeps both the memory used and the time locks
+are held for bounded, no matter how many events the deployment has.
+
+Deleting the events of a large deployment can take longer than a request,
+so this module can also be run as a script, which prints its progress:
+this is how the `delete_events` system workflow runs it.
+"""
+
+import os
+import sys
+import gzip
+import json
+import errno
+from datetime import datetime
+from os import environ
+
+from dateutil.parser import parse as parse_datetime
+from sqlalchemy import tuple_, type_coerce
+
+from manager_rest.storage import db, models
+from manager_rest.rest.resources_v1.events import Events
+
+DELETE_BATCH_SIZE = 1000
+ARCHIVE_DIRECTORY = os.path.join(os.sep, 'opt', 'manager', 'logs')
+
+
+def delete_deployment_events(deployment_id, tenant_id, include_logs=False,
+                             store_before=False, range_filters=None,
+                             batch_size=DELETE_BATCH_SIZE, progress=None):
+    """Delete the events, and optionally the logs, of a deployment.
+
+    :param deployment_id: ID of the deployment
+    :param tenant_id: _storage_id of the deployment's tenant
+    :param include_logs: Whether to delete the logs as well
+    :param store_before: Whether to write the events to an archive file
+                         (see `open_archive`) before deleting them
+    :param range_filters: Range filters, as passed to the events endpoint
+    :param batch_size: Number of events deleted in every transaction
+    :param progress: Called after every batch, with the table name and
+                     the number of its rows deleted so far
+    :returns: The number of events and logs deleted
+    """
+    execution_fks = get_execution_fks(deployment_id, tenant_id)
+    tables = [(models.Event, 'events')]
+    if include_logs:
+        tables.append((models.Log, 'logs'))
+
+    total = 0
+    for model, table_name in tables:
+        archive = None
+        if store_before:
+            archive = open_archive(table_name, deployment_id)
+        table_progress = None
+        if progress is not None:
+            table_progress = (
+                lambda deleted, name=table_name: progress(name, deleted))
+        try:
+            total += delete_events(
+                model, execution_fks, tenant_id, range_filters,
+                archive=archive, batch_size=batch_size,
+                progress=table_progress)
+        finally:
+            if archive is not None:
+                archive.close()
+    return total
+
+
+def get_execution_fks(deployment_id, tenant_id):
+    """The _storage_id of all the executions of a deployment"""
+    query = (
+        db.session.query(models.Execution._storage_id)
+        .join(models.Deployment,
+              models.Execution._deployment_fk ==
+              models.Deployment._storage_id)
+        .filter(models.Deployment.id == deployment_id,
+                models.Execution._tenant_id == tenant_id)
+    )
+    return [execution_fk for execution_fk, in query]
+
+
+def delete_events(model, execution_fks, tenant_id, range_filters=None,
+                  archive=None, batch_size=DELETE_BATCH_SIZE, progress=None):
+    """Delete the events or the logs of executions, in batches.
+
+    Every batch is committed as soon as it's deleted, so when this fails
+    midway, the batches before the failure stay deleted.
+
+    :param model: Event or Log
+    :param execution_fks: _storage_id of the executions
+    :param tenant_id: _storage_id of the executions' tenant
+    :param range_filters: Range filters, as passed to the events endpoint
+    :param archive: A binary file that the rows are written to, as log
+                    entries, before they're deleted
+    :param batch_size: Number of rows deleted in every transaction
+    :param progress: Called after every batch, with the number of rows
+                     deleted so far
+    :returns: The number of rows deleted
+    """
+    # the raw timestamp, without the conversion to a string, so that
+    # the last one of a batch can be passed back to the query as is
+    timestamp = type_coerce(model.timestamp, db.DateTime)
+    query = Events._apply_range_filters(
+        db.session.query(model, timestamp)
+        .filter(model._tenant_id == tenant_id),
+        model, range_filters or {})
+
+    deleted = 0
+    for execution_fk in execution_fks:
+        last = None
+        while True:
+            batch_query = query.filter(model._execution_fk == execution_fk)
+            if last is not None:
+                # even though the previous batches were deleted, their
+                # index entries are only removed by vacuum, so start the
+                # index scan after them
+                batch_query = batch_query.filter(
+                    tuple_(timestamp, model._storage_id) > tuple_(*last))
+            rows = (
+                batch_query
+                .order_by(timestamp, model._storage_id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            if archive is not None:
+                for event, _ in rows:
+                    archive.write(format_log_entry(event).encode('utf-8'))
+                archive.flush()
+            (
+                db.session.query(model)
+                .filter(model._storage_id.in_(
+                    [event._storage_id for event, _ in rows]))
+                .delete(synchronize_session=False)
+            )
+            last_event, last_timestamp = rows[-1]
+            last = (last_timestamp, last_event._storage_id)
+            db.session.commit()
+
+            deleted += len(rows)
+            if progress is not None:
+                progress(deleted)
+            if len(rows) < batch_size:
+                break
+    return deleted
+
+
+def open_archive(table_name, deployment_id):
+    """Open a new compressed archive file, for deleted events or logs.
+
+    :returns: A gzip file in ARCHIVE_DIRECTORY, named after the table,
+              the deployment and the current time
+    """
+    try:
+        os.makedirs(ARCHIVE_DIRECTORY)
+    except OSError as ex:
+        # be happy if someone already created the path
+        if ex.errno != errno.EEXIST:
+            raise
+    filename = '{0}_{1}_{2}.log.gz'.format(
+        table_name, deployment_id,
+        datetime.utcnow().strftime('%Y%m%dT%H%M%S'))
+    return gzip.open(os.path.join(ARCHIVE_DIRECTORY, filename), 'ab')
+
+
+def format_log_entry(event):
+    return '{0}  {1}\n'.format(
+        event.reported_timestamp,
+        {k: v for k, v in event.to_response().items()
+         if k != 'reported_timestamp'})
+
+
+def main(parameters):
+    """Delete the events of a deployment, printing the progress.
+
+    :param parameters: The `delete_events` workflow parameters, and the
+                       name of the deployment's tenant
+    """
+    from manager_rest.constants import SECURITY_FILE_LOCATION
+    from manager_rest.flask_utils import setup_flask_app
+
+    environ['MANAGER_REST_CONFIG_PATH'] = '/opt/manager/cloudify-rest.conf'
+    environ['MANAGER_REST_SECURITY_CONFIG_PATH'] = SECURITY_FILE_LOCATION
+    setup_flask_app()
+
+    tenant = (
+        db.session.query(models.Tenant)
+        .filter_by(name=parameters['tenant_name'])
+        .one()
+    )
+    range_filters = {
+        field: {key: parse_datetime(value)
+                for key, value in range_filter.items()}
+        for field, range_filter in parameters['range_filters'].items()
+    }
+
+    def progress(table_name, deleted):
+        print('Deleted {0} {1} of deployment {2}'.format(
+            deleted, table_name, parameters['deployment_id']))
+        sys.stdout.flush()
+
+    total = delete_deployment_events(
+        parameters['deployment_id'], tenant.id,
+        include_logs=parameters['include_logs'],
+        store_before=parameters['store_before'],
+        range_filters=range_filters,
+        progress=progress)
+    print('Deleted {0} events and logs of deployment {1}'.format(
+        total, parameters['deployment_id']))
+
+
+if __name__ == '__main__':
+    main(json.loads(sys.argv[1]))
@@ -0,0 +1,174 @@
+#########
+# Copyright (c) 2020 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+"""Wake up event streams when new events and logs are stored.
+
+Whenever amqp-postgres commits a batch of events and logs, it sends a
+NOTIFY on EVENTS_NOTIFY_CHANNEL, with the _storage_id of every execution
+that the batch had events of. Every REST service process has a single
+listener thread, with its own database connection LISTENing on that
+channel, which wakes up the streams waiting for those executions.
+
+Streams don't rely on the notifications alone: they also query for new
+events every once in a while, and more often while the listener is not
+connected.
+"""
+
+import os
+import select
+import logging
+import threading
+from time import time, sleep
+
+from cachetools import LRUCache
+
+from manager_rest.storage import db
+
+logger = logging.getLogger(__name__)
+
+# this must be the same as in amqp_postgres.postgres_publisher
+EVENTS_NOTIFY_CHANNEL = 'cloudify_events'
+
+RECONNECT_INTERVAL = 5
+# how often to check that the connection is still up, when it's idle
+CONNECTION_CHECK_INTERVAL = 30
+# how often streams query for new events while the listener isn't connected
+DISCONNECTED_POLL_INTERVAL = 2
+# number of executions for which the last notification is remembered
+NOTIFIED_EXECUTIONS_SIZE = 10000
+
+
+class EventsListener(object):
+    """Track notifications about stored events, and wait for them.
+
+    Every notification received increments `position`; a stream takes the
+    position before querying for events, and then waits for a notification
+    about its executions that came after that position, so that events
+    stored while it was querying aren't missed.
+
+    :param engine: The SQLAlchemy engine to connect with; the listener
+                   only connects to PostgreSQL databases
+    """
+
+    def __init__(self, engine):
+        self._engine = engine
+        self._condition = threading.Condition()
+        self._position = 0
+        self._notified = LRUCache(maxsize=NOTIFIED_EXECUTIONS_SIZE)
+        self.connected = False
+
+    def start(self):
+        if self._engine.dialect.name != 'postgresql':
+            return
+        thread = threading.Thread(target=self._listen)
+        thread.daemon = True
+        thread.start()
+
+    @property
+    def position(self):
+        with self._condition:
+            return self._position
+
+    def wait(self, execution_fks, position, timeout):
+        """Wait until there are new events of one of the executions.
+
+        :param execution_fks: The _storage_id of the executions, or None
+                              to wait for the events of any execution
+        :param position: The `position` before the last query for events
+        :param timeout: Maximum time to wait, in seconds
+        :returns: Whether there are new events, or the wait timed out
+        """
+        if not self.connected:
+            timeout = min(timeout, DISCONNECTED_POLL_INTERVAL)
+        deadline = time() + timeout
+        with self._condition:
+            while not self._notified_since(execution_fks, position):
+                remaining = deadline - time()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+    def _notified_since(self, execution_fks, position):
+        if execution_fks is None:
+            return self._position > position
+        return any(self._notified.get(execution_fk, 0) > position
+                   for execution_fk in execution_fks)
+
+    def _notify(self, payloads):
+        with self._condition:
+            self._position += 1
+            for payload in payloads:
+                try:
+                    self._notified[int(payload)] = self._position
+                except ValueError:
+                    continue
+            self._condition.notify_all()
+
+    def _listen(self):
+        while True:
+            try:
+                self._listen_connection()
+            except Exception as e:
+                logger.warning('Listening for event notifications failed, '
+                               'reconnecting in %ds: %s',
+                               RECONNECT_INTERVAL, e)
+            self.connected = False
+            sleep(RECONNECT_INTERVAL)
+
+    def _listen_connection(self):
+        # a connection of our own, that isn't returned to the pool
+        connection = self._engine.raw_connection()
+        connection.detach()
+        try:
+            pg_connection = connection.connection
+            pg_connection.autocommit = True
+            with pg_connection.cursor() as cursor:
+                cursor.execute('LISTEN {0}'.format(EVENTS_NOTIFY_CHANNEL))
+            self.connected = True
+            while True:
+                readable, _, _ = select.select(
+                    [pg_connection], [], [], CONNECTION_CHECK_INTERVAL)
+                if not readable:
+                    with pg_connection.cursor() as cursor:
+                        cursor.execute('SELECT 1')
+                pg_connection.poll()
+                if pg_connection.notifies:
+                    payloads = [notification.payload
+                                for notification in pg_connection.notifies]
+                    del pg_connection.notifies[:]
+                    self._notify(payloads)
+        finally:
+            connection.close()
+
+
+_listener = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def get_events_listener():
+    """Return the events listener of the current process.
+
+    The listener thread doesn't survive a fork, so a process that was
+    forked after the listener was started gets a new one.
+    """
+    global _listener, _listener_pid
+    with _listener_lock:
+        if _listener is None or _listener_pid != os.getpid():
+            _listener = EventsListener(db.engine)
+            _listener.start()
+            _listener_pid = os.getpid()
+        return _listener
@@ -0,0 +1,212 @@
+#########
+# Copyright (c) 2020 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+"""Find the executions that prevent a new execution from starting.
+
+Before an execution is started, the executions that it can't run alongside
+are looked for: system-wide executions, executions of the same deployment,
+and snapshot creations. These only select the ids of the executions in the
+given statuses, using the index on executions.status, so they cost the same
+no matter how many executions have ended.
+
+The checks and the creation of the new execution are serialized with an
+advisory lock (see `lock`), so that two executions that can't run together
+aren't both started because each was checked before the other was stored.
+
+When an execution ends, `get_startable_executions` picks the queued
+executions that can start now, instead of trying to start every one of them
+in turn. The queue is split into lanes: every deployment has a FIFO lane of
+its own, in which only the oldest queued execution can start, and only if
+no other execution of the deployment is running; system-wide executions
+share a global lane, and start only once nothing else is running.
+"""
+
+from sqlalchemy import and_, exists, func, text
+from sqlalchemy.orm import aliased
+
+from cloudify.models_states import ExecutionState
+
+from manager_rest.storage import db, models
+
+# pg_advisory_xact_lock key, arbitrary but shared by all the REST services
+ADMISSION_LOCK_KEY = 8210523
+
+
+def lock():
+    """Lock execution admission until the end of the current transaction.
+
+    The lock is released when the new execution is committed, or when the
+    request's transaction is rolled back.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return
+    db.session.execute(text('SELECT pg_advisory_xact_lock(:key)'),
+                       {'key': ADMISSION_LOCK_KEY})
+
+
+def get_executions(statuses, workflow_id=None, limit=None):
+    """The ids of the executions of all tenants in one of the statuses.
+
+    :param statuses: Execution statuses to look for
+    :param workflow_id: Only look for executions of this workflow
+    :param limit: Maximum number of ids to return
+    """
+    query = _query_executions(statuses)
+    if workflow_id is not None:
+        query = query.filter(models.Execution.workflow_id == workflow_id)
+    return _get_ids(query, limit)
+
+
+def get_system_wide_executions(statuses, limit=None):
+    """The ids of the system-wide executions in one of the statuses.
+
+    System-wide executions are the ones that don't have a deployment.
+    """
+    query = _query_executions(statuses).filter(
+        models.Execution._deployment_fk.is_(None))
+    return _get_ids(query, limit)
+
+
+def get_deployment_executions(deployment_id, tenant_id, statuses):
+    """The ids of the executions of a deployment in one of the statuses."""
+    query = (
+        _query_executions(statuses)
+        .join(models.Deployment,
+              models.Execution._deployment_fk ==
+              models.Deployment._storage_id)
+        .filter(models.Deployment.id == deployment_id,
+                models.Deployment._tenant_id == tenant_id)
+    )
+    return _get_ids(query)
+
+
+def count_tenant_executions(tenant_id, statuses):
+    """The number of executions of a tenant in one of the statuses."""
+    return (
+        db.session.query(func.count(models.Execution._storage_id))
+        .filter(models.Execution.status.in_(statuses),
+                models.Execution._tenant_id == tenant_id)
+        .scalar()
+    )
+
+
+def get_startable_executions(max_per_tenant=0):
+    """The queued executions that can start now, oldest first.
+
+    The queued system-wide executions start one at a time, after all the
+    other executions have ended. The oldest one of them also holds back
+    the deployment executions that were queued after it, so that it isn't
+    starved by them.
+
+    The rows of the returned executions are locked (the rows that are
+    already locked, by another scheduler, are skipped) until the end of
+    the current transaction.
+
+    :param max_per_tenant: Maximum number of active executions of every
+                           tenant, counting the executions that are
+                           already active; 0 means no limit
+    :returns: A list of Execution objects
+    """
+    if get_system_wide_executions(ExecutionState.ACTIVE_STATES, limit=1):
+        return []
+    queued = _query_queued_executions()
+    system_wide = (
+        queued
+        .filter(models.Execution._deployment_fk.is_(None))
+        .with_for_update(skip_locked=True, of=models.Execution)
+        .first()
+    )
+    if system_wide is None:
+        startable = _get_deployment_lanes_heads(queued)
+    else:
+        startable = _get_deployment_lanes_heads(
+            queued, created_before=system_wide.created_at)
+        if not startable and not get_executions(
+                ExecutionState.ACTIVE_STATES, limit=1):
+            return [system_wide]
+    if max_per_tenant:
+        startable = _limit_per_tenant(startable, max_per_tenant)
+    return [execution for execution, _ in startable]
+
+
+def _query_queued_executions():
+    return (
+        db.session.query(models.Execution)
+        .filter(models.Execution.status == ExecutionState.QUEUED)
+        .order_by(models.Execution.created_at, models.Execution._storage_id)
+    )
+
+
+def _get_deployment_lanes_heads(queued, created_before=None):
+    """The oldest queued execution of every idle deployment.
+
+    :param queued: A query of the queued executions, oldest first
+    :param created_before: Only look at executions created before this
+    :returns: A list of (execution, tenant _storage_id) tuples
+    """
+    active = aliased(models.Execution)
+    deployment_active = exists().where(and_(
+        active._deployment_fk == models.Execution._deployment_fk,
+        active.status.in_(ExecutionState.ACTIVE_STATES)))
+    heads = (
+        db.session.query(models.Execution._storage_id)
+        .filter(models.Execution.status == ExecutionState.QUEUED,
+                models.Execution._deployment_fk.isnot(None),
+                ~deployment_active)
+        .distinct(models.Execution._deployment_fk)
+        .order_by(models.Execution._deployment_fk,
+                  models.Execution.created_at,
+                  models.Execution._storage_id)
+    )
+    if created_before is not None:
+        heads = heads.filter(models.Execution.created_at < created_before)
+    # FOR UPDATE can't be used together with DISTINCT, so the rows are
+    # locked by an outer query
+    return (
+        queued
+        .add_columns(models.Execution._tenant_id)
+        .filter(models.Execution._storage_id.in_(heads))
+        .with_for_update(skip_locked=True, of=models.Execution)
+        .all()
+    )
+
+
+def _limit_per_tenant(startable, max_per_tenant):
+    active = dict(
+        db.session.query(models.Execution._tenant_id,
+                         func.count(models.Execution._storage_id))
+        .filter(models.Execution.status.in_(ExecutionState.ACTIVE_STATES))
+        .group_by(models.Execution._tenant_id)
+    )
+    limited = []
+    for execution, tenant_id in startable:
+        if active.get(tenant_id, 0) >= max_per_tenant:
+            continue
+        active[tenant_id] = active.get(tenant_id, 0) + 1
+        limited.append((execution, tenant_id))
+    return limited
+
+
+def _query_executions(statuses):
+    return (
+        db.session.query(models.Execution.id)
+        .filter(models.Execution.status.in_(statuses))
+    )
+
+
+def _get_ids(query, limit=None):
+    if limit is not None:
+        query = query.limit(limit)
+    return [execution_id for execution_id, in query]
@@ -14,12 +14,38 @@
 #    * limitations under the License.
 
 import hashlib
+import threading
+from collections import namedtuple
 
+from cachetools import TTLCache
 from flask import g
+from sqlalchemy import event
 from werkzeug.local import LocalProxy
 
 from cloudify import constants
-from manager_rest.storage import get_storage_manager, models
+from manager_rest.storage import db, models
+
+# Workflows and agents authenticate every request with the execution token,
+# so the execution the token belongs to is cached for a short while. Changes
+# made by this process invalidate the cache right away; other processes can
+# see an outdated status for up to the TTL.
+EXECUTION_TOKEN_CACHE_TTL = 10
+EXECUTION_TOKEN_CACHE_SIZE = 1000
+
+_token_cache = TTLCache(EXECUTION_TOKEN_CACHE_SIZE, EXECUTION_TOKEN_CACHE_TTL)
+_token_cache_lock = threading.Lock()
+
+
+class TokenExecution(namedtuple('TokenExecution', '_storage_id id status '
+                                                  'scheduled_for creator_id')):
+    """The columns of an execution that are needed for authentication"""
+    __slots__ = ()
+
+    @property
+    def creator(self):
+        # query.get uses the session's identity map, so the user is only
+        # loaded once per request
+        return models.User.query.get(self.creator_id)
 
 
 @LocalProxy
@@ -35,13 +61,50 @@ def set_current_execution(execution):
 
 
 def get_current_execution_by_token(execution_token):
-    sm = get_storage_manager()
+    """Return the TokenExecution of the execution that has this token"""
     hashed = hashlib.sha256(execution_token.encode('ascii')).hexdigest()
-    token_filter = {models.Execution.token: hashed}
-    executions = sm.full_access_list(models.Execution, filters=token_filter)
+    with _token_cache_lock:
+        execution = _token_cache.get(hashed)
+    if execution is not None:
+        return execution
+
+    executions = db.session.query(
+        models.Execution._storage_id,
+        models.Execution.id,
+        models.Execution.status,
+        models.Execution.scheduled_for,
+        models.Execution._creator_id
+    ).filter(models.Execution.token == hashed).limit(2).all()
     if len(executions) != 1:  # Only one execution should match the token
         return None
-    return executions[0]
+    execution = TokenExecution(*executions[0])
+    with _token_cache_lock:
+        _token_cache[hashed] = execution
+    return execution
+
+
+def invalidate_execution_token_cache(execution_id=None, hashed_token=None):
+    """Remove the cached execution, by its id and/or its hashed token"""
+    with _token_cache_lock:
+        if hashed_token is not None:
+            _token_cache.pop(hashed_token, None)
+        if execution_id is not None:
+            for key, execution in list(_token_cache.items()):
+                if execution.id == execution_id:
+                    del _token_cache[key]
+
+
+@event.listens_for(models.Execution.status, 'set')
+def _execution_status_changed(target, value, oldvalue, initiator):
+    if value != oldvalue:
+        invalidate_execution_token_cache(execution_id=target.id)
+
+
+@event.listens_for(models.Execution.token, 'set')
+def _execution_token_changed(target, value, oldvalue, initiator):
+    # a token that's now used by another execution can't be cached either
+    invalidate_execution_token_cache(hashed_token=value)
+    invalidate_execution_token_cache(hashed_token=oldvalue)
 
 
 def get_execution_token_from_request(request):
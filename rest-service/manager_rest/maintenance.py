@@ -16,15 +16,17 @@
 
 import os
 import traceback
+from time import time
 
 from flask import jsonify, request
+from sqlalchemy import event
 
 from cloudify._compat import StringIO
 from cloudify.models_states import ExecutionState
 
 from manager_rest import config
 from manager_rest import utils
-from manager_rest.storage import get_storage_manager, models
+from manager_rest.storage import db, models
 from manager_rest.constants import (FORBIDDEN_METHODS,
                                     MAINTENANCE_MODE_ACTIVATED,
                                     MAINTENANCE_MODE_STATUS_FILE,
@@ -34,12 +36,45 @@ from manager_rest.constants import (FORBIDDEN_METHODS,
                                     ALLOWED_MAINTENANCE_ENDPOINTS)
 
 
+# While activating, every request checks if there are running executions.
+# When there are, the check is skipped by all workers for this many seconds:
+# the time of the last check is the mtime of RUNNING_EXECUTIONS_CHECK_FILE.
+RUNNING_EXECUTIONS_CHECK_INTERVAL = 3
+RUNNING_EXECUTIONS_CHECK_FILE = 'running_executions_check'
+
+RUNNING_EXECUTION_STATES = [state for state in ExecutionState.STATES
+                            if state not in ExecutionState.END_STATES]
+
+# (path, inode, size, mtime) of the last state file read, and its contents
+_cached_state = (None, None)
+
+
 def get_maintenance_file_path():
     return os.path.join(
             config.instance.maintenance_folder,
             MAINTENANCE_MODE_STATUS_FILE)
 
 
+def get_maintenance_state():
+    """Return the maintenance mode state, or None if it's deactivated.
+
+    This is called for every request, so the state file is only read again
+    after it was changed.
+    """
+    global _cached_state
+    maintenance_file = get_maintenance_file_path()
+    try:
+        stat = os.stat(maintenance_file)
+    except OSError:
+        return None
+    file_key = (maintenance_file, stat.st_ino, stat.st_size, stat.st_mtime)
+    cached_key, state = _cached_state
+    if cached_key != file_key:
+        state = utils.read_json_file(maintenance_file)
+        _cached_state = (file_key, state)
+    return dict(state)
+
+
 def prepare_maintenance_dict(status,
                              activated_at='',
                              remaining_executions=None,
@@ -64,37 +99,36 @@ def maintenance_mode_handler():
     if utils.is_internal_request() and is_bypass_maintenance_mode():
         return
 
+    state = get_maintenance_state()
+    if state is None:
+        return
+
     # Removing v*/ from the endpoint
     index = request.endpoint.find('/')
     request_endpoint = request.endpoint[index+1:]
-    maintenance_file = os.path.join(
-            config.instance.maintenance_folder,
-            MAINTENANCE_MODE_STATUS_FILE)
 
-    if os.path.isfile(maintenance_file):
-        state = utils.read_json_file(maintenance_file)
-        if state['status'] == MAINTENANCE_MODE_ACTIVATING:
-            running_executions = get_running_executions()
-            if not running_executions:
-                now = utils.get_formatted_timestamp()
-                state = prepare_maintenance_dict(
-                        MAINTENANCE_MODE_ACTIVATED,
-                        activated_at=now,
-                        remaining_executions=[],
-                        requested_by=state['requested_by'],
-                        activation_requested_at=state[
-                            'activation_requested_at'])
-                utils.write_dict_to_json_file(maintenance_file, state)
-            else:
-                return _handle_activating_mode(
-                       state=state,
-                       request_endpoint=request_endpoint)
-
-        if utils.check_allowed_endpoint(ALLOWED_MAINTENANCE_ENDPOINTS):
-            return
-
-        if state['status'] == MAINTENANCE_MODE_ACTIVATED:
-            return _maintenance_mode_error()
+    if state['status'] == MAINTENANCE_MODE_ACTIVATING:
+        if not has_running_executions():
+            now = utils.get_formatted_timestamp()
+            state = prepare_maintenance_dict(
+                    MAINTENANCE_MODE_ACTIVATED,
+                    activated_at=now,
+                    remaining_executions=[],
+                    requested_by=state['requested_by'],
+                    activation_requested_at=state[
+                        'activation_requested_at'])
+            utils.write_dict_to_json_file(get_maintenance_file_path(),
+                                          state)
+        else:
+            return _handle_activating_mode(
+                   state=state,
+                   request_endpoint=request_endpoint)
+
+    if utils.check_allowed_endpoint(ALLOWED_MAINTENANCE_ENDPOINTS):
+        return
+
+    if state['status'] == MAINTENANCE_MODE_ACTIVATED:
+        return _maintenance_mode_error()
 
 
 def _handle_activating_mode(state, request_endpoint):
@@ -127,18 +161,71 @@ def _return_maintenance_error(status):
 
 
 def get_running_executions():
-    executions = get_storage_manager().full_access_list(models.Execution)
-    running_executions = []
-    for execution in executions:
-        if execution.status not in ExecutionState.END_STATES:
-            running_executions.append({
-                'id': execution.id,
-                'status': execution.status,
-                'deployment_id': execution.deployment_id,
-                'workflow_id': execution.workflow_id
-            })
-
-    return running_executions
+    executions = db.session.query(
+        models.Execution.id,
+        models.Execution.status,
+        models.Deployment.id,
+        models.Execution.workflow_id
+    ).outerjoin(models.Execution.deployment).filter(
+        models.Execution.status.in_(RUNNING_EXECUTION_STATES)
+    ).order_by(models.Execution.created_at)
+    return [
+        {
+            'id': execution_id,
+            'status': status,
+            'deployment_id': deployment_id,
+            'workflow_id': workflow_id
+        }
+        for execution_id, status, deployment_id, workflow_id in executions
+    ]
+
+
+def has_running_executions():
+    """Are there executions that maintenance mode activation waits for.
+
+    A positive result is shared by all the workers for a few seconds, and
+    the check is done again as soon as any execution ends.
+    """
+    check_file = _get_running_executions_check_file_path()
+    try:
+        last_check = os.stat(check_file).st_mtime
+    except OSError:
+        last_check = 0
+    if time() - last_check < RUNNING_EXECUTIONS_CHECK_INTERVAL:
+        return True
+
+    running = db.session.query(
+        db.session.query(models.Execution).filter(
+            models.Execution.status.in_(RUNNING_EXECUTION_STATES)
+        ).exists()
+    ).scalar()
+    if running:
+        with open(check_file, 'a'):
+            os.utime(check_file, None)
+    return running
+
+
+def clear_running_executions_check():
+    """Make the next request check for running executions again"""
+    if not config.instance.maintenance_folder:
+        return
+    try:
+        os.remove(_get_running_executions_check_file_path())
+    except OSError:
+        pass
+
+
+def _get_running_executions_check_file_path():
+    return os.path.join(
+            config.instance.maintenance_folder,
+            RUNNING_EXECUTIONS_CHECK_FILE)
+
+
+@event.listens_for(models.Execution.status, 'set')
+def _execution_status_changed(target, value, oldvalue, initiator):
+    if value in ExecutionState.END_STATES \
+            and oldvalue not in ExecutionState.END_STATES:
+        clear_running_executions_check()
 
 
 def is_bypass_maintenance_mode():
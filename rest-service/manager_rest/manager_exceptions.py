@@ -53,6 +53,16 @@ class FileSyncServiceError(ManagerException):
             *args, **kwargs)
 
 
+class TooManyEventStreamsError(ManagerException):
+    TOO_MANY_EVENT_STREAMS_ERROR_CODE = 'too_many_event_streams_error'
+
+    def __init__(self, *args, **kwargs):
+        super(TooManyEventStreamsError, self).__init__(
+            503,
+            TooManyEventStreamsError.TOO_MANY_EVENT_STREAMS_ERROR_CODE,
+            *args, **kwargs)
+
+
 class MissingPremiumPackage(ManagerException):
     MISSING_PREMIUM_ERROR_CODE = 'missing_premium_package_error'
 
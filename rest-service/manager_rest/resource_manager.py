@@ -19,10 +19,13 @@ import yaml
 import shutil
 import itertools
 from copy import deepcopy
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 
 from flask import current_app
 from flask_security import current_user
+from sqlalchemy import func, or_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import lazyload
 
 from cloudify._compat import StringIO, text_type
 from cloudify.cryptography_utils import encrypt
@@ -49,20 +52,30 @@ from manager_rest.utils import (send_event,
                                 extract_host_agent_plugins_from_plan)
 from manager_rest.plugins_update.constants import PLUGIN_UPDATE_WORKFLOW
 from manager_rest.rest.rest_utils import (parse_datetime_string,
+                                          validate_inputs,
                                           RecursiveDeploymentDependencies)
 
 from manager_rest.storage import (db,
                                   get_storage_manager,
-                                  models,
-                                  get_node)
+                                  models)
 
 from . import utils
 from . import config
 from . import app_context
+from . import execution_admission
 from . import workflow_executor
 from . import manager_exceptions
 from .workflow_executor import generate_execution_token
 
+# the number of deployments stored in a single transaction by
+# create_deployments
+DEPLOYMENTS_BATCH_SIZE = 100
+
+# the plugin fields that validate_plugin_is_installed looks at
+PLUGIN_VALIDATION_FIELDS = ('package_name', 'package_version', 'distribution',
+                            'distribution_version', 'distribution_release',
+                            'supported_platform', 'install')
+
 
 class ResourceManager(object):
 
@@ -72,7 +85,8 @@ class ResourceManager(object):
 
     def list_executions(self, include=None, is_include_system_workflows=False,
                         filters=None, pagination=None, sort=None,
-                        all_tenants=False, get_all_results=False):
+                        all_tenants=False, get_all_results=False,
+                        stream=False):
         filters = filters or {}
         is_system_workflow = filters.get('is_system_workflow')
         if is_system_workflow:
@@ -82,6 +96,14 @@ class ResourceManager(object):
                 filters['is_system_workflow'].append(value)
         elif not is_include_system_workflows:
             filters['is_system_workflow'] = [False]
+        if stream:
+            return self.sm.stream(
+                models.Execution,
+                include=include,
+                filters=filters,
+                sort=sort,
+                all_tenants=all_tenants
+            )
         return self.sm.list(
             models.Execution,
             include=include,
@@ -120,22 +142,24 @@ class ResourceManager(object):
         return res
 
     def start_queued_executions(self):
-        queued_executions = self._get_queued_executions()
-        for e in queued_executions:
-            self.execute_queued_workflow(e)
-            if e.is_system_workflow:  # To avoid starvation of system workflows
-                break
-
-    def _get_queued_executions(self):
-        filters = {'status': ExecutionState.QUEUED_STATE}
-
-        queued_executions = self.list_executions(
-            is_include_system_workflows=True,
-            filters=filters,
-            all_tenants=True,
-            sort={'created_at': 'asc'}).items
+        """Start the queued executions that can run now.
 
-        return queued_executions
+        Only the executions picked by the scheduler are started (see
+        `execution_admission.get_startable_executions`), so the cost of
+        this doesn't depend on the number of queued executions that still
+        have to wait.
+        """
+        execution_admission.lock()
+        queued_executions = execution_admission.get_startable_executions(
+            config.instance.max_concurrent_executions_per_tenant)
+        for execution in queued_executions:
+            # the lock is released whenever an execution is stored, so
+            # another scheduler might have started this one in between
+            execution_admission.lock()
+            db.session.refresh(execution)
+            if execution.status != ExecutionState.QUEUED:
+                continue
+            self.execute_queued_workflow(execution)
 
     def _validate_execution_update(self, current_status, future_status):
         if current_status in ExecutionState.END_STATES:
@@ -532,6 +556,29 @@ class ResourceManager(object):
         else:
             return self.sm.delete(deployment)
 
+    def delete_deployment_events(self, deployment_id, include_logs=False,
+                                 store_before=False, range_filters=None):
+        """Start a system workflow that deletes the events of a deployment.
+
+        The workflow isn't run in the deployment's context, so that the
+        deployment's events don't include its own logs.
+        """
+        range_filters = {
+            field: {key: value.isoformat()
+                    for key, value in range_filter.items()}
+            for field, range_filter in (range_filters or {}).items()
+        }
+        return self._execute_system_workflow(
+            wf_id='delete_events',
+            task_mapping='cloudify_system_workflows.events.delete',
+            execution_parameters={
+                'deployment_id': deployment_id,
+                'include_logs': include_logs,
+                'store_before': store_before,
+                'range_filters': range_filters,
+            },
+            verify_no_executions=False)
+
     def _reset_operations(self, execution, execution_token, from_states=None):
         """Force-resume the execution: restart failed operations.
 
@@ -783,6 +830,173 @@ class ResourceManager(object):
                                       scheduled_time)
         return new_execution
 
+    def execute_workflows(self,
+                          deployment_ids,
+                          workflow_id,
+                          parameters=None,
+                          allow_custom_parameters=False,
+                          force=False,
+                          bypass_maintenance=None,
+                          dry_run=False,
+                          queue=False,
+                          wait_after_fail=600,
+                          execution_creator=None):
+        """Start the same workflow on many deployments at once.
+
+        This works like calling `execute_workflow` for every deployment,
+        but the checks are done with a few queries for all the deployments,
+        all the executions are stored in a single transaction, and their
+        tasks are sent to the mgmtworker over a single broker connection.
+        A deployment that fails a check doesn't stop the workflow from
+        starting on the other deployments.
+
+        :return: A list with a dict for every deployment, in the order of
+                 `deployment_ids`, containing either the started (or queued)
+                 execution, or the error that prevented starting it
+        """
+        execution_creator = execution_creator or current_user
+        results = OrderedDict(
+            (deployment_id, {'deployment_id': deployment_id})
+            for deployment_id in deployment_ids)
+        deployment_ids = list(results)
+        batch_filter = {'deployment_id': deployment_ids}
+        batch_size = {'size': len(deployment_ids)}
+
+        deployments = {
+            deployment.id: deployment for deployment in self.sm.list(
+                models.Deployment,
+                filters={'id': deployment_ids},
+                pagination=batch_size)
+        }
+        env_creations = {
+            execution.deployment_id: execution for execution in self.sm.list(
+                models.Execution,
+                filters=dict(batch_filter,
+                             workflow_id='create_deployment_environment'),
+                pagination=batch_size)
+        }
+        # the checks, and the commit of the new executions, run under the
+        # admission lock, like in execute_workflow
+        execution_admission.lock()
+        # a system-wide execution blocks all of the deployments the same way,
+        # so it is checked once, and raises for the whole request
+        system_exec_running = self._check_for_active_system_wide_execution(
+            queue, None, None)
+        running = defaultdict(list)
+        if not force:
+            for execution in self.list_executions(
+                    include=['id', 'deployment_id'],
+                    filters=dict(batch_filter,
+                                 status=ExecutionState.ACTIVE_STATES),
+                    is_include_system_workflows=True,
+                    stream=True):
+                running[execution.deployment_id].append(execution.id)
+        tenant_slots = None
+        limit = config.instance.max_concurrent_executions_per_tenant
+        if queue and limit:
+            tenant_slots = limit - execution_admission.count_tenant_executions(
+                utils.current_tenant.id, ExecutionState.ACTIVE_STATES)
+
+        started = []
+        for deployment_id, result in results.items():
+            try:
+                deployment = deployments.get(deployment_id)
+                if deployment is None:
+                    raise manager_exceptions.NotFoundError(
+                        'Requested `Deployment` with ID `{0}` was not found'
+                        .format(deployment_id))
+                self._validate_permitted_to_execute_global_workflow(
+                    deployment)
+                self._verify_workflow_in_deployment(workflow_id, deployment,
+                                                    deployment_id)
+                self._verify_deployment_environment_status(
+                    deployment_id, env_creations.get(deployment_id))
+                workflow = deployment.workflows[workflow_id]
+                execution_parameters = \
+                    self._merge_and_validate_execution_parameters(
+                        workflow, workflow_id, parameters,
+                        allow_custom_parameters)
+                execution_parameters = \
+                    self._get_only_user_execution_parameters(
+                        execution_parameters)
+                if running[deployment_id] and not queue:
+                    raise manager_exceptions.ExistingRunningExecutionError(
+                        'The following executions are currently running for '
+                        'this deployment: {0}. To execute this workflow '
+                        'anyway, pass "force=true"'.format(
+                            running[deployment_id]))
+            except (manager_exceptions.ManagerException, RuntimeError) as e:
+                result['error'] = str(e)
+                result['error_code'] = getattr(e, 'error_code', None)
+                continue
+
+            should_queue = system_exec_running or \
+                bool(running[deployment_id]) or \
+                (tenant_slots is not None and tenant_slots <= 0)
+            if not should_queue and tenant_slots is not None:
+                tenant_slots -= 1
+            execution = models.Execution(
+                id=str(uuid.uuid4()),
+                status=self._get_proper_status(should_queue),
+                created_at=utils.get_formatted_timestamp(),
+                creator=execution_creator,
+                workflow_id=workflow_id,
+                error='',
+                parameters=execution_parameters,
+                is_system_workflow=False,
+                is_dry_run=dry_run,
+            )
+            execution.set_deployment(deployment)
+            token = None
+            if not should_queue:
+                execution.started_at = execution.created_at
+                token, execution.token = \
+                    workflow_executor.new_execution_token()
+            db.session.add(execution)
+            result['execution'] = execution
+            started.append((execution, deployment, workflow, token))
+        self.sm._safe_commit()
+
+        batch = workflow_executor.TaskBatch()
+        for execution, deployment, workflow, token in started:
+            if execution.status == ExecutionState.QUEUED:
+                self._workflow_queued(execution)
+                continue
+            workflow_executor.execute_workflow(
+                workflow_id,
+                workflow,
+                execution_creator=execution_creator,
+                workflow_plugins=deployment.blueprint.plan[
+                    constants.WORKFLOW_PLUGINS_TO_INSTALL],
+                blueprint_id=deployment.blueprint_id,
+                deployment=deployment,
+                execution_id=execution.id,
+                execution_parameters=dict(execution.parameters),
+                bypass_maintenance=bypass_maintenance,
+                dry_run=dry_run,
+                wait_after_fail=wait_after_fail,
+                execution_token=token,
+                batch=batch)
+        batch.send()
+
+        for execution, deployment, workflow, _ in started:
+            if workflow.get('is_cascading', False):
+                for component_dep_id in \
+                        self._find_all_components_deployment_id(deployment.id):
+                    self.execute_workflow(component_dep_id,
+                                          workflow_id,
+                                          parameters=parameters,
+                                          allow_custom_parameters=(
+                                              allow_custom_parameters),
+                                          force=force,
+                                          bypass_maintenance=(
+                                              bypass_maintenance),
+                                          dry_run=dry_run,
+                                          queue=queue,
+                                          wait_after_fail=wait_after_fail,
+                                          execution_creator=execution_creator)
+        return list(results.values())
+
     @staticmethod
     def _should_use_system_workflow_executor(execution):
         """
@@ -875,23 +1089,32 @@ class ResourceManager(object):
         If the `queue` flag is False and there are running executions an
         Exception will be raised
         """
+        execution_admission.lock()
         system_exec_running = self._check_for_active_system_wide_execution(
             queue, execution, schedule)
         execution_running = self._check_for_active_executions(
             deployment_id, force, queue, schedule)
-        return system_exec_running or execution_running
+        tenant_limit_reached = self._check_for_tenant_executions_limit(queue)
+        return system_exec_running or execution_running or \
+            tenant_limit_reached
+
+    @staticmethod
+    def _check_for_tenant_executions_limit(queue):
+        """
+        If the `queue` flag is set, the execution is queued when the tenant
+        already has `max_concurrent_executions_per_tenant` active executions.
+        Without it, the limit doesn't apply.
+        """
+        limit = config.instance.max_concurrent_executions_per_tenant
+        if not queue or not limit:
+            return False
+        active = execution_admission.count_tenant_executions(
+            utils.current_tenant.id, ExecutionState.ACTIVE_STATES)
+        return active >= limit
 
     def _check_for_any_active_executions(self, queue):
-        filters = {
-            'status': ExecutionState.ACTIVE_STATES
-        }
-        executions = [
-            e.id
-            for e in self.list_executions(is_include_system_workflows=True,
-                                          filters=filters,
-                                          all_tenants=True,
-                                          get_all_results=True).items
-        ]
+        executions = execution_admission.get_executions(
+            ExecutionState.ACTIVE_STATES)
         should_queue = False
         # Execution can't currently run because other executions are running,
         # since `queue` flag is on - we will queue the execution and it will
@@ -919,26 +1142,18 @@ class ResourceManager(object):
 
         status = ExecutionState.ACTIVE_STATES if execution else \
             ExecutionState.ACTIVE_STATES + ExecutionState.QUEUED_STATE
-        filters = {
-            'status': status
-        }
-        should_queue = False
-        for e in self.list_executions(is_include_system_workflows=True,
-                                      filters=filters,
-                                      all_tenants=True,
-                                      get_all_results=True).items:
-            # When `queue` or `schedule` options are used no need to
-            # raise an exception (the execution will run later)
-            if e.deployment_id is None and (queue or scheduled):
-                should_queue = True
-                break
-            elif e.deployment_id is None:
-                raise manager_exceptions.ExistingRunningExecutionError(
-                    'You cannot start an execution if there is a running '
-                    'system-wide execution (id: {0})'
-                    .format(e.id))
-
-        return should_queue
+        system_executions = execution_admission.get_system_wide_executions(
+            status, limit=1)
+        if not system_executions:
+            return False
+        # When `queue` or `schedule` options are used no need to
+        # raise an exception (the execution will run later)
+        if queue or scheduled:
+            return True
+        raise manager_exceptions.ExistingRunningExecutionError(
+            'You cannot start an execution if there is a running '
+            'system-wide execution (id: {0})'
+            .format(system_executions[0]))
 
     @staticmethod
     def _system_workflow_modifies_db(wf_id):
@@ -948,7 +1163,8 @@ class ResourceManager(object):
         """
         return wf_id in ('create_deployment_environment',
                          'delete_deployment_environment',
-                         'uninstall_plugin')
+                         'uninstall_plugin',
+                         'delete_events')
 
     def _execute_system_workflow(self,
                                  wf_id,
@@ -1001,6 +1217,7 @@ class ResourceManager(object):
                                                'delete_deployment_environment')
 
         should_queue = False
+        execution_admission.lock()
         if self._system_workflow_modifies_db(wf_id):
             self.assert_no_snapshot_creation_running_or_queued()
 
@@ -1238,46 +1455,72 @@ class ResourceManager(object):
     def _prepare_deployment_node_instances_for_storage(self,
                                                        deployment_id,
                                                        dsl_node_instances):
+        deployment = self.sm.get(models.Deployment, deployment_id)
+        # only the columns that the node instances inherit are loaded,
+        # once for all the nodes of the deployment
+        nodes = {
+            node.id: node for node in db.session.query(
+                models.Node._storage_id,
+                models.Node.id,
+                models.Node._tenant_id,
+                models.Node._creator_id,
+                models.Node.visibility)
+            .filter(models.Node._deployment_fk == deployment._storage_id)
+        }
 
         # The index is the index of a node instance list for a
         # node. It is used for serial operations on node instances of the
-        # same node. First we get the list of current node instances for the
+        # same node. First we get the current index of every node of the
         # deployment.
-        deplyment_id_filter = self.create_filters_dict(
-            deployment_id=deployment_id)
-        all_deployment_node_instances = self.sm.list(
-            models.NodeInstance,
-            filters=deplyment_id_filter,
-            get_all_results=True
-        )
-        # We build a dictionary in order to track the current index.
         current_node_index = defaultdict(int)
-        for ni in all_deployment_node_instances:
-            if ni.index > current_node_index[ni.node_id]:
-                current_node_index[ni.node_id] = ni.index
+        if nodes:
+            current_node_index.update(
+                (node_id, index or 0) for node_id, index in
+                db.session.query(models.Node.id,
+                                 func.max(models.NodeInstance.index))
+                .join(models.NodeInstance,
+                      models.NodeInstance._node_fk == models.Node._storage_id)
+                .filter(models.Node._deployment_fk == deployment._storage_id)
+                .group_by(models.Node.id))
+
+        return self._prepare_node_instances_for_storage(
+            deployment_id, dsl_node_instances, nodes, current_node_index)
 
+    @staticmethod
+    def _prepare_node_instances_for_storage(deployment_id,
+                                            dsl_node_instances,
+                                            nodes,
+                                            current_node_index):
+        """
+        :param nodes: The nodes of the deployment, by id; only the columns
+                      that node instances inherit need to be set
+        :param current_node_index: The current index of every node, by id,
+                                   updated with the new node instances
+        """
         node_instances = []
         for node_instance in dsl_node_instances:
-            node = get_node(deployment_id, node_instance['node_id'])
+            node_id = node_instance['node_id']
+            node = nodes.get(node_id)
+            if node is None:
+                raise manager_exceptions.NotFoundError(
+                    'Requested Node with ID `{0}` on Deployment `{1}` '
+                    'was not found'.format(node_id, deployment_id)
+                )
             # Update current node index.
             index = node_instance.get(
-                'index', current_node_index[node.id] + 1)
-            current_node_index[node.id] = index
-            instance_id = node_instance['id']
-            scaling_groups = node_instance.get('scaling_groups', [])
-            relationships = node_instance.get('relationships', [])
-            host_id = node_instance.get('host_id')
+                'index', current_node_index[node_id] + 1)
+            current_node_index[node_id] = index
             instance = models.NodeInstance(
-                id=instance_id,
-                host_id=host_id,
+                id=node_instance['id'],
+                host_id=node_instance.get('host_id'),
                 index=index,
-                relationships=relationships,
+                relationships=node_instance.get('relationships', []),
                 state='uninitialized',
                 runtime_properties={},
-                version=None,
-                scaling_groups=scaling_groups
+                version=1,
+                scaling_groups=node_instance.get('scaling_groups', [])
             )
-            instance.set_node(node)
+            instance.set_node_keys(node)
             node_instances.append(instance)
 
         return node_instances
@@ -1285,56 +1528,46 @@ class ResourceManager(object):
     def _create_deployment_nodes(self,
                                  deployment_id,
                                  plan,
-                                 node_ids=None):
+                                 node_ids=None,
+                                 commit=True):
         nodes = self.prepare_deployment_nodes_for_storage(plan, node_ids)
         deployment = self.sm.get(models.Deployment, deployment_id)
 
         for node in nodes:
-            node.set_deployment(deployment)
-            self.sm.put(node)
+            node.set_deployment_keys(deployment)
+        self.sm.put_many(nodes)
+        if commit:
+            self.sm._safe_commit()
 
     def _create_deployment_node_instances(self,
                                           deployment_id,
-                                          dsl_node_instances):
+                                          dsl_node_instances,
+                                          commit=True):
         node_instances = self._prepare_deployment_node_instances_for_storage(
             deployment_id,
             dsl_node_instances)
 
-        for node_instance in node_instances:
-            self.sm.put(node_instance)
+        self.sm.put_many(node_instances)
+        if commit:
+            self.sm._safe_commit()
 
     def assert_no_snapshot_creation_running_or_queued(self):
         """
         Make sure no 'create_snapshot' workflow is currently running or queued.
         We do this to avoid DB modifications during snapshot creation.
         """
-        status = ExecutionState.ACTIVE_STATES + ExecutionState.QUEUED_STATE
-        filters = {'status': status}
-        for e in self.list_executions(is_include_system_workflows=True,
-                                      filters=filters,
-                                      get_all_results=True).items:
-            if e.workflow_id == 'create_snapshot':
-                raise manager_exceptions.ExistingRunningExecutionError(
-                    'You cannot start an execution that modifies DB state'
-                    ' while a `create_snapshot` workflow is running or queued'
-                    ' (snapshot id: {0})'.format(e.id))
-
-    def create_deployment(self,
-                          blueprint_id,
-                          deployment_id,
-                          private_resource,
-                          visibility,
-                          inputs=None,
-                          bypass_maintenance=None,
-                          skip_plugins_validation=False,
-                          site_name=None,
-                          runtime_only_evaluation=False):
-        blueprint = self.sm.get(models.Blueprint, blueprint_id)
-        plan = blueprint.plan
-        site = self.sm.get(models.Site, site_name) if site_name else None
+        snapshot_creations = execution_admission.get_executions(
+            ExecutionState.ACTIVE_STATES + ExecutionState.QUEUED_STATE,
+            workflow_id='create_snapshot', limit=1)
+        if snapshot_creations:
+            raise manager_exceptions.ExistingRunningExecutionError(
+                'You cannot start an execution that modifies DB state'
+                ' while a `create_snapshot` workflow is running or queued'
+                ' (snapshot id: {0})'.format(snapshot_creations[0]))
 
+    def _prepare_deployment_plan(self, plan, inputs, runtime_only_evaluation):
         try:
-            deployment_plan = tasks.prepare_deployment_plan(
+            return tasks.prepare_deployment_plan(
                 plan, get_secret_method, inputs,
                 runtime_only_evaluation=runtime_only_evaluation)
         except parser_exceptions.MissingRequiredInputError as e:
@@ -1352,20 +1585,35 @@ class ResourceManager(object):
             raise manager_exceptions.UnsupportedDeploymentGetSecretError(
                 str(e))
 
-        #  validate plugins exists on manager when
-        #  skip_plugins_validation is False
-        if not skip_plugins_validation:
-            plugins_list = deployment_plan.get(
-                constants.DEPLOYMENT_PLUGINS_TO_INSTALL, [])
-            # validate that all central-deployment plugins are installed
-            for plugin in plugins_list:
-                self.validate_plugin_is_installed(plugin)
-
-            # validate that all host_agent plugins are installed
-            host_agent_plugins = extract_host_agent_plugins_from_plan(
-                deployment_plan)
-            for plugin in host_agent_plugins:
-                self.validate_plugin_is_installed(plugin)
+    def _validate_deployment_plugins(self, deployment_plan, validated=None):
+        """Validate that the plugins of a deployment are installed
+
+        :param validated: The results of previous validations, by plugin;
+                          plugins found here aren't looked up again, and
+                          the new results are added
+        """
+        if validated is None:
+            validated = {}
+        #  validate that all central-deployment plugins are installed, and
+        #  that all host_agent plugins are installed
+        plugins = deployment_plan.get(
+            constants.DEPLOYMENT_PLUGINS_TO_INSTALL, []) + \
+            extract_host_agent_plugins_from_plan(deployment_plan)
+        for plugin in plugins:
+            key = tuple(plugin.get(field)
+                        for field in PLUGIN_VALIDATION_FIELDS)
+            if key not in validated:
+                try:
+                    self.validate_plugin_is_installed(plugin)
+                    validated[key] = None
+                except manager_exceptions.DeploymentPluginNotFound as e:
+                    validated[key] = e
+            if validated[key] is not None:
+                raise validated[key]
+
+    def _prepare_new_deployment(self, blueprint, deployment_id,
+                                deployment_plan, visibility, private_resource,
+                                site, runtime_only_evaluation):
         visibility = self.get_resource_visibility(models.Deployment,
                                                   deployment_id,
                                                   visibility,
@@ -1374,27 +1622,58 @@ class ResourceManager(object):
                 blueprint.visibility != VisibilityState.GLOBAL):
             raise manager_exceptions.ForbiddenError(
                 "Can't create global deployment {0} because blueprint {1} "
-                "is not global".format(deployment_id, blueprint_id)
+                "is not global".format(deployment_id, blueprint.id)
             )
         new_deployment = self.prepare_deployment_for_storage(
             deployment_id,
             deployment_plan
         )
         new_deployment.runtime_only_evaluation = runtime_only_evaluation
-        new_deployment.blueprint = blueprint
         new_deployment.visibility = visibility
-
         if site:
             validate_deployment_and_site_visibility(new_deployment, site)
+        return new_deployment
+
+    def create_deployment(self,
+                          blueprint_id,
+                          deployment_id,
+                          private_resource,
+                          visibility,
+                          inputs=None,
+                          bypass_maintenance=None,
+                          skip_plugins_validation=False,
+                          site_name=None,
+                          runtime_only_evaluation=False):
+        blueprint = self.sm.get(models.Blueprint, blueprint_id)
+        plan = blueprint.plan
+        site = self.sm.get(models.Site, site_name) if site_name else None
+
+        deployment_plan = self._prepare_deployment_plan(
+            plan, inputs, runtime_only_evaluation)
+
+        #  validate plugins exists on manager when
+        #  skip_plugins_validation is False
+        if not skip_plugins_validation:
+            self._validate_deployment_plugins(deployment_plan)
+        new_deployment = self._prepare_new_deployment(
+            blueprint, deployment_id, deployment_plan, visibility,
+            private_resource, site, runtime_only_evaluation)
+        new_deployment.blueprint = blueprint
+        if site:
             new_deployment.site = site
 
-        self.sm.put(new_deployment)
+        # the deployment, its nodes and its node instances are all stored
+        # in a single transaction
+        self.sm.put(new_deployment, commit=False)
 
-        self._create_deployment_nodes(deployment_id, deployment_plan)
+        self._create_deployment_nodes(deployment_id, deployment_plan,
+                                      commit=False)
 
         self._create_deployment_node_instances(
             deployment_id,
-            dsl_node_instances=deployment_plan['node_instances'])
+            dsl_node_instances=deployment_plan['node_instances'],
+            commit=False)
+        self.sm._safe_commit()
 
         self._create_deployment_initial_dependencies(
             deployment_plan, new_deployment)
@@ -1411,6 +1690,201 @@ class ResourceManager(object):
 
         return new_deployment
 
+    def create_deployments(self,
+                           blueprint_id,
+                           deployments,
+                           private_resource=None,
+                           visibility=None,
+                           bypass_maintenance=None,
+                           skip_plugins_validation=False,
+                           runtime_only_evaluation=False):
+        """Create many deployments of the same blueprint at once.
+
+        This works like calling `create_deployment` for every deployment,
+        but the blueprint is loaded once, every plugin is validated once,
+        and the deployments are stored DEPLOYMENTS_BATCH_SIZE at a time:
+        each batch of deployments, with their nodes, node instances and
+        environment creation executions, is inserted in bulk, in a single
+        transaction, and the environment creation tasks of the batch are
+        sent to the mgmtworker over a single broker connection. A
+        deployment that fails a check doesn't stop the others from being
+        created.
+
+        :param deployments: A list of dicts, with the `id`, and optionally
+                            the `inputs` and the `site_name`, of every
+                            deployment
+        :return: A list with a dict for every deployment, in the order of
+                 `deployments`, containing either the created deployment
+                 and its environment creation execution, or the error that
+                 prevented creating it
+        """
+        blueprint = self.sm.get(models.Blueprint, blueprint_id)
+        plan = blueprint.plan
+        self.assert_no_snapshot_creation_running_or_queued()
+
+        deployment_ids = [deployment['id'] for deployment in deployments]
+        existing = {
+            deployment_id for deployment_id, in db.session.query(
+                models.Deployment.id)
+            .filter(models.Deployment.id.in_(deployment_ids),
+                    or_(models.Deployment._tenant_id ==
+                        utils.current_tenant.id,
+                        models.Deployment.visibility ==
+                        VisibilityState.GLOBAL))
+        }
+        sites = {}
+        validated_plugins = {}
+        results = []
+        prepared = []
+        for deployment in deployments:
+            deployment_id = deployment['id']
+            result = {'deployment_id': deployment_id}
+            results.append(result)
+            try:
+                validate_inputs({'deployment_id': deployment_id})
+                if deployment_id in existing:
+                    raise manager_exceptions.ConflictError(
+                        'Deployment {0} already exists on {1} or with '
+                        'global visibility'.format(deployment_id,
+                                                   utils.current_tenant))
+                existing.add(deployment_id)
+                site_name = deployment.get('site_name')
+                if site_name and site_name not in sites:
+                    validate_inputs({'site_name': site_name})
+                    sites[site_name] = self.sm.get(models.Site, site_name)
+                site = sites.get(site_name)
+                deployment_plan = self._prepare_deployment_plan(
+                    plan, deployment.get('inputs'), runtime_only_evaluation)
+                if not skip_plugins_validation:
+                    self._validate_deployment_plugins(deployment_plan,
+                                                      validated_plugins)
+                new_deployment = self._prepare_new_deployment(
+                    blueprint, deployment_id, deployment_plan, visibility,
+                    private_resource, site, runtime_only_evaluation)
+            except manager_exceptions.ManagerException as e:
+                result['error'] = str(e)
+                result['error_code'] = getattr(e, 'error_code', None)
+                continue
+            new_deployment._blueprint_fk = blueprint._storage_id
+            new_deployment._site_fk = site._storage_id if site else None
+            new_deployment._tenant_id = utils.current_tenant.id
+            new_deployment._creator_id = current_user.id
+            prepared.append((result, new_deployment, deployment_plan))
+
+        dep_graph = None
+        for start in range(0, len(prepared), DEPLOYMENTS_BATCH_SIZE):
+            batch = prepared[start:start + DEPLOYMENTS_BATCH_SIZE]
+            if dep_graph is None and any(
+                    deployment_plan.get(INTER_DEPLOYMENT_FUNCTIONS)
+                    for _, _, deployment_plan in batch):
+                dep_graph = RecursiveDeploymentDependencies(self.sm)
+                dep_graph.create_dependencies_graph()
+            try:
+                self._create_deployments_batch(batch, dep_graph,
+                                               bypass_maintenance)
+            except (manager_exceptions.ManagerException,
+                    SQLAlchemyError) as e:
+                db.session.rollback()
+                for result, _, _ in batch:
+                    result['error'] = str(e)
+                    result['error_code'] = getattr(e, 'error_code', None)
+        return results
+
+    def _create_deployments_batch(self, batch, dep_graph, bypass_maintenance):
+        """Store a batch of prepared deployments, in a single transaction.
+
+        :param batch: A list of (result, deployment, deployment plan) tuples,
+                      the results are updated with the created deployments
+                      and their environment creation executions
+        """
+        execution_admission.lock()
+        self.assert_no_snapshot_creation_running_or_queued()
+        storage_ids = dict(self.sm.put_many(
+            [deployment for _, deployment, _ in batch],
+            returning=[models.Deployment.id, models.Deployment._storage_id]))
+
+        deployments_nodes = []
+        for _, deployment, deployment_plan in batch:
+            deployment._storage_id = storage_ids[deployment.id]
+            nodes = self.prepare_deployment_nodes_for_storage(
+                deployment_plan)
+            for node in nodes:
+                node.set_deployment_keys(deployment)
+            deployments_nodes.append(nodes)
+        all_nodes = [node for nodes in deployments_nodes for node in nodes]
+        node_storage_ids = {
+            (deployment_fk, node_id): storage_id
+            for deployment_fk, node_id, storage_id in self.sm.put_many(
+                all_nodes, returning=[models.Node._deployment_fk,
+                                      models.Node.id,
+                                      models.Node._storage_id])
+        }
+        for node in all_nodes:
+            node._storage_id = node_storage_ids[
+                (node._deployment_fk, node.id)]
+
+        node_instances = []
+        for (_, deployment, deployment_plan), nodes in zip(
+                batch, deployments_nodes):
+            node_instances += self._prepare_node_instances_for_storage(
+                deployment.id, deployment_plan['node_instances'],
+                {node.id: node for node in nodes}, defaultdict(int))
+        self.sm.put_many(node_instances)
+
+        stored = {
+            deployment.id: deployment for deployment in
+            models.Deployment.query.filter(
+                models.Deployment._storage_id.in_(storage_ids.values()))
+        }
+        environment_creations = []
+        for result, deployment, deployment_plan in batch:
+            deployment = stored[deployment.id]
+            if deployment_plan.get(INTER_DEPLOYMENT_FUNCTIONS):
+                self._create_deployment_initial_dependencies(
+                    deployment_plan, deployment, dep_graph=dep_graph,
+                    commit=False)
+            parameters = self._get_only_user_execution_parameters(
+                self._get_deployment_environment_parameters(deployment_plan))
+            now = utils.get_formatted_timestamp()
+            execution = models.Execution(
+                id=str(uuid.uuid4()),
+                status=ExecutionState.PENDING,
+                created_at=now,
+                started_at=now,
+                creator=current_user,
+                workflow_id='create_deployment_environment',
+                error='',
+                parameters=parameters,
+                is_system_workflow=False)
+            execution.set_deployment(deployment)
+            token, execution.token = workflow_executor.new_execution_token()
+            db.session.add(execution)
+            environment_creations.append(
+                (result, deployment, execution, parameters, token))
+        self.sm._safe_commit()
+
+        # reload the deployments, that were expired by the commit, at once
+        models.Deployment.query.filter(
+            models.Deployment._storage_id.in_(storage_ids.values())).all()
+        task_batch = workflow_executor.TaskBatch()
+        for result, deployment, execution, parameters, token in \
+                environment_creations:
+            workflow_executor.execute_system_workflow(
+                wf_id='create_deployment_environment',
+                task_id=execution.id,
+                task_mapping='cloudify_system_workflows.'
+                             'deployment_environment.create',
+                deployment=deployment,
+                execution_parameters=parameters,
+                bypass_maintenance=bypass_maintenance,
+                is_system_workflow=False,
+                execution_creator=current_user,
+                execution_token=token,
+                batch=task_batch)
+            result['deployment'] = deployment
+            result['execution'] = execution
+        task_batch.send()
+
     def validate_plugin_is_installed(self, plugin):
         """
         This method checks if a plugin is already installed on the manager,
@@ -1475,33 +1949,34 @@ class ResourceManager(object):
                     'started deployment modifications: {0}'
                     .format(active_modifications))
 
+        nodes, instances = self._load_deployment_nodes(deployment)
+        node_dicts = [node.to_dict() for node in nodes.values()]
+        node_instances = [instance.to_dict()
+                          for instance in instances.values()]
+
         # We need to store the pre-modification state here so that it can be
         # used to roll back correctly on error.
         # We have to deepcopy it because it contains a lot of mutable children
         # which will then (sometimes) be modified by the other methods and
         # result in a rollback that breaks the deployment and snapshots.
-        pre_modification = [
-            deepcopy(instance.to_dict()) for instance in
-            self.sm.list(models.NodeInstance,
-                         filters=deployment_id_filter,
-                         get_all_results=True)]
-
-        nodes = [node.to_dict() for node
-                 in self.sm.list(models.Node, filters=deployment_id_filter,
-                                 get_all_results=True)]
-        node_instances = [instance.to_dict() for instance
-                          in self.sm.list(models.NodeInstance,
-                                          filters=deployment_id_filter,
-                                          get_all_results=True)]
+        pre_modification = deepcopy(node_instances)
 
         node_instances_modification = tasks.modify_deployment(
-            nodes=nodes,
-            previous_nodes=nodes,
+            nodes=node_dicts,
+            previous_nodes=node_dicts,
             previous_node_instances=node_instances,
             modified_nodes=modified_nodes,
             scaling_groups=deployment.scaling_groups)
         node_instances_modification['before_modification'] = pre_modification
 
+        # The current index of every node, for the added node instances
+        current_node_index = defaultdict(int)
+        for node in nodes.values():
+            current_node_index[node.id] = max(
+                [instance.index or 0 for instance in node.instances] or [0])
+
+        # The modification, the nodes, and the added and related node
+        # instances are all stored in a single transaction
         now = utils.get_formatted_timestamp()
         modification_id = str(uuid.uuid4())
         modification = models.DeploymentModification(
@@ -1513,7 +1988,7 @@ class ResourceManager(object):
             node_instances=node_instances_modification,
             context=context)
         modification.set_deployment(deployment)
-        self.sm.put(modification)
+        self.sm.put(modification, commit=False)
 
         scaling_groups = deepcopy(deployment.scaling_groups)
         for node_id, modified_node in modified_nodes.items():
@@ -1523,51 +1998,49 @@ class ResourceManager(object):
                 })
                 deployment.scaling_groups = scaling_groups
             else:
-                node = get_node(modification.deployment_id, node_id)
+                node = self._get_loaded_node(nodes, deployment_id, node_id)
                 node.planned_number_of_instances = modified_node['instances']
-                self.sm.update(node)
-        self.sm.update(deployment)
+                self.sm.update(node, commit=False)
+        self.sm.update(deployment, commit=False)
 
         added_and_related = node_instances_modification['added_and_related']
-        added_node_instances = []
-        for node_instance in added_and_related:
-            if node_instance.get('modification') == 'added':
-                added_node_instances.append(node_instance)
-            else:
-                node = get_node(
-                    deployment_id=deployment_id,
-                    node_id=node_instance['node_id']
-                )
-                target_names = [r['target_id'] for r in node.relationships]
-                current = self.sm.get(models.NodeInstance, node_instance['id'])
-                current_relationship_groups = {
-                    target_name: list(group)
-                    for target_name, group in itertools.groupby(
-                        current.relationships,
-                        key=lambda r: r['target_name'])
-                }
-                new_relationship_groups = {
-                    target_name: list(group)
-                    for target_name, group in itertools.groupby(
-                        node_instance['relationships'],
-                        key=lambda r: r['target_name'])
-                }
-                new_relationships = []
-                for target_name in target_names:
-                    new_relationships += current_relationship_groups.get(
-                        target_name, [])
-                    new_relationships += new_relationship_groups.get(
-                        target_name, [])
-                instance = self.sm.get(
-                    models.NodeInstance,
-                    node_instance['id'],
-                    locking=True
-                )
-                instance.relationships = deepcopy(new_relationships)
-                instance.version += 1
-                self.sm.update(instance)
-        self._create_deployment_node_instances(deployment_id,
-                                               added_node_instances)
+        added_node_instances = [
+            node_instance for node_instance in added_and_related
+            if node_instance.get('modification') == 'added']
+        related_node_instances = [
+            node_instance for node_instance in added_and_related
+            if node_instance.get('modification') != 'added']
+        # only the related node instances are locked, all at once
+        current_instances = self._get_node_instances_for_update(
+            node_instance['id'] for node_instance in related_node_instances)
+        for node_instance in related_node_instances:
+            node = self._get_loaded_node(nodes, deployment_id,
+                                         node_instance['node_id'])
+            target_names = [r['target_id'] for r in node.relationships]
+            current = current_instances[node_instance['id']]
+            current_relationship_groups = {
+                target_name: list(group)
+                for target_name, group in itertools.groupby(
+                    current.relationships,
+                    key=lambda r: r['target_name'])
+            }
+            new_relationship_groups = {
+                target_name: list(group)
+                for target_name, group in itertools.groupby(
+                    node_instance['relationships'],
+                    key=lambda r: r['target_name'])
+            }
+            new_relationships = []
+            for target_name in target_names:
+                new_relationships += current_relationship_groups.get(
+                    target_name, [])
+                new_relationships += new_relationship_groups.get(
+                    target_name, [])
+            current.relationships = deepcopy(new_relationships)
+            current.version += 1
+        self.sm.put_many(self._prepare_node_instances_for_storage(
+            deployment_id, added_node_instances, nodes, current_node_index))
+        self.sm._safe_commit()
         return modification
 
     def finish_deployment_modification(self, modification_id):
@@ -1584,6 +2057,9 @@ class ResourceManager(object):
         deployment = self.sm.get(models.Deployment, modification.deployment_id)
 
         modified_nodes = modification.modified_nodes
+        nodes = self._get_deployment_nodes(
+            deployment, [node_id for node_id in modified_nodes
+                         if node_id not in deployment.scaling_groups])
         scaling_groups = deepcopy(deployment.scaling_groups)
         for node_id, modified_node in modified_nodes.items():
             if node_id in deployment.scaling_groups:
@@ -1592,20 +2068,20 @@ class ResourceManager(object):
                 })
                 deployment.scaling_groups = scaling_groups
             else:
-                node = get_node(modification.deployment_id, node_id)
+                node = self._get_loaded_node(nodes, deployment.id, node_id)
                 node.number_of_instances = modified_node['instances']
-                self.sm.update(node)
-        self.sm.update(deployment)
-
-        node_instances = modification.node_instances
-        for node_instance_dict in node_instances['removed_and_related']:
-            instance = self.sm.get(
-                models.NodeInstance,
-                node_instance_dict['id'],
-                locking=True
-            )
+                self.sm.update(node, commit=False)
+        self.sm.update(deployment, commit=False)
+
+        removed_and_related = modification.node_instances[
+            'removed_and_related']
+        instances = self._get_node_instances_for_update(
+            node_instance_dict['id']
+            for node_instance_dict in removed_and_related)
+        for node_instance_dict in removed_and_related:
+            instance = instances[node_instance_dict['id']]
             if node_instance_dict.get('modification') == 'removed':
-                self.sm.delete(instance)
+                self.sm.delete(instance, commit=False)
             else:
                 removed_relationship_target_ids = set(
                     [rel['target_id']
@@ -1616,7 +2092,6 @@ class ResourceManager(object):
                                      not in removed_relationship_target_ids]
                 instance.relationships = deepcopy(new_relationships)
                 instance.version += 1
-                self.sm.update(instance)
 
         modification.status = DeploymentModificationState.FINISHED
         modification.ended_at = utils.get_formatted_timestamp()
@@ -1636,28 +2111,28 @@ class ResourceManager(object):
                                         modification.status))
 
         deployment = self.sm.get(models.Deployment, modification.deployment_id)
+        nodes, instances = self._load_deployment_nodes(deployment)
 
-        deployment_id_filter = self.create_filters_dict(
-            deployment_id=modification.deployment_id)
-        node_instances = self.sm.list(
-            models.NodeInstance,
-            filters=deployment_id_filter,
-            get_all_results=True
-        )
         modified_instances = deepcopy(modification.node_instances)
         modified_instances['before_rollback'] = [
-            instance.to_dict() for instance in node_instances]
-        for instance in node_instances:
-            self.sm.delete(instance)
-        for instance_dict in modified_instances['before_modification']:
-            self.add_node_instance_from_dict(instance_dict)
-        nodes_num_instances = {
-            node.id: node for node in self.sm.list(
-                models.Node,
-                filters=deployment_id_filter,
-                include=['id', 'number_of_instances'],
-                get_all_results=True)
-        }
+            instance.to_dict() for instance in instances.values()]
+
+        # All the node instances are replaced by the ones from before the
+        # modification, in the same transaction as the rest of the rollback
+        if nodes:
+            (
+                db.session.query(models.NodeInstance)
+                .filter(models.NodeInstance._node_fk.in_(
+                    [node._storage_id for node in nodes.values()]))
+                .delete(synchronize_session=False)
+            )
+        self.sm.put_many([
+            self._node_instance_from_dict(
+                instance_dict,
+                self._get_loaded_node(nodes, deployment.id,
+                                      instance_dict['node_id']))
+            for instance_dict in modified_instances['before_modification']
+        ])
 
         scaling_groups = deepcopy(deployment.scaling_groups)
         for node_id, modified_node in modification.modified_nodes.items():
@@ -1666,11 +2141,10 @@ class ResourceManager(object):
                 props['planned_instances'] = props['current_instances']
                 deployment.scaling_groups = scaling_groups
             else:
-                node = get_node(modification.deployment_id, node_id)
-                node.planned_number_of_instances = nodes_num_instances[
-                    node_id].number_of_instances
-                self.sm.update(node)
-        self.sm.update(deployment)
+                node = self._get_loaded_node(nodes, deployment.id, node_id)
+                node.planned_number_of_instances = node.number_of_instances
+                self.sm.update(node, commit=False)
+        self.sm.update(deployment, commit=False)
 
         modification.status = DeploymentModificationState.ROLLEDBACK
         modification.ended_at = utils.get_formatted_timestamp()
@@ -1678,36 +2152,140 @@ class ResourceManager(object):
         self.sm.update(modification)
         return modification
 
-    def add_node_instance_from_dict(self, instance_dict):
+    @staticmethod
+    def _load_deployment_nodes(deployment):
+        """Load all the nodes and node instances of a deployment at once
+
+        The node instances are loaded along with the nodes (see
+        `Node.instances`), so this takes two queries no matter how many
+        nodes and node instances the deployment has.
+
+        :return: The nodes, and the node instances, both by id and in the
+                 order they were created
+        """
+        nodes = OrderedDict(
+            (node.id, node) for node in
+            models.Node.query
+            .filter(models.Node._deployment_fk == deployment._storage_id)
+            .order_by(models.Node._storage_id))
+        instances = OrderedDict(
+            (instance.id, instance) for instance in sorted(
+                (instance for node in nodes.values()
+                 for instance in node.instances),
+                key=lambda instance: instance._storage_id))
+        return nodes, instances
+
+    @staticmethod
+    def _get_deployment_nodes(deployment, node_ids):
+        """The nodes of a deployment with the given ids, by id
+
+        Unlike `_load_deployment_nodes`, the node instances aren't loaded.
+        """
+        if not node_ids:
+            return {}
+        return {
+            node.id: node for node in
+            models.Node.query
+            .options(lazyload(models.Node.instances))
+            .filter(models.Node._deployment_fk == deployment._storage_id,
+                    models.Node.id.in_(node_ids))
+        }
+
+    @staticmethod
+    def _get_loaded_node(nodes, deployment_id, node_id):
+        try:
+            return nodes[node_id]
+        except KeyError:
+            raise manager_exceptions.NotFoundError(
+                'Requested Node with ID `{0}` on Deployment `{1}` '
+                'was not found'.format(node_id, deployment_id)
+            )
+
+    def _get_node_instances_for_update(self, instance_ids):
+        """Lock the node instances with the given ids, using a single query
+
+        :return: The node instances, by id
+        """
+        instance_ids = list(instance_ids)
+        if not instance_ids:
+            return {}
+        instances = {
+            instance.id: instance for instance in self.sm.get_many(
+                models.NodeInstance, instance_ids, locking=True)
+        }
+        for instance_id in instance_ids:
+            if instance_id not in instances:
+                raise manager_exceptions.NotFoundError(
+                    'Requested `NodeInstance` with ID `{0}` was not found'
+                    .format(instance_id))
+        return instances
+
+    def update_node_instances(self, updates):
+        """Update many node instances in a single transaction
+
+        Every update is a dict like the body of a single node instance
+        PATCH: the node instance `id` and `version`, and optionally the new
+        `runtime_properties` and/or `state`. An update with a version older
+        than the current one is reported as a conflict, and the other
+        updates are still applied. All the rows are locked by a single
+        query, so their versions can't change between the check and the
+        commit.
+
+        :return: A list of dicts with the `id` and new `version` of every
+                 updated node instance, in the order of `updates`; failed
+                 updates have an `error_code` instead, and the current
+                 version, if the node instance exists
+        """
+        instances = {
+            instance.id: instance for instance in self.sm.get_many(
+                models.NodeInstance,
+                [update['id'] for update in updates],
+                locking=True)
+        }
+        results = []
+        for update in updates:
+            result = {'id': update['id']}
+            results.append(result)
+            instance = instances.get(update['id'])
+            if instance is None:
+                result['error_code'] = \
+                    manager_exceptions.NotFoundError.NOT_FOUND_ERROR_CODE
+                continue
+            # Added for backwards compatibility with older client versions
+            # that had version=0 by default
+            if instance.version > (update['version'] or 1):
+                result['error_code'] = \
+                    manager_exceptions.ConflictError.CONFLICT_ERROR_CODE
+                continue
+            if 'runtime_properties' in update:
+                instance.runtime_properties = update['runtime_properties']
+            if 'state' in update:
+                instance.state = update['state']
+
+        # `version_id_col` bumps the versions on flush; read them before the
+        # commit expires the instances, which would reload each one
+        db.session.flush()
+        for result in results:
+            if result['id'] in instances:
+                result['version'] = instances[result['id']].version
+        self.sm._safe_commit()
+        return results
+
+    @staticmethod
+    def _node_instance_from_dict(instance_dict, node):
+        """Recreate a node instance from its `to_dict`, for `put_many`
+
+        The version is kept as it is, because `put_many` doesn't go
+        through `version_id_col`.
+        """
+        instance_dict = dict(instance_dict)
         # Remove the IDs from the dict - they don't have comparable columns
-        deployment_id = instance_dict.pop('deployment_id')
-        node_id = instance_dict.pop('node_id')
-        tenant_name = instance_dict.pop('tenant_name')
-        created_by = instance_dict.pop('created_by')
-        resource_availability = instance_dict.pop('resource_availability')
-        private_resource = instance_dict.pop('private_resource')
-
-        # Link the node instance object to to the node, and add it to the DB
-        new_node_instance = models.NodeInstance(**instance_dict)
-        node = get_node(deployment_id, node_id)
-        new_node_instance.set_node(node)
-        self.sm.put(new_node_instance)
-
-        # Manually update version, because of how `version_id_col` works in
-        # SQLAlchemy (it is set to 1 automatically)
-        new_node_instance.version = instance_dict['version']
-        self.sm.update(new_node_instance)
-
-        # Return the IDs to the dict for later use
-        instance_dict['deployment_id'] = deployment_id
-        instance_dict['node_id'] = node_id
-        instance_dict['tenant_name'] = tenant_name
-        instance_dict['created_by'] = created_by
-
-        # resource_availability and private_resource are deprecated.
-        # For backwards compatibility - adding it to the response.
-        instance_dict['resource_availability'] = resource_availability
-        instance_dict['private_resource'] = private_resource
+        for field in ('deployment_id', 'node_id', 'tenant_name', 'created_by',
+                      'resource_availability', 'private_resource'):
+            instance_dict.pop(field, None)
+        instance = models.NodeInstance(**instance_dict)
+        instance.set_node_keys(node)
+        return instance
 
     def create_operation(self, id, name, dependencies,
                          parameters, type, graph_id=None,
@@ -1894,7 +2472,11 @@ class ResourceManager(object):
              self.sm.list(models.Execution, filters=deployment_id_filter)
              if execution.workflow_id == 'create_deployment_environment'),
             None)
+        self._verify_deployment_environment_status(deployment_id,
+                                                   env_creation)
 
+    @staticmethod
+    def _verify_deployment_environment_status(deployment_id, env_creation):
         if not env_creation:
             raise RuntimeError('Failed to find "create_deployment_environment"'
                                ' execution for deployment {0}'.format(
@@ -1949,21 +2531,26 @@ class ResourceManager(object):
             task_mapping=deployment_env_creation_task_name,
             deployment=deployment,
             bypass_maintenance=bypass_maintenance,
-            execution_parameters={
-                'deployment_plugins_to_install': deployment_plan[
-                    constants.DEPLOYMENT_PLUGINS_TO_INSTALL],
-                'workflow_plugins_to_install': deployment_plan[
-                    constants.WORKFLOW_PLUGINS_TO_INSTALL],
-                'policy_configuration': {
-                    'policy_types': deployment_plan[constants.POLICY_TYPES],
-                    'policy_triggers':
-                        deployment_plan[constants.POLICY_TRIGGERS],
-                    'groups': deployment_plan[constants.GROUPS],
-                    'api_token': current_user.api_token
-                }
-            }
+            execution_parameters=self._get_deployment_environment_parameters(
+                deployment_plan)
         )
 
+    @staticmethod
+    def _get_deployment_environment_parameters(deployment_plan):
+        return {
+            'deployment_plugins_to_install': deployment_plan[
+                constants.DEPLOYMENT_PLUGINS_TO_INSTALL],
+            'workflow_plugins_to_install': deployment_plan[
+                constants.WORKFLOW_PLUGINS_TO_INSTALL],
+            'policy_configuration': {
+                'policy_types': deployment_plan[constants.POLICY_TYPES],
+                'policy_triggers':
+                    deployment_plan[constants.POLICY_TRIGGERS],
+                'groups': deployment_plan[constants.GROUPS],
+                'api_token': current_user.api_token
+            }
+        }
+
     def _delete_deployment_environment(self,
                                        deployment,
                                        bypass_maintenance,
@@ -1991,22 +2578,13 @@ class ResourceManager(object):
     def _check_for_active_executions(self, deployment_id, force,
                                      queue, schedule):
 
-        def _get_running_executions(deployment_id=None, include_system=True):
-            deployment_id_filter = self.create_filters_dict(
-                deployment_id=deployment_id,
-                status=ExecutionState.ACTIVE_STATES)
-            executions = self.list_executions(
-                filters=deployment_id_filter,
-                is_include_system_workflows=include_system).items
-            return [e.id for e in executions if
-                    self.sm.get(models.Execution, e.id).status
-                    not in ExecutionState.END_STATES]
-
         should_queue = False
 
         # validate no execution is currently in progress
         if not force:
-            running = _get_running_executions(deployment_id)
+            running = execution_admission.get_deployment_executions(
+                deployment_id, utils.current_tenant.id,
+                ExecutionState.ACTIVE_STATES)
 
             # Execution can't currently run since other executions are running.
             # `queue` flag is on - we will queue the execution and it will
@@ -2201,12 +2779,15 @@ class ResourceManager(object):
 
     def _create_deployment_initial_dependencies(self,
                                                 deployment_plan,
-                                                source_deployment):
+                                                source_deployment,
+                                                dep_graph=None,
+                                                commit=True):
         new_dependencies = deployment_plan.setdefault(
             INTER_DEPLOYMENT_FUNCTIONS, {})
 
-        dep_graph = RecursiveDeploymentDependencies(self.sm)
-        dep_graph.create_dependencies_graph()
+        if dep_graph is None:
+            dep_graph = RecursiveDeploymentDependencies(self.sm)
+            dep_graph.create_dependencies_graph()
 
         for func_id, target_deployment in new_dependencies.items():
             target_deployment_instance = \
@@ -2220,7 +2801,7 @@ class ResourceManager(object):
                 dependency_creator=func_id,
                 source_deployment=source_deployment,
                 target_deployment=target_deployment_instance,
-                created_at=now))
+                created_at=now), commit=commit)
             if source_deployment and target_deployment_instance:
                 source_id = str(source_deployment.id)
                 target_id = str(target_deployment_instance.id)
@@ -2248,7 +2829,8 @@ def _create_task_mapping():
         'create_deployment_environment':
             'cloudify_system_workflows.deployment_environment.create',
         'delete_deployment_environment':
-            'cloudify_system_workflows.deployment_environment.delete'
+            'cloudify_system_workflows.deployment_environment.delete',
+        'delete_events': 'cloudify_system_workflows.events.delete'
     }
     return mapping
 
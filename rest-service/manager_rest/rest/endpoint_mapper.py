@@ -39,7 +39,9 @@ def setup_resources(api):
         'SnapshotsStatus': 'snapshot-status',
         'Executions': 'executions',
         'ExecutionsId': 'executions/<string:execution_id>',
+        'ExecutionsBulk': 'executions/bulk',
         'Deployments': 'deployments',
+        'DeploymentsBulk': 'deployments/bulk',
         'DeploymentsId': 'deployments/<string:deployment_id>',
         'DeploymentsSetSite': 'deployments/<string:deployment_id>/set-site',
         'DeploymentsIdOutputs': 'deployments/<string:deployment_id>/outputs',
@@ -122,6 +124,7 @@ def setup_resources(api):
         'TasksGraphs': 'tasks_graphs',
         'TasksGraphsId': 'tasks_graphs/<string:tasks_graph_id>',
         'ExecutionsCheck': 'executions/<execution_id>/should-start',
+        'EventsStream': 'events/stream',
         'RabbitMQBrokers': 'brokers',
         'DBNodes': 'db-nodes',
         'RabbitMQBrokersId': 'brokers/<string:name>',
@@ -14,14 +14,20 @@
 #  * limitations under the License.
 #
 
+import json
+import base64
+import operator
 from functools import reduce
+from itertools import chain
 
 from sqlalchemy import (
+    and_ as sql_and,
     asc,
     bindparam,
     desc,
     literal_column,
-    or_ as sql_or
+    or_ as sql_or,
+    type_coerce,
 )
 from toolz import dicttoolz
 
@@ -32,6 +38,8 @@ from manager_rest.rest.rest_decorators import insecure_rest_method
 from manager_rest.security import SecuredResource
 from manager_rest.security.authorization import authorize
 from manager_rest.storage.models_base import db
+from manager_rest.storage.storage_manager import (COUNT_EXACT,
+                                                  SQLStorageManager)
 from manager_rest.storage.resource_models import (
     Blueprint,
     Deployment,
@@ -72,6 +80,12 @@ class Events(SecuredResource):
         'message.text': 'message',
     }
 
+    # Events and logs with the same timestamp are ordered by type, and then
+    # by _storage_id (see _select_merged)
+    EVENT_MODELS = (Event, Log)
+    MERGE_SORT_FIELDS = ('timestamp', 'reported_timestamp')
+    SORT_VALUE_LABEL = '_sort_value'
+
     @staticmethod
     def _apply_filters(query, model, filters):
         """Apply filters to the query.
@@ -186,6 +200,9 @@ class Events(SecuredResource):
     def _apply_range_filter(query, model, field, range_filter):
         """Apply a range filter to query.
 
+        The events and logs tables are partitioned by `timestamp`, so a
+        range filter on `timestamp` only scans the partitions in range.
+
         :param query: Query in which the filtering should be applied
         :type query: :class:`sqlalchemy.orm.query.Query`
         :param model: Model to use to apply the filtering
@@ -207,7 +224,8 @@ class Events(SecuredResource):
         return query
 
     @staticmethod
-    def _build_select_query(filters, sort, range_filters, tenant_id):
+    def _build_select_query(filters, sort, range_filters, tenant_id,
+                            count_mode=COUNT_EXACT):
         """Build query used to list events for a given execution.
 
         :param filters:
@@ -239,39 +257,39 @@ class Events(SecuredResource):
             `@` inherited from the old Elasticsearch implementation):
                 {'timestamp': {'from': <iso8601-date>, 'to': <iso8601-date>}}
         :type range_filters: dict(str, str)
+        :param count_mode:
+            How to count the total, see `SQLStorageManager._count_results`
+        :type count_mode: str
         :returns:
             A SQL query that returns the events found that match the conditions
-            passed as arguments.
-        :rtype: :class:`sqlalchemy.orm.query.Query`
+            passed as arguments, and their total (None if it wasn't counted).
+        :rtype: tuple(:class:`sqlalchemy.orm.query.Query`, int)
 
         """
         assert isinstance(filters, dict), \
             'Filters is expected to be a dictionary'
 
-        subqueries = []
-        if (('type' not in filters or 'cloudify_event' in filters['type']) and
-                ('level' not in filters)):
-            events_query = Events._build_select_subquery(
-                Event, filters, range_filters, tenant_id)
-            subqueries.append(events_query)
-
-        if (('type' not in filters or 'cloudify_log' in filters['type']) and
-                ('event_type' not in filters)):
-            logs_query = Events._build_select_subquery(
-                Log, filters, range_filters, tenant_id)
-            subqueries.append(logs_query)
+        subqueries = [
+            Events._build_select_subquery(
+                model, filters, range_filters, tenant_id)
+            for model in Events._get_event_models(filters)
+        ]
 
         if subqueries:
             query = reduce(
                 lambda left, right: left.union_all(right),
                 subqueries,
             )
-            total = query.count()
+            total = SQLStorageManager._count_results(query, None, count_mode)
             query = Events._apply_sort(query, sort)
             if sort:
                 _, sort_direction = dict(sort).popitem()
             else:
                 sort_direction = 'asc'
+            # ties are broken the same way as in _select_merged: events
+            # before logs (as 'cloudify_event' < 'cloudify_log'), then by
+            # _storage_id, which isn't unique across the two tables
+            query = Events._apply_sort(query, {'type': sort_direction})
             query = Events._apply_sort(query, {'_storage_id': sort_direction})
             query = (
                 query
@@ -285,10 +303,157 @@ class Events(SecuredResource):
                 db.session.query(Event.timestamp)
                 .filter(Event.timestamp is None)
             )
-            total = query.count()
+            total = SQLStorageManager._count_results(query, None, count_mode)
 
         return query, total
 
+    @staticmethod
+    def _get_event_models(filters):
+        """The models (Event and/or Log) that the filters select from"""
+        models = []
+        if (('type' not in filters or 'cloudify_event' in filters['type']) and
+                ('level' not in filters)):
+            models.append(Event)
+        if (('type' not in filters or 'cloudify_log' in filters['type']) and
+                ('event_type' not in filters)):
+            models.append(Log)
+        return models
+
+    @staticmethod
+    def _get_merge_sort(sort):
+        """Return the sort field and direction, if _select_merged supports it
+
+        :returns: A (field, 'asc' or 'desc') tuple, or None for sorts that
+                  need the union query (see _build_select_query)
+        """
+        if not sort:
+            return 'timestamp', 'asc'
+        if len(sort) != 1:
+            return None
+        field, direction = list(sort.items())[0]
+        field = field.lstrip('@')
+        if field not in Events.MERGE_SORT_FIELDS:
+            return None
+        return field, direction
+
+    @staticmethod
+    def _select_merged(filters, sort_field, sort_direction, range_filters,
+                       tenant_id, pagination):
+        """List events and logs sorted by a timestamp, without a UNION.
+
+        Events and logs are queried separately, each ordered by
+        (<sort_field>, _storage_id) and limited to the requested page, so
+        that both queries can be served by the
+        (_execution_fk, timestamp, _storage_id) indexes; the two results are
+        then merged.
+
+        Pages are selected either by `offset`, or by a `cursor` - the
+        `next_cursor` returned with the previous page, which is cheaper for
+        large offsets. The total is counted per table according to the
+        `count` pagination parameter, so it can be skipped or capped.
+
+        :returns: A tuple of the page of results, the total (None if it
+                  wasn't counted), and the next cursor (None if a cursor
+                  wasn't requested, or there are no more results)
+        """
+        size = pagination.get('size', Events.DEFAULT_SEARCH_SIZE)
+        offset = pagination.get('offset', 0)
+        cursor = pagination.get('cursor')
+        if cursor and offset:
+            raise manager_exceptions.BadParametersError(
+                '`_offset` can not be used together with `_cursor`')
+        last = _decode_events_cursor(cursor) if cursor else None
+        descending = sort_direction == 'desc'
+        order = desc if descending else asc
+
+        filters = dict(filters)
+        execution_fks = None
+        if 'execution_id' in filters:
+            # filter by the foreign key directly, so that the indexes
+            # can be used for ordering
+            execution_fks = [
+                storage_id for storage_id, in
+                db.session.query(Execution._storage_id)
+                .filter(Execution.id.in_(filters.pop('execution_id')))
+            ]
+            if not execution_fks:
+                return [], 0, None
+
+        count_mode = pagination.get('count', COUNT_EXACT)
+        total = 0
+        results = []
+        for model in Events._get_event_models(filters):
+            rank = Events.EVENT_MODELS.index(model)
+            sort_column = getattr(model, sort_field)
+            query = Events._build_select_subquery(
+                model, filters, range_filters, tenant_id)
+            if execution_fks is not None:
+                query = query.filter(model._execution_fk.in_(execution_fks))
+
+            count = SQLStorageManager._count_results(query, model, count_mode)
+            total = None if count is None or total is None else total + count
+
+            if last is not None:
+                query = Events._apply_events_cursor(
+                    query, model, rank, sort_column, last, descending)
+            rows = (
+                query
+                # the exact timestamp, not truncated to milliseconds
+                .add_columns(type_coerce(sort_column, db.DateTime)
+                             .label(Events.SORT_VALUE_LABEL))
+                .order_by(order(sort_column), order(model._storage_id))
+                .limit(offset + size)
+                .all()
+            )
+            results.append([
+                ((getattr(row, Events.SORT_VALUE_LABEL), rank,
+                  row._storage_id), row)
+                for row in rows
+            ])
+
+        # both lists are sorted already, and the keys are unique
+        merged = sorted(chain(*results), key=operator.itemgetter(0),
+                        reverse=descending)
+        page = merged[offset:offset + size]
+
+        next_cursor = None
+        if cursor is not None and page and len(page) == size:
+            next_cursor = Events._get_events_cursor(page[-1][1])
+        return [row for _, row in page], total, next_cursor
+
+    @staticmethod
+    def _get_events_cursor(row):
+        """The cursor of the results that come after `row`
+
+        :param row: A row returned by _select_merged
+        """
+        rank = [
+            'cloudify_{0}'.format(model.__name__.lower())
+            for model in Events.EVENT_MODELS
+        ].index(row.type)
+        return _encode_events_cursor(
+            (getattr(row, Events.SORT_VALUE_LABEL), rank, row._storage_id))
+
+    @staticmethod
+    def _apply_events_cursor(query, model, rank, sort_column, last,
+                             descending):
+        """Only select the rows that come after `last` in the merged order
+
+        :param last: The (sort value, rank, _storage_id) key of the last
+                     row of the previous page
+        """
+        last_value, last_rank, last_id = last
+        after = operator.lt if descending else operator.gt
+        if rank == last_rank:
+            return query.filter(
+                sql_or(after(sort_column, last_value),
+                       sql_and(sort_column == last_value,
+                               after(model._storage_id, last_id))))
+        if after(rank, last_rank):
+            return query.filter(sql_or(after(sort_column, last_value),
+                                       sort_column == last_value))
+        return query.filter(after(sort_column, last_value))
+
     @staticmethod
     def _build_select_subquery(model, filters, range_filters, tenant_id):
         """Build select subquery.
@@ -444,3 +609,19 @@ class Events(SecuredResource):
         """Return the tenant with which the user accessed the app
         """
         return utils.current_tenant
+
+
+def _encode_events_cursor(key):
+    sort_value, rank, storage_id = key
+    cursor = json.dumps([sort_value.isoformat(), rank, storage_id])
+    return base64.urlsafe_b64encode(cursor.encode('utf-8')).decode('ascii')
+
+
+def _decode_events_cursor(cursor):
+    try:
+        sort_value, rank, storage_id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        return sort_value, int(rank), int(storage_id)
+    except (ValueError, TypeError):
+        raise manager_exceptions.BadParametersError(
+            'Invalid `_cursor`: {0}'.format(cursor))
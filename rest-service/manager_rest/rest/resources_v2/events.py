@@ -15,24 +15,18 @@
 #
 
 from flask_restful_swagger import swagger
-from sqlalchemy import bindparam
-from datetime import datetime
-import errno
-import os
 
 from manager_rest import manager_exceptions
+from manager_rest.events_deletion import delete_deployment_events
+from manager_rest.resource_manager import get_resource_manager
 from manager_rest.rest import (
     resources_v1,
     rest_decorators,
-)
-from manager_rest.storage.models_base import db
-from manager_rest.storage.resource_models import (
-    Deployment,
-    Execution,
-    Event,
-    Log,
+    rest_utils,
 )
 from manager_rest.storage import ListResult
+from manager_rest.storage.storage_manager import (COUNT_EXACT,
+                                                  STREAM_BATCH_SIZE)
 from manager_rest.security.authorization import authorize
 
 
@@ -77,11 +71,14 @@ class Events(resources_v1.Events):
         :param pagination:
             Parameters used to limit results returned in a single query.
             Expected values `size` and `offset` are mapped into SQL as `LIMIT`
-            and `OFFSET`.
+            and `OFFSET`. When sorting by a timestamp, `cursor` (the
+            `next_cursor` of the previous page) can be used instead of
+            `offset`, which is cheaper for following the events.
         :type pagination: dict(str, int)
         :param sort:
-            Result sorting order. The only allowed and expected value is to
-            sort by timestamp in ascending order:
+            Result sorting order. Sorting by `timestamp` or by
+            `reported_timestamp` alone doesn't need a union of events and
+            logs (see `_select_merged`):
                 {'timestamp': 'asc'}
         :type sort: dict(str, str)
         :returns: Events that match the conditions passed as arguments
@@ -101,10 +98,59 @@ class Events(resources_v1.Events):
             'offset': offset,
         }
 
+        merge_sort = self._get_merge_sort(sort)
+        # the merge reads `offset + size` rows from every table, so pages
+        # at an offset are left to the union query, which skips the
+        # offset in SQL
+        if merge_sort and not rest_utils.get_stream_format() and \
+                (not offset or pagination.get('cursor') is not None):
+            sort_field, sort_direction = merge_sort
+            events, total, next_cursor = self._select_merged(
+                filters, sort_field, sort_direction, range_filters,
+                self.current_tenant.id, pagination)
+            results = []
+            for event in events:
+                event = self._map_event_to_dict(_include, event)
+                event.pop(self.SORT_VALUE_LABEL, None)
+                results.append(event)
+            metadata = {
+                'pagination': {
+                    'size': size,
+                    'offset': offset,
+                    'total': total,
+                }
+            }
+            if next_cursor:
+                metadata['pagination']['next_cursor'] = next_cursor
+            return ListResult(results, metadata)
+
+        if pagination.get('cursor') is not None:
+            raise manager_exceptions.BadParametersError(
+                '`_cursor` can only be used when sorting by a timestamp')
+
+        if merge_sort and not sort:
+            # keep the same order as the merged pages
+            sort = {'timestamp': 'asc'}
         select_query, total = self._build_select_query(
-            filters, sort, range_filters, self.current_tenant.id
+            filters, sort, range_filters, self.current_tenant.id,
+            pagination.get('count', COUNT_EXACT)
         )
 
+        if rest_utils.get_stream_format():
+            # all the events, fetched from a server-side cursor
+            # as they are sent to the client
+            stream_query = (
+                select_query
+                .params(limit=None, offset=0)
+                .execution_options(stream_results=True)
+                .yield_per(STREAM_BATCH_SIZE)
+            )
+            results = (
+                self._map_event_to_dict(_include, event)
+                for event in stream_query
+            )
+            return ListResult(results, {})
+
         results = [
             self._map_event_to_dict(_include, event)
             for event in select_query.params(**params).all()
@@ -125,7 +171,10 @@ class Events(resources_v1.Events):
     @swagger.operation(
         responseclass='List[Event]',
         nickname="delete events",
-        notes='Deletes events according to a passed Deployment ID'
+        notes='Deletes events according to a passed Deployment ID. '
+              'With `background=true`, the events are deleted by a '
+              '`delete_events` system workflow, whose ID is returned in '
+              'the metadata, instead of during the request.'
     )
     @authorize('event_delete')
     @rest_decorators.marshal_events
@@ -136,7 +185,10 @@ class Events(resources_v1.Events):
     @rest_decorators.sortable()
     def delete(self, filters=None, pagination=None, sort=None,
                range_filters=None, **kwargs):
-        """Delete events/logs connected to a certain Deployment ID."""
+        """Delete events/logs connected to a certain Deployment ID.
+
+        The events are deleted in batches, see `events_deletion`.
+        """
         if not isinstance(filters, dict) or 'type' not in filters:
             raise manager_exceptions.BadParametersError(
                 'Filter by type is expected')
@@ -145,87 +197,30 @@ class Events(resources_v1.Events):
             raise manager_exceptions.BadParametersError(
                 'At least `type=cloudify_event` filter is expected')
 
-        executions_query = (
-            db.session.query(Execution._storage_id)
-            .filter(
-                Execution._deployment_fk == Deployment._storage_id,
-                Deployment.id == bindparam('deployment_id'),
-                Execution._tenant_id == bindparam('tenant_id')
-            )
-        )
-        params = {
-            'deployment_id': filters['deployment_id'][0],
-            'tenant_id': self.current_tenant.id
-        }
-        do_store_before = 'store_before' in filters and \
-                          filters['store_before'][0].upper() == 'TRUE'
-
-        delete_event_query = Events._apply_range_filters(
-            Events._build_delete_subquery(
-                Event, executions_query, params),
-            Event, range_filters)
-        if do_store_before:
-            self._store_log_entries('events', filters['deployment_id'][0],
-                                    delete_event_query.order_by(
-                                        'reported_timestamp'))
-        total = delete_event_query.delete(
-            synchronize_session=False)
-
-        if 'cloudify_log' in filters['type']:
-            delete_log_query = Events._apply_range_filters(
-                Events._build_delete_subquery(
-                    Log, executions_query, params),
-                Log, range_filters)
-            if do_store_before:
-                self._store_log_entries('logs', filters['deployment_id'][0],
-                                        delete_log_query.order_by(
-                                            'reported_timestamp'))
-            total += delete_log_query.delete('fetch')
+        deployment_id = filters['deployment_id'][0]
+        include_logs = 'cloudify_log' in filters['type']
+        do_store_before = self._is_filter_set(filters, 'store_before')
 
-        metadata = {'pagination': dict(pagination, total=total)}
+        if self._is_filter_set(filters, 'background'):
+            execution = get_resource_manager().delete_deployment_events(
+                deployment_id, include_logs, do_store_before, range_filters)
+            metadata = {
+                'pagination': dict(pagination, total=0),
+                'execution_id': execution.id,
+            }
+            return ListResult([], metadata)
 
-        # Commit bulk row deletions to database
-        db.session.commit()
+        total = delete_deployment_events(
+            deployment_id, self.current_tenant.id,
+            include_logs=include_logs,
+            store_before=do_store_before,
+            range_filters=range_filters)
+        metadata = {'pagination': dict(pagination, total=total)}
 
         # We don't really want to return all of the deleted events,
         # so it's a bit of a hack to return the deleted element count.
         return ListResult([total], metadata)
 
     @staticmethod
-    def _store_log_entries(table_name, deployment_id, select_query):
-        output_directory = Events._create_logs_output_directory()
-        output_filename = "{0}_{1}_{2}.log".format(
-            table_name, deployment_id,
-            datetime.utcnow().strftime('%Y%m%dT%H%M%S')
-        )
-        output_filename = os.path.join(output_directory, output_filename)
-        with open(output_filename, 'a') as output_file:
-            for event in select_query.all():
-                output_file.write(Events._map_event_to_log_entry(event))
-
-    @staticmethod
-    def _map_event_to_log_entry(event):
-        return '{0}  {1}\n'.format(
-            event.reported_timestamp,
-            {k: v for k, v in event.to_response().items()
-             if k != 'reported_timestamp'})
-
-    @staticmethod
-    def _create_logs_output_directory():
-        output_directory = os.path.join(os.sep, 'opt', 'manager', 'logs')
-        try:
-            os.makedirs(output_directory)
-        except OSError as ex:
-            # be happy if someone already created the path
-            if ex.errno != errno.EEXIST:
-                raise
-        return output_directory
-
-    @staticmethod
-    def _build_delete_subquery(model, execution_query, params):
-        """Build delete subquery."""
-        query = db.session.query(model).filter(
-            model._execution_fk.in_(execution_query),
-            model._tenant_id == bindparam('tenant_id'),
-        )
-        return query.params(**params)
+    def _is_filter_set(filters, name):
+        return name in filters and filters[name][0].upper() == 'TRUE'
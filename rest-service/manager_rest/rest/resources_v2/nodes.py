@@ -105,6 +105,15 @@ class NodeInstances(resources_v1.NodeInstances):
         """
         List node instances
         """
+        if rest_utils.get_stream_format():
+            return get_storage_manager().stream(
+                models.NodeInstance,
+                include=_include,
+                filters=filters,
+                substr_filters=search,
+                sort=sort,
+                all_tenants=all_tenants
+            )
         get_all_results = rest_utils.verify_and_convert_bool(
             '_get_all_results',
             request.args.get('_get_all_results', False)
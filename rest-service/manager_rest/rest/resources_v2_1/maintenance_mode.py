@@ -24,7 +24,9 @@ from manager_rest.security.authorization import authorize
 from manager_rest.constants import (MAINTENANCE_MODE_ACTIVATED,
                                     MAINTENANCE_MODE_ACTIVATING,
                                     MAINTENANCE_MODE_DEACTIVATED)
-from manager_rest.maintenance import (get_maintenance_file_path,
+from manager_rest.maintenance import (clear_running_executions_check,
+                                      get_maintenance_file_path,
+                                      get_maintenance_state,
                                       prepare_maintenance_dict,
                                       get_running_executions)
 from manager_rest.manager_exceptions import BadParametersError
@@ -37,10 +39,8 @@ class MaintenanceMode(SecuredResource):
     @authorize('maintenance_mode_get')
     @rest_decorators.marshal_with(MaintenanceModeResponse)
     def get(self, **_):
-        maintenance_file_path = get_maintenance_file_path()
-        if os.path.isfile(maintenance_file_path):
-            state = utils.read_json_file(maintenance_file_path)
-
+        state = get_maintenance_state()
+        if state is not None:
             if state['status'] == MAINTENANCE_MODE_ACTIVATED:
                 return state
             if state['status'] == MAINTENANCE_MODE_ACTIVATING:
@@ -61,8 +61,8 @@ class MaintenanceModeAction(SecuredResource):
     def post(self, maintenance_action, **_):
         maintenance_file_path = get_maintenance_file_path()
         if maintenance_action == 'activate':
-            if os.path.isfile(maintenance_file_path):
-                state = utils.read_json_file(maintenance_file_path)
+            state = get_maintenance_state()
+            if state is not None:
                 return state, 304
             now = utils.get_formatted_timestamp()
             try:
@@ -87,6 +87,7 @@ class MaintenanceModeAction(SecuredResource):
                 return prepare_maintenance_dict(
                         MAINTENANCE_MODE_DEACTIVATED), 304
             os.remove(maintenance_file_path)
+            clear_running_executions_check()
             return prepare_maintenance_dict(MAINTENANCE_MODE_DEACTIVATED)
         valid_actions = ['activate', 'deactivate']
         raise BadParametersError(
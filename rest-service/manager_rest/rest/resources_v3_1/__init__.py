@@ -17,7 +17,10 @@ from .license import License                     # NOQA
 from .tokens import UserTokens                   # NOQA
 from .sites import Sites, SitesName              # NOQA
 from .agents import Agents, AgentsName           # NOQA
-from .executions import ExecutionsCheck          # NOQA
+from .executions import (                         # NOQA
+    ExecutionsCheck,
+    ExecutionsBulk,
+)
 
 from .manager import (                           # NOQA
     SSLConfig,
@@ -53,6 +56,7 @@ from .plugins import (                           # NOQA
 
 from .deployments import (                       # NOQA
     DeploymentsId,
+    DeploymentsBulk,
     DeploymentsSetSite,
     DeploymentsSetVisibility,
     DeploymentsIdCapabilities,
@@ -84,6 +88,8 @@ from .operations import (                        # NOQA
 )
 
 from .status import Status                       # NOQA
+from .nodes import NodeInstances                 # NOQA
+from .events import EventsStream                  # NOQA
 
 from .cluster_status import (                    # NOQA
     ManagerClusterStatus,
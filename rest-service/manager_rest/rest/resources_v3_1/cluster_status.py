@@ -40,7 +40,8 @@ class ClusterStatus(SecuredResourceBannedSnapshotRestore):
         request_dict = get_json_and_verify_params({
             'reporting_freq': {'type': int},
             'report': {'type': dict},
-            'timestamp': {'type': text_type}
+            'timestamp': {'type': text_type},
+            'delta': {'type': bool, 'optional': True}
         })
         return request_dict
 
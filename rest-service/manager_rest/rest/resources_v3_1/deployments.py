@@ -45,6 +45,7 @@ from manager_rest.rest import (
     rest_decorators,
     responses_v3
 )
+from manager_rest.rest.responses_v2 import ListResponse
 from manager_rest.constants import FILE_SERVER_BLUEPRINTS_FOLDER
 
 SHARED_RESOURCE_TYPE = 'cloudify.nodes.SharedResource'
@@ -100,6 +101,65 @@ class DeploymentsId(resources_v1.DeploymentsId):
         return deployment, 201
 
 
+class DeploymentsBulk(SecuredResource):
+    @swagger.operation(
+        responseClass='List[{0}]'.format(
+            responses_v3.BulkDeploymentResult.__name__),
+        nickname='createBulk',
+        notes='Creates many deployments of the same blueprint. Returns the '
+              'created deployment and its environment creation execution, '
+              'or the reason it could not be created, for every deployment.'
+    )
+    @authorize('deployment_create')
+    @rest_decorators.marshal_with(responses_v3.BulkDeploymentResult)
+    def post(self, **kwargs):
+        """Create deployments of a blueprint"""
+        request_dict = rest_utils.get_json_and_verify_params({
+            'blueprint_id': {'type': text_type},
+            'deployments': {'type': list},
+            'skip_plugins_validation': {'optional': True, 'type': bool},
+            'runtime_only_evaluation': {'optional': True, 'type': bool},
+        })
+        deployments = request_dict['deployments']
+        if not deployments:
+            raise manager_exceptions.BadParametersError(
+                '`deployments` must not be empty')
+        for deployment in deployments:
+            if not isinstance(deployment, dict) or \
+                    not isinstance(deployment.get('id'), text_type) or \
+                    not isinstance(deployment.get('inputs', {}), dict):
+                raise manager_exceptions.BadParametersError(
+                    'Every deployment must be a dict with an `id`, and '
+                    'optionally `inputs` and a `site_name`: {0}'
+                    .format(deployment))
+        args = rest_utils.get_args_and_verify_arguments(
+            [Argument('private_resource', type=boolean)]
+        )
+        visibility = rest_utils.get_visibility_parameter(
+            optional=True,
+            valid_values=VisibilityState.STATES
+        )
+        results = get_resource_manager().create_deployments(
+            request_dict['blueprint_id'],
+            deployments,
+            private_resource=args.private_resource,
+            visibility=visibility,
+            bypass_maintenance=is_bypass_maintenance_mode(),
+            skip_plugins_validation=request_dict.get(
+                'skip_plugins_validation', False),
+            runtime_only_evaluation=request_dict.get(
+                'runtime_only_evaluation', False)
+        )
+        for result in results:
+            for resource in ('deployment', 'execution'):
+                if resource in result:
+                    result[resource] = result[resource].to_response()
+        pagination = {'total': len(results), 'size': len(results),
+                      'offset': 0}
+        return ListResponse(items=results,
+                            metadata={'pagination': pagination}), 201
+
+
 class DeploymentsSetVisibility(SecuredResource):
 
     @authorize('deployment_set_visibility')
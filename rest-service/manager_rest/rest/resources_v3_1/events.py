@@ -0,0 +1,228 @@
+#########
+# Copyright (c) 2020 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import os
+import json
+import fcntl
+import tempfile
+from time import time
+
+from flask import request, Response, stream_with_context
+from flask_restful.reqparse import Argument
+from flask_restful_swagger import swagger
+
+from cloudify._compat import text_type
+from cloudify.models_states import ExecutionState
+
+from manager_rest import config, manager_exceptions, utils
+from manager_rest.events_listener import get_events_listener
+from manager_rest.rest.rest_utils import get_args_and_verify_arguments
+from manager_rest.security import SecuredResource
+from manager_rest.security.authorization import authorize
+from manager_rest.storage import db, models, get_storage_manager
+from manager_rest.storage.storage_manager import COUNT_NONE
+
+from ..resources_v1.events import _decode_events_cursor
+from ..resources_v3 import Events as v3_Events
+
+EVENT_TYPES = ['cloudify_event', 'cloudify_log']
+# events sent in a single round of the stream
+STREAM_PAGE_SIZE = 1000
+# the rest service runs sync workers, so a stream holds a whole worker
+# while it's open: streams are kept short, and clients reconnect (resuming
+# from the last event they received) to keep following
+DEFAULT_STREAM_TIMEOUT = 20
+MAX_STREAM_TIMEOUT = 30
+KEEPALIVE_INTERVAL = 15
+# events might still be stored for a while after the execution ended
+STREAM_END_DELAY = 3
+# how soon clients should reconnect after the stream is closed, in ms
+RECONNECT_DELAY = 2000
+# the streams that are open are counted by locking one of these files, so
+# that the count is shared by all the workers
+STREAM_SLOT_PATH = os.path.join(tempfile.gettempdir(),
+                                'cloudify-events-stream-{0}.lock')
+
+
+class EventsStream(SecuredResource):
+    @swagger.operation(
+        nickname='streamEvents',
+        notes='Stream the events and logs of an execution, or of all the '
+              'executions of a deployment, as Server-Sent Events, while '
+              'they are stored. The stream stays open for up to `timeout` '
+              'seconds. Every event is sent with its cursor as the event '
+              'id: reconnect with the `_cursor` argument (or the '
+              '`Last-Event-ID` header) to resume after the last event '
+              'received. An `end` event is sent once the execution ended '
+              'and all of its events were sent. Only `max_event_streams` '
+              'streams can be open at once; more are rejected with 503.'
+    )
+    @authorize('event_list')
+    def get(self):
+        """Stream events and logs as Server-Sent Events"""
+        args = get_args_and_verify_arguments([
+            Argument('execution_id', type=text_type, required=False),
+            Argument('deployment_id', type=text_type, required=False),
+            Argument('type', type=text_type, action='append',
+                     required=False),
+            Argument('timeout', type=int, default=DEFAULT_STREAM_TIMEOUT),
+            Argument('_cursor', type=text_type, required=False),
+        ])
+        if bool(args.execution_id) == bool(args.deployment_id):
+            raise manager_exceptions.BadParametersError(
+                'Exactly one of `execution_id` and `deployment_id` '
+                'is required')
+        types = args.type or EVENT_TYPES
+        if set(types) - set(EVENT_TYPES):
+            raise manager_exceptions.BadParametersError(
+                '`type` is expected to be one of: {0}'
+                .format(', '.join(EVENT_TYPES)))
+        if not 0 < args.timeout <= MAX_STREAM_TIMEOUT:
+            raise manager_exceptions.BadParametersError(
+                '`timeout` is expected to be between 1 and {0}'
+                .format(MAX_STREAM_TIMEOUT))
+        cursor = args._cursor
+        if cursor is None:
+            cursor = request.headers.get('Last-Event-ID', '')
+        if cursor:
+            _decode_events_cursor(cursor)
+
+        sm = get_storage_manager()
+        if args.execution_id:
+            execution = sm.get(models.Execution, args.execution_id)
+            execution_fks = [execution._storage_id]
+            filters = {'execution_id': [execution.id]}
+        else:
+            deployment = sm.get(models.Deployment, args.deployment_id)
+            # the deployment might have new executions while streaming
+            execution_fks = None
+            filters = {'deployment_id': [deployment.id]}
+        filters['type'] = types
+
+        slot = _acquire_stream_slot()
+        if slot is None:
+            raise manager_exceptions.TooManyEventStreamsError(
+                'Too many event streams are open, try again later')
+        stream = _EventsStream(filters, execution_fks,
+                               utils.current_tenant.id, cursor, args.timeout,
+                               slot)
+        response = Response(stream_with_context(stream.generate()),
+                            mimetype='text/event-stream')
+        # in case the stream is closed before it even started
+        response.call_on_close(stream.close)
+        response.headers['Cache-Control'] = 'no-cache'
+        # don't let nginx buffer the events
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class _EventsStream(object):
+    """Send new events when they're stored, until the timeout.
+
+    New events are queried for whenever the events listener is notified
+    about the executions; the database connection is released while
+    waiting.
+    """
+
+    def __init__(self, filters, execution_fks, tenant_id, cursor, timeout,
+                 slot):
+        self._filters = filters
+        self._execution_fks = execution_fks
+        self._tenant_id = tenant_id
+        self._cursor = cursor
+        self._deadline = time() + timeout
+        self._ended_at = None
+        self._slot = slot
+
+    def close(self):
+        """Release the stream slot"""
+        self._slot.close()
+
+    def generate(self):
+        try:
+            for message in self._generate():
+                yield message
+        finally:
+            self.close()
+
+    def _generate(self):
+        listener = get_events_listener()
+        yield 'retry: {0}\n\n'.format(RECONNECT_DELAY)
+        while True:
+            position = listener.position
+            ended = self._execution_ended()
+            events = self._get_events()
+            db.session.close()
+            for event in events:
+                yield self._format_event(event)
+
+            remaining = self._deadline - time()
+            if remaining <= 0:
+                return
+            if len(events) == STREAM_PAGE_SIZE:
+                continue
+            if ended:
+                if self._ended_at is None:
+                    self._ended_at = time()
+                elif not events and \
+                        time() - self._ended_at >= STREAM_END_DELAY:
+                    yield 'event: end\ndata: {}\n\n'
+                    return
+            wait = STREAM_END_DELAY if ended else KEEPALIVE_INTERVAL
+            if not listener.wait(self._execution_fks, position,
+                                 min(remaining, wait)):
+                yield ': keep-alive\n\n'
+
+    def _execution_ended(self):
+        if self._execution_fks is None:
+            return False
+        execution = (
+            db.session.query(models.Execution.status)
+            .filter(models.Execution._storage_id == self._execution_fks[0])
+            .first()
+        )
+        return execution is None or \
+            execution.status in ExecutionState.END_STATES
+
+    def _get_events(self):
+        events, _, _ = v3_Events._select_merged(
+            self._filters, 'timestamp', 'asc', {}, self._tenant_id,
+            {'size': STREAM_PAGE_SIZE, 'cursor': self._cursor,
+             'count': COUNT_NONE})
+        return events
+
+    def _format_event(self, event):
+        self._cursor = v3_Events._get_events_cursor(event)
+        data = v3_Events._map_event_to_dict(None, event)
+        data.pop(v3_Events.SORT_VALUE_LABEL, None)
+        data.pop('_storage_id', None)
+        return 'id: {0}\ndata: {1}\n\n'.format(self._cursor, json.dumps(data))
+
+
+def _acquire_stream_slot():
+    """Lock one of the `max_event_streams` stream slots.
+
+    :return: The locked slot file, closing it releases the slot; None if
+             all the slots are taken
+    """
+    for index in range(config.instance.max_event_streams):
+        slot = open(STREAM_SLOT_PATH.format(index), 'a')
+        try:
+            fcntl.flock(slot, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (IOError, OSError):
+            slot.close()
+            continue
+        return slot
+    return None
@@ -14,6 +14,17 @@
 #  * limitations under the License.
 #
 
+from flask_restful_swagger import swagger
+
+from cloudify._compat import text_type
+
+from manager_rest import manager_exceptions
+from manager_rest.maintenance import is_bypass_maintenance_mode
+from manager_rest.rest import responses_v3
+from manager_rest.rest.rest_decorators import marshal_with
+from manager_rest.rest.responses_v2 import ListResponse
+from manager_rest.rest.rest_utils import (get_json_and_verify_params,
+                                          verify_and_convert_bool)
 from manager_rest.security import SecuredResource
 from manager_rest.security.authorization import authorize
 from manager_rest.resource_manager import get_resource_manager
@@ -36,3 +47,46 @@ class ExecutionsCheck(SecuredResource):
         rm = get_resource_manager()
         return not (rm.check_for_executions(deployment_id, force=False,
                                             queue=True, execution=execution))
+
+
+class ExecutionsBulk(SecuredResource):
+    @swagger.operation(
+        responseClass='List[{0}]'.format(
+            responses_v3.BulkExecutionResult.__name__),
+        nickname='executeBulk',
+        notes='Starts a workflow on many deployments. Returns the started '
+              'execution, or the reason it could not be started, for '
+              'every deployment.'
+    )
+    @authorize('execution_start')
+    @marshal_with(responses_v3.BulkExecutionResult)
+    def post(self, **kwargs):
+        """Execute a workflow on a list of deployments"""
+        request_dict = get_json_and_verify_params({
+            'deployment_ids': {'type': list},
+            'workflow_id': {'type': text_type},
+            'parameters': {'type': dict, 'optional': True},
+        })
+        if not request_dict['deployment_ids']:
+            raise manager_exceptions.BadParametersError(
+                '`deployment_ids` must not be empty')
+        flags = {
+            flag: verify_and_convert_bool(
+                flag, request_dict.get(flag, False))
+            for flag in ['allow_custom_parameters', 'force', 'dry_run',
+                         'queue']
+        }
+        results = get_resource_manager().execute_workflows(
+            request_dict['deployment_ids'],
+            request_dict['workflow_id'],
+            parameters=request_dict.get('parameters'),
+            bypass_maintenance=is_bypass_maintenance_mode(),
+            wait_after_fail=request_dict.get('wait_after_fail', 600),
+            **flags)
+        for result in results:
+            if 'execution' in result:
+                result['execution'] = result['execution'].to_response()
+        pagination = {'total': len(results), 'size': len(results),
+                      'offset': 0}
+        return ListResponse(items=results,
+                            metadata={'pagination': pagination}), 201
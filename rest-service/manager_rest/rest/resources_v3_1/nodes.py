@@ -0,0 +1,80 @@
+#########
+# Copyright (c) 2020 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+from flask_restful_swagger import swagger
+
+from cloudify._compat import text_type
+
+from manager_rest import manager_exceptions
+from manager_rest.rest import responses_v3
+from manager_rest.rest.rest_decorators import marshal_with
+from manager_rest.rest.responses_v2 import ListResponse
+from manager_rest.rest.rest_utils import get_json_and_verify_params
+from manager_rest.security.authorization import authorize
+from manager_rest.resource_manager import get_resource_manager
+
+from ..resources_v2 import NodeInstances as v2_NodeInstances
+
+
+class NodeInstances(v2_NodeInstances):
+    @swagger.operation(
+        responseClass='List[{0}]'.format(
+            responses_v3.NodeInstanceVersion.__name__),
+        nickname='patchNodeInstances',
+        notes='Update many node instances at once. Expecting the request '
+              'body to be a dictionary containing `items`, a list of '
+              'updates like the body of a single node instance update: '
+              'with the `id` and `version` of the node instance, and '
+              'optionally `runtime_properties` and/or `state`. Returns the '
+              'new version of every node instance, or the `error_code` of '
+              'the update.',
+        consumes=['application/json']
+    )
+    @authorize('node_instance_update')
+    @marshal_with(responses_v3.NodeInstanceVersion)
+    def patch(self, **kwargs):
+        """Update many node instances, in a single transaction"""
+        request_dict = get_json_and_verify_params({'items': {'type': list}})
+        updates = request_dict['items']
+        for update in updates:
+            _validate_node_instance_update(update)
+        ids = [update['id'] for update in updates]
+        if len(set(ids)) != len(ids):
+            raise manager_exceptions.BadParametersError(
+                'Every node instance can only be updated once in a request')
+
+        results = get_resource_manager().update_node_instances(updates)
+        pagination = {'total': len(results), 'size': len(results),
+                      'offset': 0}
+        return ListResponse(items=results,
+                            metadata={'pagination': pagination})
+
+
+def _validate_node_instance_update(update):
+    if not isinstance(update, dict) or \
+            not isinstance(update.get('id'), text_type) or \
+            not isinstance(update.get('version'), int):
+        raise manager_exceptions.BadParametersError(
+            'Every item is expected to be a dict containing an `id`, an '
+            'integer `version`, and optionally `runtime_properties` and/or '
+            '`state`, got: {0}'.format(update))
+    if not isinstance(update.get('runtime_properties', {}), dict):
+        raise manager_exceptions.BadParametersError(
+            '`runtime_properties` of node instance {0} is expected to be a '
+            'dict'.format(update['id']))
+    if not isinstance(update.get('state', ''), text_type):
+        raise manager_exceptions.BadParametersError(
+            '`state` of node instance {0} is expected to be a string'
+            .format(update['id']))
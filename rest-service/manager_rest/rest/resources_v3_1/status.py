@@ -25,6 +25,7 @@ from cloudify._compat import httplib, xmlrpclib
 from manager_rest import config
 from manager_rest.rest import responses
 from manager_rest.utils import get_amqp_client
+from manager_rest.amqp_publisher import get_publisher_pool
 from manager_rest.security import SecuredResource
 from manager_rest.security.authorization import authorize
 from manager_rest.rest.rest_decorators import marshal_with
@@ -187,7 +188,10 @@ class Status(SecuredResource):
         client = get_amqp_client()
         try:
             with client:
-                extra_info = {'connection_check': ServiceStatus.HEALTHY}
+                extra_info = {
+                    'connection_check': ServiceStatus.HEALTHY,
+                    'publisher_pool': get_publisher_pool().get_metrics(),
+                }
                 self._add_or_update_service(services,
                                             name,
                                             NodeServiceStatus.ACTIVE,
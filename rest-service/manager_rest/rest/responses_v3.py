@@ -132,3 +132,33 @@ class License(BaseResponse):
         'capabilities': fields.Raw,
         'expired': fields.Boolean
     }
+
+
+@swagger.model
+class BulkExecutionResult(BaseResponse):
+    resource_fields = {
+        'deployment_id': fields.String,
+        'execution': fields.Raw,
+        'error': fields.String,
+        'error_code': fields.String,
+    }
+
+
+@swagger.model
+class BulkDeploymentResult(BaseResponse):
+    resource_fields = {
+        'deployment_id': fields.String,
+        'deployment': fields.Raw,
+        'execution': fields.Raw,
+        'error': fields.String,
+        'error_code': fields.String,
+    }
+
+
+@swagger.model
+class NodeInstanceVersion(BaseResponse):
+    resource_fields = {
+        'id': fields.String,
+        'version': fields.Integer,
+        'error_code': fields.String,
+    }
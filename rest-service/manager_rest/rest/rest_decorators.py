@@ -43,7 +43,10 @@ from cloudify._compat import text_type
 from ..security.authentication import authenticator
 from manager_rest import config, manager_exceptions
 from manager_rest.storage.models_base import SQLModelBase
+from manager_rest.storage.storage_manager import COUNT_MODES
 from manager_rest.rest.rest_utils import (
+    get_stream_format,
+    make_streaming_list_response,
     verify_and_convert_bool,
     request_use_all_tenants,
     is_system_in_snapshot_restore_process
@@ -125,6 +128,14 @@ class marshal_with(object):
 
             response = f(*args, **kwargs)
 
+            stream_format = get_stream_format()
+            if stream_format and isinstance(response, ListResponse):
+                return make_streaming_list_response(
+                    response.items, stream_format,
+                    lambda item: marshal(
+                        self.wrap_with_response_object(item),
+                        fields_to_include))
+
             def wrap_list_items(response):
                 wrapped_items = self.wrap_with_response_object(response.items)
                 response.items = marshal(wrapped_items, fields_to_include)
@@ -405,7 +416,13 @@ def marshal_events(func):
     """
     @wraps(func)
     def marshal_response(*args, **kwargs):
-        return marshal(func(*args, **kwargs), ListResponse.resource_fields)
+        response = func(*args, **kwargs)
+        stream_format = get_stream_format()
+        if stream_format and request.method == 'GET':
+            # events are already mapped to dicts by the endpoint
+            return make_streaming_list_response(
+                response.items, stream_format, lambda event: event)
+        return marshal(response, ListResponse.resource_fields)
     return marshal_response
 
 
@@ -420,6 +437,13 @@ def paginate(func):
     (note that the leading underscore is dropped) if a values was passed in a
     request header. Otherwise, the dictionary will be empty.
 
+    Two more optional parameters are passed the same way:
+    - `_cursor`: use cursor (keyset) pagination instead of offsets. Pass it
+      empty for the first page, and then pass the `next_cursor` value from
+      the pagination metadata of the previous page.
+    - `_count`: how to count the total number of results: `exact` (the
+      default), `estimate` (cheaper, for very large results) or `none`.
+
     A `voluptuous.error.Invalid` exception will be raised if any of the request
     parameters has an invalid value.
 
@@ -439,6 +463,12 @@ def paginate(func):
                 Range(min=0),
                 msg='`_offset` is expected to be a positive integer',
             ),
+            '_cursor': Coerce(text_type),
+            '_count': Any(
+                *COUNT_MODES,
+                msg='`_count` is expected to be one of: {0}'.format(
+                    ', '.join(COUNT_MODES))
+            ),
         },
         extra=REMOVE_EXTRA,
     )
@@ -14,6 +14,7 @@
 #  * limitations under the License.
 
 import os
+import json
 import uuid
 import pytz
 import copy
@@ -23,7 +24,13 @@ from string import ascii_letters
 from contextlib import contextmanager
 
 from flask_security import current_user
-from flask import request, make_response, current_app
+from flask import (
+    request,
+    Response,
+    current_app,
+    make_response,
+    stream_with_context,
+)
 from flask_restful.reqparse import Argument, RequestParser
 
 from dsl_parser import tasks
@@ -41,6 +48,13 @@ from manager_rest import manager_exceptions, config, app_context
 from manager_rest.utils import is_administrator, get_formatted_timestamp
 
 
+STREAM_FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+# number of serialized items sent to the client in a single chunk
+STREAM_CHUNK_SIZE = 100
+
 states_except_private = copy.deepcopy(VisibilityState.STATES)
 states_except_private.remove('private')
 VISIBILITY_EXCEPT_PRIVATE = states_except_private
@@ -126,6 +140,68 @@ def make_streaming_response(res_id, res_path, content_length, archive_type):
     return response
 
 
+def get_stream_format():
+    """Return the format requested in the `_stream` argument, if any.
+
+    `_stream=true` is the same as `_stream=json`. None is returned when
+    the results weren't requested to be streamed.
+    """
+    stream = request.args.get('_stream', '').lower()
+    if stream in ('', 'false'):
+        return None
+    if stream == 'true':
+        return 'json'
+    if stream not in STREAM_FORMATS:
+        raise manager_exceptions.BadParametersError(
+            '`_stream` is expected to be one of: true, false, {0}; got {1}'
+            .format(', '.join(sorted(STREAM_FORMATS)), stream))
+    return stream
+
+
+def make_streaming_list_response(items, stream_format, serialize):
+    """Send the list results to the client while they are serialized.
+
+    Only STREAM_CHUNK_SIZE serialized items are kept in memory at once, so
+    `items` can be a generator reading the results lazily from the DB.
+    The `json` format has the shape of a regular list response, with the
+    pagination metadata sent after the items, once their number is known.
+    The `ndjson` format has a single item in every line, and no metadata.
+
+    :param items: An iterable of the results to send
+    :param stream_format: One of STREAM_FORMATS
+    :param serialize: A function returning the JSON-able form of an item
+    """
+    def _chunks():
+        chunk = []
+        for item in items:
+            chunk.append(json.dumps(serialize(item)))
+            if len(chunk) >= STREAM_CHUNK_SIZE:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _generate_ndjson():
+        for chunk in _chunks():
+            yield '\n'.join(chunk) + '\n'
+
+    def _generate_json():
+        yield '{"items": ['
+        count = 0
+        for chunk in _chunks():
+            if count:
+                yield ', '
+            yield ', '.join(chunk)
+            count += len(chunk)
+        metadata = {'pagination': {'total': count, 'size': count, 'offset': 0}}
+        yield '], "metadata": {0}}}\n'.format(json.dumps(metadata))
+
+    generate = _generate_ndjson if stream_format == 'ndjson' \
+        else _generate_json
+    return Response(stream_with_context(generate()),
+                    mimetype=STREAM_FORMATS[stream_format])
+
+
 def set_restart_task(delay=1):
     current_app.logger.info('Restarting the rest service')
     cmd = 'sleep {0}; sudo systemctl restart {1}' \
@@ -23,7 +23,7 @@ from cloudify.workflows import tasks
 from cloudify.models_states import ExecutionState
 
 from manager_rest.security import user_handler
-from manager_rest.storage import user_datastore
+from manager_rest.storage import db, models, user_datastore
 from manager_rest.app_logging import raise_unauthorized_user_error
 from manager_rest.security.hash_request_cache import HashVerifyRequestCache
 from manager_rest.execution_token import (current_execution,
@@ -79,7 +79,10 @@ class Authentication(object):
             # every UI refresh (every 4 sec) and accounts won't be locked.
             user.failed_logins_counter = 0
             user.last_login_at = datetime.now()
-        user_datastore.commit()
+        # most requests use token authentication, which doesn't change
+        # anything; don't pay for a commit in that case
+        if db.session.new or db.session.dirty or db.session.deleted:
+            user_datastore.commit()
         return user
 
     def _internal_auth(self, request):
@@ -226,11 +229,14 @@ class Authentication(object):
         if current_execution.status != ExecutionState.CANCELLED:
             return False
 
-        for graph in current_execution.tasks_graphs:
-            for operation in graph.operations:
-                if operation.state not in tasks.TERMINATED_STATES:
-                    return True
-        return False
+        running_operations = db.session.query(models.Operation).join(
+            models.TasksGraph,
+            models.Operation._tasks_graph_fk == models.TasksGraph._storage_id
+        ).filter(
+            models.TasksGraph._execution_fk == current_execution._storage_id,
+            ~models.Operation.state.in_(tasks.TERMINATED_STATES)
+        )
+        return db.session.query(running_operations.exists()).scalar()
 
 
 authenticator = Authentication()
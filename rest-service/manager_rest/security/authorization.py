@@ -1,19 +1,45 @@
 
+import threading
+from itertools import chain
 from functools import wraps
 
+from cachetools import TTLCache
 from flask import request
 from flask_security import current_user
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
 
 from cloudify._compat import text_type
 
 from manager_rest import config, utils
-from manager_rest.storage.models import Tenant
-from manager_rest.storage import get_storage_manager
+from manager_rest.storage.models import (Group,
+                                         GroupTenantAssoc,
+                                         Role,
+                                         Tenant,
+                                         User,
+                                         UserTenantAssoc)
+from manager_rest.storage import db, get_storage_manager
 from manager_rest.constants import CLOUDIFY_TENANT_HEADER
 from manager_rest.manager_exceptions import NotFoundError, ForbiddenError
 from manager_rest.rest.rest_utils import (get_json_and_verify_params,
                                           request_use_all_tenants)
 
+# Every request looks up its tenant and the roles of its user, which rarely
+# change, so they are cached per process. Changes flushed by this process
+# clear the cache; other processes see them after the TTL.
+AUTHORIZATION_CACHE_TTL = 10
+AUTHORIZATION_CACHE_SIZE = 1000
+_AUTHORIZATION_MODELS = (Group, GroupTenantAssoc, Role, Tenant,
+                         UserTenantAssoc)
+# the attributes of a user that its roles are computed from; the rest
+# (e.g. last_login_at, which is set on every basic auth request) don't
+# clear the cache
+_USER_ROLES_ATTRIBUTES = ('roles', 'groups', 'tenant_associations')
+
+_tenants = TTLCache(AUTHORIZATION_CACHE_SIZE, AUTHORIZATION_CACHE_TTL)
+_user_roles = TTLCache(AUTHORIZATION_CACHE_SIZE, AUTHORIZATION_CACHE_TTL)
+_cache_lock = threading.Lock()
+
 
 def authorize(action,
               tenant_for_auth=None,
@@ -38,12 +64,7 @@ def authorize(action,
             # finding tenant to add to the app config
             if tenant_name:
                 try:
-                    tenant = get_storage_manager().get(
-                        Tenant,
-                        tenant_name,
-                        filters={'name': tenant_name}
-                    )
-                    utils.set_current_tenant(tenant)
+                    utils.set_current_tenant(_get_tenant(tenant_name))
                 except NotFoundError:
                     raise ForbiddenError(
                         'Authorization failed: Tried to authenticate with '
@@ -75,21 +96,81 @@ def authorize(action,
 
 
 def get_current_user_roles(tenant_name=None, allow_all_tenants=False):
-    tenant_roles = []
+    user_roles = []
+    system_roles, all_tenant_roles = _get_user_roles(current_user)
 
     # extracting tenant roles for user in the tenant
-    for t in current_user.all_tenants:
+    for name, tenant_roles in all_tenant_roles.items():
         if (allow_all_tenants and request_use_all_tenants()) \
-                or t.name == tenant_name:
-            tenant_roles += current_user.all_tenants[t]
+                or name == tenant_name:
+            user_roles += tenant_roles
 
     # joining user's system role with his tenant roles
-    user_roles = [role.name for role in tenant_roles] \
-        + current_user.system_roles
-    return user_roles
+    return user_roles + system_roles
 
 
 def is_user_action_allowed(action, tenant_name=None, allow_all_tenants=False):
     user_roles = get_current_user_roles(tenant_name, allow_all_tenants)
     action_roles = config.instance.authorization_permissions[action]
     return set(user_roles) & set(action_roles)
+
+
+def clear_authorization_cache():
+    with _cache_lock:
+        _tenants.clear()
+        _user_roles.clear()
+
+
+def _get_tenant(tenant_name):
+    with _cache_lock:
+        columns = _tenants.get(tenant_name)
+    if columns is not None:
+        # attach a copy of the cached tenant to the session, as if it was
+        # loaded from the db, without querying it
+        tenant = Tenant(**columns)
+        make_transient_to_detached(tenant)
+        return db.session.merge(tenant, load=False)
+    tenant = get_storage_manager().get(
+        Tenant,
+        tenant_name,
+        filters={'name': tenant_name}
+    )
+    with _cache_lock:
+        _tenants[tenant_name] = {
+            column.key: getattr(tenant, column.key)
+            for column in inspect(Tenant).column_attrs
+        }
+    return tenant
+
+
+def _get_user_roles(user):
+    """The system roles of `user`, and a dict of its roles in each tenant"""
+    with _cache_lock:
+        roles = _user_roles.get(user.id)
+    if roles is None:
+        roles = (
+            list(user.system_roles),
+            {tenant.name: [role.name for role in tenant_roles]
+             for tenant, tenant_roles in user.all_tenants.items()}
+        )
+        with _cache_lock:
+            _user_roles[user.id] = roles
+    return roles
+
+
+@event.listens_for(Session, 'after_flush')
+def _authorization_models_flushed(session, flush_context):
+    for instance in chain(session.new, session.dirty, session.deleted):
+        if isinstance(instance, _AUTHORIZATION_MODELS) or \
+                (isinstance(instance, User) and
+                 _user_roles_changed(session, instance)):
+            clear_authorization_cache()
+            return
+
+
+def _user_roles_changed(session, user):
+    if user in session.new or user in session.deleted:
+        return True
+    attrs = inspect(user).attrs
+    return any(attrs[name].history.has_changes()
+               for name in _USER_ROLES_ATTRIBUTES)
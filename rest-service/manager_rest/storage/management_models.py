@@ -699,4 +699,13 @@ class UsageCollector(SQLModelBase):
     days_interval = db.Column(db.Integer, nullable=False)
 
 
+class StatusReport(SQLModelBase):
+    """The last status report of every cluster node."""
+    __tablename__ = 'status_reports'
+
+    node_type = db.Column(db.Text, primary_key=True)
+    node_id = db.Column(db.Text, primary_key=True)
+    report = db.Column(JSONString, nullable=False)
+
+
 user_datastore = SQLAlchemyUserDatastore(db, User, Role)
@@ -15,21 +15,32 @@
 
 import json
 
+from operator import attrgetter
 from collections import OrderedDict
 
 from dateutil import parser as date_parser
 from flask_sqlalchemy import SQLAlchemy, inspect
 from flask_restful import fields as flask_fields
-from sqlalchemy import MetaData
+from sqlalchemy import MetaData, event
 from sqlalchemy.ext.associationproxy import ASSOCIATION_PROXY
 from sqlalchemy.ext.hybrid import HYBRID_PROPERTY
+from sqlalchemy.orm import mapper
 from sqlalchemy.orm.interfaces import NOT_EXTENSION
 
 from cloudify._compat import text_type
 from manager_rest.utils import classproperty
 
 
-db = SQLAlchemy(metadata=MetaData(naming_convention={
+class _SQLAlchemy(SQLAlchemy):
+    def apply_driver_hacks(self, app, info, options):
+        rv = super(_SQLAlchemy, self).apply_driver_hacks(app, info, options)
+        # Test connections when they're checked out of the pool, and replace
+        # the ones that were broken by a db failover or a db proxy restart
+        options['pool_pre_ping'] = True
+        return rv
+
+
+db = _SQLAlchemy(metadata=MetaData(naming_convention={
     # This is to generate migration scripts with constraint names
     # using the same naming convention used by PostgreSQL by default
     # http://stackoverflow.com/a/4108266/183066
@@ -108,6 +119,41 @@ def _get_extension_type(desc):
     return extension_type
 
 
+class FrozenDict(dict):
+    """A dict that can't be modified after creation.
+
+    Used for the per-class cached fields mappings, which are shared by all
+    users; copy() returns a regular, modifiable dict.
+    """
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('{0} can not be modified'.format(
+            self.__class__.__name__))
+
+    __setitem__ = __delitem__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def copy(self):
+        return dict(self)
+
+
+def make_fields_getter(field_names):
+    """Return a function that returns a dict of the given attributes of
+    an object, using a single precompiled attrgetter.
+    """
+    field_names = tuple(field_names)
+    if not field_names:
+        return lambda obj: {}
+    getter = attrgetter(*field_names)
+    if len(field_names) == 1:
+        name = field_names[0]
+        return lambda obj: {name: getter(obj)}
+    return lambda obj: dict(zip(field_names, getter(obj)))
+
+
+# (model class, name) -> cached value; see SQLModelBase._get_cached
+_class_cache = {}
+
+
 class SQLModelBase(db.Model):
     """Abstract base class for all SQL models that allows [de]serialization
     """
@@ -157,7 +203,7 @@ class SQLModelBase(db.Model):
         else:
             # Can't simply call here `self.to_response()` because inheriting
             # class might override it, but we always need the same code here
-            res = {f: getattr(self, f) for f in self.resource_fields}
+            res = self._resource_fields_getter(self)
             full_response = self.to_response()
 
             # resource_availability is deprecated.
@@ -168,12 +214,46 @@ class SQLModelBase(db.Model):
         return res
 
     def to_response(self, **kwargs):
-        return {f: getattr(self, f) for f in self.resource_fields}
+        return self._resource_fields_getter(self)
+
+    @classmethod
+    def _get_cached(cls, name, compute):
+        """Return a per-class value, computing it on first use.
+
+        This is for values that only depend on the class definition
+        (i.e. the mapper), so they can be shared by all requests.
+        """
+        key = (cls, name)
+        try:
+            return _class_cache[key]
+        except KeyError:
+            value = _class_cache[key] = compute()
+            return value
 
     @classproperty
     def resource_fields(cls):
         """Return a mapping of available field names and their corresponding
         flask types
+
+        This is computed once per class (by `_get_resource_fields`), and is
+        read-only.
+        """
+        return cls._get_cached(
+            'resource_fields',
+            lambda: FrozenDict(cls._get_resource_fields()))
+
+    @classproperty
+    def _resource_fields_getter(cls):
+        return cls._get_cached(
+            'resource_fields_getter',
+            lambda: make_fields_getter(cls.resource_fields))
+
+    @classmethod
+    def _get_resource_fields(cls):
+        """Compute the resource fields of this class.
+
+        Subclasses that need to change the resource fields should override
+        this, rather than `resource_fields` itself.
         """
         fields = dict()
         columns = inspect(cls).columns
@@ -239,3 +319,19 @@ class SQLModelBase(db.Model):
         class_name = self.__class__.__name__
         _repr = ' '.join('{0}=`{1}`'.format(k, v) for k, v in id_dict.items())
         return '<{0} {1}>'.format(class_name, _repr)
+
+
+@event.listens_for(mapper, 'after_configured')
+def _cache_model_fields():
+    """Precompute the fields of all the models, once the mappers are ready,
+    so that it doesn't need to happen when serializing the first response.
+    """
+    models = SQLModelBase.__subclasses__()
+    while models:
+        model = models.pop()
+        models.extend(model.__subclasses__())
+        if '__table__' not in model.__dict__:
+            continue  # abstract
+        model.resource_fields
+        if hasattr(model, 'response_fields'):
+            model.response_fields
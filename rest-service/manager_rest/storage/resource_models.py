@@ -32,7 +32,7 @@ from cloudify.models_states import (AgentState,
 
 from manager_rest import config
 from manager_rest.rest.responses import Workflow
-from manager_rest.utils import classproperty, files_in_folder
+from manager_rest.utils import files_in_folder
 from manager_rest.deployment_update.constants import ACTION_TYPES, ENTITY_TYPES
 from manager_rest.constants import (FILE_SERVER_PLUGINS_FOLDER,
                                     FILE_SERVER_RESOURCES_FOLDER)
@@ -150,9 +150,9 @@ class Plugin(SQLResourceBase):
             self.distribution
         )
 
-    @classproperty
-    def response_fields(cls):
-        fields = super(Plugin, cls).response_fields
+    @classmethod
+    def _get_response_fields(cls):
+        fields = super(Plugin, cls)._get_response_fields()
         fields['file_server_path'] = flask_fields.String
         fields['yaml_url_path'] = flask_fields.String
         return fields
@@ -182,9 +182,9 @@ class Secret(CreatedAtMixin, SQLResourceBase):
     def key(self):
         return self.id
 
-    @classproperty
-    def resource_fields(cls):
-        fields = super(Secret, cls).resource_fields
+    @classmethod
+    def _get_resource_fields(cls):
+        fields = super(Secret, cls)._get_resource_fields()
         fields['key'] = fields.pop('id')
         return fields
 
@@ -213,9 +213,9 @@ class Site(CreatedAtMixin, SQLResourceBase):
             return None
         return "{0}, {1}".format(self.latitude, self.longitude)
 
-    @classproperty
-    def response_fields(cls):
-        fields = super(Site, cls).response_fields
+    @classmethod
+    def _get_response_fields(cls):
+        fields = super(Site, cls)._get_response_fields()
         fields.pop('id')
         return fields
 
@@ -275,9 +275,9 @@ class Deployment(CreatedAtMixin, SQLResourceBase):
 
     site_name = association_proxy('site', 'name')
 
-    @classproperty
-    def response_fields(cls):
-        fields = super(Deployment, cls).response_fields
+    @classmethod
+    def _get_response_fields(cls):
+        fields = super(Deployment, cls)._get_response_fields()
         fields['workflows'] = flask_fields.List(
             flask_fields.Nested(Workflow.resource_fields)
         )
@@ -321,7 +321,8 @@ class Execution(CreatedAtMixin, SQLResourceBase):
     is_system_workflow = db.Column(db.Boolean, nullable=False, index=True)
     parameters = db.Column(db.PickleType(protocol=2))
     status = db.Column(
-        db.Enum(*ExecutionState.STATES, name='execution_status')
+        db.Enum(*ExecutionState.STATES, name='execution_status'),
+        index=True
     )
     workflow_id = db.Column(db.Text, nullable=False)
     started_at = db.Column(UTCDateTime, nullable=True)
@@ -363,21 +364,29 @@ class Execution(CreatedAtMixin, SQLResourceBase):
         current_blueprint_id = blueprint_id or deployment.blueprint_id
         self.blueprint_id = current_blueprint_id
 
-    @classproperty
-    def resource_fields(cls):
-        fields = super(Execution, cls).resource_fields
+    @classmethod
+    def _get_resource_fields(cls):
+        fields = super(Execution, cls)._get_resource_fields()
         fields.pop('token')
         return fields
 
 
 class Event(SQLResourceBase):
-    """Execution events."""
+    """Execution events.
+
+    amqp-postgres stores them in weekly partitions of this table,
+    by `timestamp` (see get_events_partition in the 5.1 migration).
+    """
     __tablename__ = 'events'
     __table_args__ = (
         db.Index(
             'events_node_id_visibility_idx',
             'node_id', 'visibility'
         ),
+        db.Index(
+            'events__execution_fk_timestamp__storage_id_idx',
+            '_execution_fk', 'timestamp', '_storage_id'
+        ),
     )
     timestamp = db.Column(
         UTCDateTime,
@@ -413,13 +422,21 @@ class Event(SQLResourceBase):
 
 
 class Log(SQLResourceBase):
-    """Execution logs."""
+    """Execution logs.
+
+    amqp-postgres stores them in weekly partitions of this table,
+    by `timestamp` (see get_events_partition in the 5.1 migration).
+    """
     __tablename__ = 'logs'
     __table_args__ = (
         db.Index(
             'logs_node_id_visibility_execution_fk_idx',
             'node_id', 'visibility', '_execution_fk'
         ),
+        db.Index(
+            'logs__execution_fk_timestamp__storage_id_idx',
+            '_execution_fk', 'timestamp', '_storage_id'
+        ),
     )
 
     timestamp = db.Column(
@@ -556,9 +573,9 @@ class DeploymentUpdate(CreatedAtMixin, SQLResourceBase):
     def recursive_dependencies(cls):
         return None
 
-    @classproperty
-    def response_fields(cls):
-        fields = super(DeploymentUpdate, cls).response_fields
+    @classmethod
+    def _get_response_fields(cls):
+        fields = super(DeploymentUpdate, cls)._get_response_fields()
         fields['steps'] = flask_fields.List(
             flask_fields.Nested(DeploymentUpdateStep.response_fields)
         )
@@ -705,6 +722,10 @@ class Node(SQLResourceBase):
         self._set_parent(deployment)
         self.deployment = deployment
 
+    def set_deployment_keys(self, deployment):
+        self._set_parent_keys(deployment)
+        self._deployment_fk = deployment._storage_id
+
     def set_actual_planned_node_instances(self, num):
         self.actual_planned_number_of_instances = num
 
@@ -749,6 +770,10 @@ class NodeInstance(SQLResourceBase):
         self._set_parent(node)
         self.node = node
 
+    def set_node_keys(self, node):
+        self._set_parent_keys(node)
+        self._node_fk = node._storage_id
+
 
 class Agent(CreatedAtMixin, SQLResourceBase):
     __tablename__ = 'agents'
@@ -20,7 +20,7 @@ from sqlalchemy.ext.associationproxy import association_proxy
 from manager_rest.utils import classproperty
 from cloudify.models_states import VisibilityState
 
-from .models_base import db, SQLModelBase
+from .models_base import db, SQLModelBase, FrozenDict, make_fields_getter
 from .management_models import Tenant, User
 from .relationships import one_to_many_relationship, foreign_key
 
@@ -46,6 +46,23 @@ class SQLResourceBase(SQLModelBase):
 
     @classproperty
     def response_fields(cls):
+        """The fields returned by the REST service for this resource.
+
+        Computed once per class, like `resource_fields`; subclasses that
+        need to change them should override `_get_response_fields`.
+        """
+        return cls._get_cached(
+            'response_fields',
+            lambda: FrozenDict(cls._get_response_fields()))
+
+    @classproperty
+    def _response_fields_getter(cls):
+        return cls._get_cached(
+            'response_fields_getter',
+            lambda: make_fields_getter(cls.response_fields))
+
+    @classmethod
+    def _get_response_fields(cls):
         fields = cls.resource_fields.copy()
         fields.update(cls._extra_fields)
         return fields
@@ -100,8 +117,7 @@ class SQLResourceBase(SQLModelBase):
         return self.visibility == VisibilityState.PRIVATE
 
     def to_response(self, **kwargs):
-        fields = {f: getattr(self, f) for f in self.response_fields}
-        return fields
+        return self._response_fields_getter(self)
 
     def _get_identifier_dict(self):
         id_dict = super(SQLResourceBase, self)._get_identifier_dict()
@@ -120,3 +136,15 @@ class SQLResourceBase(SQLModelBase):
                 self.creator = parent_instance.creator
             self.tenant = parent_instance.tenant
             self.visibility = parent_instance.visibility
+
+    def _set_parent_keys(self, parent_instance):
+        """Like `_set_parent`, but only set the foreign keys
+
+        Setting the relationships would add the resource to the session
+        through the parents' backrefs, so this is used for resources that
+        are inserted with `put_many` instead
+        """
+        if self._creator_id is None:
+            self._creator_id = parent_instance._creator_id
+        self._tenant_id = parent_instance._tenant_id
+        self.visibility = parent_instance.visibility
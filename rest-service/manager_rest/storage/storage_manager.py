@@ -13,11 +13,13 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
+import json
+import base64
 import psutil
 from functools import wraps
 from collections import OrderedDict
 from flask_security import current_user
-from sqlalchemy import or_ as sql_or, func, inspect
+from sqlalchemy import or_ as sql_or, func, inspect, literal
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from flask import current_app, has_request_context
 from sqlite3 import DatabaseError as SQLiteDBError
@@ -39,6 +41,21 @@ except ImportError:
     sql_errors = (SQLAlchemyError, SQLiteDBError)
     Psycopg2DBError = None
 
+# Possible values of the `count` pagination parameter
+COUNT_EXACT = 'exact'
+COUNT_ESTIMATE = 'estimate'
+COUNT_NONE = 'none'
+COUNT_MODES = [COUNT_EXACT, COUNT_ESTIMATE, COUNT_NONE]
+
+# When estimating, rows are counted exactly up to this number
+ESTIMATED_COUNT_LIMIT = 10000
+
+# Number of rows fetched from the DB at a time when streaming results
+STREAM_BATCH_SIZE = 1000
+
+# Number of rows inserted by every INSERT statement of `put_many`
+PUT_MANY_BATCH_SIZE = 1000
+
 
 def no_autoflush(f):
     @wraps(f)
@@ -384,30 +401,129 @@ class SQLStorageManager(object):
             return column.remote_attr.label(column_name)
 
     @staticmethod
-    def _paginate(query, pagination, get_all_results=False):
-        """Paginate the query by size and offset
+    def _paginate(query, pagination, get_all_results=False, model_class=None):
+        """Paginate the query by size and offset, or by a cursor
 
         :param query: Current SQLAlchemy query object
-        :param pagination: An optional dict with size and offset keys
+        :param pagination: An optional dict with size and offset keys, and
+                           optionally `cursor` (see `_apply_cursor`) and
+                           `count` (one of COUNT_MODES)
+        :param model_class: The model class being queried, required when
+                            a cursor is used
         :return: A tuple with four elements:
         - results: `size` items starting from `offset`
-        - the total count of items
+        - the total count of items (None if the count was skipped)
         - `size` [default: 0]
         - `offset` [default: 0]
         """
-
-        if pagination:
-            size = pagination.get('size', config.instance.default_page_size)
-            SQLStorageManager._validate_pagination(size)
-            offset = pagination.get('offset', 0)
-        else:
-            size = config.instance.default_page_size
-            offset = 0
-
-        total = query.order_by(None).count()  # Fastest way to count
+        pagination = pagination or {}
+        size = pagination.get('size', config.instance.default_page_size)
+        SQLStorageManager._validate_pagination(size)
+        offset = pagination.get('offset', 0)
+
+        total = SQLStorageManager._count_results(
+            query, model_class, pagination.get('count', COUNT_EXACT))
+        cursor = pagination.get('cursor')
+        if cursor is not None:
+            if offset:
+                raise manager_exceptions.BadParametersError(
+                    '`_offset` can not be used together with `_cursor`')
+            query = SQLStorageManager._apply_cursor(
+                query, model_class, cursor)
         results = query.limit(size).offset(offset).all()
         return results, total, size, offset
 
+    @staticmethod
+    def _count_results(query, model_class, count_mode):
+        """Count the results of the query, according to count_mode:
+
+        - COUNT_EXACT: count all the rows
+        - COUNT_NONE: don't count at all, return None
+        - COUNT_ESTIMATE: count at most ESTIMATED_COUNT_LIMIT rows; if there
+          are more, and the query isn't filtered, use postgres' estimate of
+          the table size instead
+        """
+        if count_mode == COUNT_NONE:
+            return None
+        query = query.order_by(None)
+        if count_mode != COUNT_ESTIMATE:
+            return query.count()  # Fastest way to count
+
+        total = query.limit(ESTIMATED_COUNT_LIMIT).count()
+        if total < ESTIMATED_COUNT_LIMIT or query.whereclause is not None \
+                or model_class is None:
+            return total
+        estimate = db.session.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE relname = :table',
+            {'table': model_class.__tablename__}
+        ).scalar()
+        return max(total, estimate or 0)
+
+    @staticmethod
+    def _get_cursor_columns(model_class):
+        """The columns that the cursor pagination of model_class is based on
+
+        Those are the default sort column, and _storage_id to make the
+        ordering unique; the sort column is None if it's _storage_id itself.
+        """
+        storage_id = getattr(model_class, '_storage_id', None)
+        if storage_id is None:
+            raise manager_exceptions.BadParametersError(
+                '`_cursor` is not supported for {0}'
+                .format(getattr(model_class, '__name__', 'this resource')))
+        sort_column = model_class.default_sort_column()
+        if sort_column is None or sort_column.key == storage_id.key:
+            sort_column = None
+        return sort_column, storage_id
+
+    @staticmethod
+    def _apply_cursor(query, model_class, cursor):
+        """Only return results after the cursor, in a stable order.
+
+        The query must be ordered by the model's default sort column; this
+        adds _storage_id as a tie-breaker, and filters out everything up
+        to (and including) the row the cursor points at. An empty cursor
+        means the first page.
+        """
+        sort_column, storage_id = \
+            SQLStorageManager._get_cursor_columns(model_class)
+        if sort_column is not None:
+            query = query.order_by(storage_id)
+        if not cursor:
+            return query
+        last_value, last_id = _decode_cursor(cursor)
+        if sort_column is None:
+            return query.filter(storage_id > last_id)
+        # the value in the cursor is as serialized in the response, which
+        # might not be exact (eg. timestamps are truncated to milliseconds),
+        # so prefer the value that's in the db, if the row still exists
+        last_value = func.coalesce(
+            db.session.query(sort_column)
+            .filter(storage_id == last_id)
+            .as_scalar(),
+            literal(last_value, type_=sort_column.type)
+        )
+        return query.filter(
+            sort_column >= last_value,
+            sql_or(sort_column > last_value, storage_id > last_id)
+        )
+
+    @staticmethod
+    def _get_next_cursor(model_class, results, size):
+        """Return the cursor pointing after the last of the results.
+
+        This is None when there are no more results.
+        """
+        if not results or len(results) < size:
+            return None
+        sort_column, storage_id = \
+            SQLStorageManager._get_cursor_columns(model_class)
+        last = results[-1]
+        last_value = None
+        if sort_column is not None:
+            last_value = getattr(last, sort_column.key)
+        return _encode_cursor(last_value, getattr(last, storage_id.key))
+
     @staticmethod
     def _validate_pagination(pagination_size):
         if pagination_size < 0:
@@ -522,6 +638,29 @@ class SQLStorageManager(object):
         current_app.logger.debug('Returning {0}'.format(result))
         return result
 
+    def get_many(self, model_class, element_ids, locking=False):
+        """Return the results with the given IDs, using a single query
+
+        :param locking: Lock the returned rows until the end of the
+                        transaction (SELECT ... FOR UPDATE); the results
+                        that were already loaded into the session are
+                        refreshed from the locked rows
+        :return: A list of the found results; IDs that weren't found are
+                 silently skipped
+        """
+        current_app.logger.debug('Get `{0}` with IDs {1}'.format(
+            model_class.__name__, element_ids))
+        query = self._get_query(model_class,
+                                filters={'id': list(element_ids)})
+        if locking:
+            # always lock in the same order, so that concurrent requests
+            # locking overlapping rows can't deadlock
+            query = query.order_by(None) \
+                .order_by(model_class._storage_id) \
+                .with_for_update() \
+                .populate_existing()
+        return query.all()
+
     @staticmethod
     def _validate_available_memory():
         """Validate minimal available memory in manager
@@ -574,6 +713,12 @@ class SQLStorageManager(object):
             msg = 'List `{0}`'.format(model_class.__name__)
 
         current_app.logger.debug(msg)
+        use_cursor = bool(pagination) and pagination.get('cursor') is not None
+        if use_cursor:
+            if sort:
+                raise manager_exceptions.BadParametersError(
+                    '`_sort` can not be used together with `_cursor`')
+            include = self._include_cursor_columns(model_class, include)
         query = self._get_query(model_class,
                                 include,
                                 filters,
@@ -583,12 +728,71 @@ class SQLStorageManager(object):
 
         results, total, size, offset = self._paginate(query,
                                                       pagination,
-                                                      get_all_results)
+                                                      get_all_results,
+                                                      model_class)
         pagination = {'total': total, 'size': size, 'offset': offset}
+        if use_cursor:
+            pagination['next_cursor'] = \
+                self._get_next_cursor(model_class, results, size)
 
         current_app.logger.debug('Returning: {0}'.format(results))
         return ListResult(items=results, metadata={'pagination': pagination})
 
+    def stream(self,
+               model_class,
+               include=None,
+               filters=None,
+               sort=None,
+               all_tenants=None,
+               substr_filters=None):
+        """Return all the `model_class` results, read lazily from the DB
+
+        Unlike `list`, the results aren't all loaded into memory: the items
+        of the returned ListResult are a generator, which fetches the rows
+        from a server-side cursor, STREAM_BATCH_SIZE rows at a time. The
+        rows are only fetched while the generator is consumed, so it must be
+        consumed within the request context (see
+        `rest_utils.make_streaming_list_response`).
+        No pagination is applied, and the metadata is empty, because the
+        number of results is only known after all of them were read.
+
+        The params are the same as in `list`.
+        """
+        current_app.logger.debug(
+            'Stream `{0}` with filter {1}'.format(model_class.__name__,
+                                                  filters))
+        query = self._get_query(model_class,
+                                include,
+                                filters,
+                                substr_filters,
+                                sort,
+                                all_tenants)
+        # eager loading of collections can't be used together with yield_per
+        query = query.enable_eagerloads(False) \
+            .execution_options(stream_results=True) \
+            .yield_per(STREAM_BATCH_SIZE)
+        return ListResult(items=self._iter_results(query), metadata={})
+
+    @staticmethod
+    def _iter_results(query):
+        """Yield the query results, not keeping them in the session"""
+        for result in query:
+            yield result
+            # the result was already serialized by the consumer
+            if isinstance(result, db.Model):
+                db.session.expunge(result)
+
+    def _include_cursor_columns(self, model_class, include):
+        """Make sure the columns needed for the next cursor are queried"""
+        if not include:
+            return include
+        sort_column, storage_id = self._get_cursor_columns(model_class)
+        include = list(include)
+        for column in [sort_column, storage_id]:
+            if column is not None and column.key not in include:
+                include.append(column.key)
+        return include
+
     def summarize(self, target_field, sub_field, model_class,
                   pagination, get_all_results, all_tenants, filters):
         f = self._get_column(model_class, target_field)
@@ -649,33 +853,76 @@ class SQLStorageManager(object):
             query = self._add_value_filter(query, filters)
         return query.all()
 
-    def put(self, instance):
+    def put(self, instance, commit=True):
         """Create a `model_class` instance from a serializable `model` object
 
         :param instance: An instance of the SQLModelBase class (or some class
         derived from it)
+        :param commit: Whether to commit the instance, or only to flush it,
+        leaving the transaction open
         :return: The same instance, with the tenant set, if necessary
         """
         self._associate_users_and_tenants(instance)
         current_app.logger.debug('Put {0}'.format(instance))
-        self.update(instance, log=False)
+        self.update(instance, log=False, commit=commit)
 
         self._validate_unique_resource_id_per_tenant(instance)
         return instance
 
-    def delete(self, instance, validate_global=False):
+    def put_many(self, instances, returning=None,
+                 batch_size=PUT_MANY_BATCH_SIZE):
+        """Insert many new instances of the same model, without committing
+
+        Unlike `put`, the instances aren't added to the session: they are
+        inserted with multi-row INSERT statements, `batch_size` rows at a
+        time. Their relationships aren't followed, so their foreign keys
+        must already be set, and their ids aren't checked for uniqueness.
+
+        :param instances: Instances of a SQLModelBase class
+        :param returning: Columns of the inserted rows to return
+        :return: The `returning` columns of the inserted rows
+        """
+        if not instances:
+            return []
+        model_class = type(instances[0])
+        mapper = inspect(model_class)
+        columns = [(column.name, mapper.get_property_by_column(column).key)
+                   for column in model_class.__table__.columns
+                   if not column.primary_key]
+        rows = [{name: getattr(instance, attr) for name, attr in columns}
+                for instance in instances]
+        current_app.logger.debug('Put {0} {1}'.format(
+            len(rows), model_class.__name__))
+        returned = []
+        for start in range(0, len(rows), batch_size):
+            statement = model_class.__table__.insert().values(
+                rows[start:start + batch_size])
+            if returning:
+                statement = statement.returning(*returning)
+                returned += db.session.execute(statement).fetchall()
+            else:
+                db.session.execute(statement)
+        return returned
+
+    def delete(self, instance, validate_global=False, commit=True):
         """Delete the passed instance
+
+        :param commit: Whether to commit the deletion, or only to flush it,
+        leaving the transaction open
         """
         if instance.is_resource and validate_global:
             validate_global_modification(instance)
         current_app.logger.debug('Delete {0}'.format(instance))
         self._load_relationships(instance)
         db.session.delete(instance)
-        self._safe_commit()
+        if commit:
+            self._safe_commit()
+        else:
+            db.session.flush()
         return instance
 
     def update(self, instance, log=True, modified_attrs=(),
-               validate_global=False):
+               validate_global=False, commit=True):
         """Add `instance` to the DB session, and attempt to commit
 
         :param instance: Instance to be updated in the DB
@@ -688,6 +935,8 @@ class SQLStorageManager(object):
                                are reported then you probably need this.
         :param validate_global: Verify that modification of this global
                                 resource is permitted
+        :param commit: Whether to commit the instance, or only to flush it,
+                       leaving the transaction open
         :return: The updated instance
         """
         if instance.is_resource and validate_global:
@@ -698,7 +947,10 @@ class SQLStorageManager(object):
         self._validate_unique_resource_id_per_tenant(instance)
         for attr in modified_attrs:
             flag_modified(instance, attr)
-        self._safe_commit()
+        if commit:
+            self._safe_commit()
+        else:
+            db.session.flush()
         return instance
 
     def refresh(self, instance):
@@ -714,9 +966,12 @@ class SQLStorageManager(object):
 
 
 class ReadOnlyStorageManager(SQLStorageManager):
-    def put(self, instance):
+    def put(self, instance, *_, **__):
         return instance
 
+    def put_many(self, instances, *_, **__):
+        return []
+
     def delete(self, instance, *_, **__):
         return instance
 
@@ -738,6 +993,21 @@ def get_read_only_storage_manager():
                                          ReadOnlyStorageManager())
 
 
+def _encode_cursor(last_value, last_id):
+    cursor = json.dumps([last_value, last_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(cursor).decode('ascii')
+
+
+def _decode_cursor(cursor):
+    try:
+        last_value, last_id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        return last_value, int(last_id)
+    except (ValueError, TypeError):
+        raise manager_exceptions.BadParametersError(
+            'Invalid `_cursor`: {0}'.format(cursor))
+
+
 class ListResult(object):
     """
     a ListResult contains results about the requested items.
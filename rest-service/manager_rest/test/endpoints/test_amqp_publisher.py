@@ -0,0 +1,93 @@
+#########
+# Copyright (c) 2020 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+from unittest import TestCase
+
+from mock import patch
+from pika.exceptions import ConnectionClosed
+
+from manager_rest.amqp_publisher import AMQPPublisherPool, PublishError
+
+
+class AMQPPublisherPoolTest(TestCase):
+    def setUp(self):
+        patcher = patch('manager_rest.amqp_publisher.pika.BlockingConnection')
+        self.connection_cls = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.channel = self.connection_cls.return_value.channel.return_value
+        self.pool = AMQPPublisherPool(['broker1'], size=1, checkout_timeout=0)
+
+    def test_connection_reused(self):
+        self.pool.publish({'a': 1}, 'exchange1', 'key')
+        self.pool.publish({'a': 2}, 'exchange1', 'key')
+        self.assertEqual(self.connection_cls.call_count, 1)
+        self.channel.confirm_delivery.assert_called_once_with()
+        self.assertEqual(self.channel.exchange_declare.call_count, 1)
+        self.assertEqual(self.channel.basic_publish.call_count, 2)
+        metrics = self.pool.get_metrics()
+        self.assertEqual(metrics['connects'], 1)
+        self.assertEqual(metrics['published'], 2)
+        self.assertEqual(metrics['idle'], 1)
+
+    def test_reconnect_on_failure(self):
+        self.channel.basic_publish.side_effect = [ConnectionClosed(), True]
+        self.pool.publish({'a': 1}, 'exchange1', 'key')
+        self.assertEqual(self.connection_cls.call_count, 2)
+        self.assertEqual(self.channel.basic_publish.call_count, 2)
+        metrics = self.pool.get_metrics()
+        self.assertEqual(metrics['errors'], 1)
+        self.assertEqual(metrics['published'], 1)
+
+    def test_failure_after_retry(self):
+        self.channel.basic_publish.side_effect = ConnectionClosed()
+        with self.assertRaises(ConnectionClosed):
+            self.pool.publish({'a': 1}, 'exchange1', 'key')
+        # the connection was returned to the pool
+        self.assertEqual(self.pool.get_metrics()['idle'], 1)
+
+    def test_not_confirmed(self):
+        self.channel.basic_publish.return_value = False
+        with self.assertRaisesRegex(PublishError, 'confirm'):
+            self.pool.publish({'a': 1}, 'exchange1', 'key')
+
+    def test_pool_exhausted(self):
+        self.pool._checkout()
+        with self.assertRaisesRegex(PublishError, 'busy'):
+            self.pool.publish({'a': 1}, 'exchange1', 'key')
+        self.assertEqual(self.pool.get_metrics()['checkout_waits'], 1)
+
+    def test_publish_delayed(self):
+        self.pool.publish_delayed({'a': 1}, 'exec1', 1000,
+                                  'target', 'workflow')
+        queue_kwargs = self.channel.queue_declare.call_args[1]
+        self.assertEqual(queue_kwargs['queue'], 'exec1_queue')
+        self.assertEqual(queue_kwargs['arguments'], {
+            'x-message-ttl': 1000,
+            'x-dead-letter-exchange': 'target',
+            'x-dead-letter-routing-key': 'workflow',
+        })
+        publish_kwargs = self.channel.basic_publish.call_args[1]
+        self.assertEqual(publish_kwargs['exchange'], 'exec1')
+        self.assertEqual(publish_kwargs['routing_key'], 'exec1_queue')
+
+    def test_publish_many_resumes_after_reconnect(self):
+        self.channel.basic_publish.side_effect = [
+            True, ConnectionClosed(), True, True]
+        self.pool.publish_many([{'a': 1}, {'a': 2}, {'a': 3}], 'exchange1')
+        bodies = [call[1]['body']
+                  for call in self.channel.basic_publish.call_args_list]
+        self.assertEqual(bodies, ['{"a": 1}', '{"a": 2}', '{"a": 2}',
+                                  '{"a": 3}'])
+        self.assertEqual(self.pool.get_metrics()['published'], 3)
@@ -0,0 +1,112 @@
+#########
+# Copyright (c) 2020 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+from datetime import datetime, timedelta
+
+from cloudify.cluster_status import CloudifyNodeType, ServiceStatus
+
+from manager_rest import cluster_status_manager
+from manager_rest.storage import models
+from manager_rest.test import base_test
+from manager_rest.test.attribute import attr
+
+NODE_ID = 'node-1'
+
+
+@attr(client_min_version=3.1, client_max_version=base_test.LATEST_API_VERSION)
+class ClusterStatusTest(base_test.BaseServerTestCase):
+    def setUp(self):
+        super(ClusterStatusTest, self).setUp()
+        # the cluster status of a previous test might still be cached
+        cluster_status_manager._invalidate_cluster_status()
+        self.addCleanup(cluster_status_manager._invalidate_cluster_status)
+        now = datetime.utcnow()
+        ca_cert = models.Certificate(name='ca', value='cert', updated_at=now)
+        # an all-in-one manager: every node has the same node_id
+        self.sm.put(models.Manager(
+            hostname='manager-1', private_ip='10.0.0.1',
+            public_ip='10.0.0.1', version='5.1', edition='premium',
+            distribution='centos', distro_release='core',
+            node_id=NODE_ID, last_seen=now, ca_cert=ca_cert))
+        self.sm.put(models.RabbitMQBroker(
+            name='manager-1', host='10.0.0.1', node_id=NODE_ID,
+            ca_cert=ca_cert))
+        self.sm.put(models.DBNodes(
+            name='manager-1', host='10.0.0.1', node_id=NODE_ID))
+
+    def _report(self, node_type, status=ServiceStatus.HEALTHY,
+                services=None, expected_status_code=200, **kwargs):
+        timestamp = datetime.utcnow() - timedelta(seconds=1)
+        report = {
+            'reporting_freq': 5,
+            'timestamp': timestamp.isoformat(),
+            'report': {'status': status, 'services': services or {}},
+        }
+        report.update(kwargs)
+        response = self.put(
+            '/cluster-status/{0}/{1}'.format(node_type, NODE_ID), report)
+        self.assertEqual(response.status_code, expected_status_code)
+
+    def _get_status(self):
+        response = self.get('/cluster-status')
+        self.assertEqual(response.status_code, 200)
+        return response.json
+
+    def test_reports_stored(self):
+        for node_type in [CloudifyNodeType.MANAGER, CloudifyNodeType.DB,
+                          CloudifyNodeType.BROKER]:
+            self._report(node_type)
+        self.assertEqual(self.sm.count(models.StatusReport), 3)
+        cluster_status = self._get_status()
+        self.assertEqual(cluster_status['status'], ServiceStatus.HEALTHY)
+        manager_nodes = \
+            cluster_status['services'][CloudifyNodeType.MANAGER]['nodes']
+        self.assertEqual(manager_nodes['manager-1']['status'],
+                         ServiceStatus.HEALTHY)
+
+    def test_missing_manager_report(self):
+        cluster_status = self._get_status()
+        self.assertEqual(cluster_status['status'], ServiceStatus.FAIL)
+
+    def test_report_invalidates_cached_status(self):
+        self._report(CloudifyNodeType.MANAGER)
+        manager_service = \
+            self._get_status()['services'][CloudifyNodeType.MANAGER]
+        self.assertEqual(manager_service['status'], ServiceStatus.HEALTHY)
+
+        self._report(CloudifyNodeType.MANAGER, ServiceStatus.FAIL)
+        self.assertEqual(self.sm.count(models.StatusReport), 1)
+        manager_service = \
+            self._get_status()['services'][CloudifyNodeType.MANAGER]
+        self.assertEqual(manager_service['status'], ServiceStatus.FAIL)
+
+    def test_delta_report(self):
+        services = {
+            'PostgreSQL': {'status': 'Active', 'extra_info': {}},
+            'RabbitMQ': {'status': 'Active', 'extra_info': {}},
+        }
+        self._report(CloudifyNodeType.MANAGER, services=services)
+        self._report(CloudifyNodeType.MANAGER, delta=True, services={
+            'RabbitMQ': {'status': 'Inactive', 'extra_info': {}}})
+        report = models.StatusReport.query.one().report
+        self.assertNotIn('delta', report)
+        self.assertEqual(report['report']['services'], {
+            'PostgreSQL': {'status': 'Active', 'extra_info': {}},
+            'RabbitMQ': {'status': 'Inactive', 'extra_info': {}},
+        })
+
+    def test_delta_report_without_previous_report(self):
+        self._report(CloudifyNodeType.MANAGER, delta=True,
+                     expected_status_code=400)
@@ -331,6 +331,79 @@ class DeploymentsTestCase(base_test.BaseServerTestCase):
         assert_node_exists('vm')
         assert_node_exists('http_web_server')
 
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_node_instances_inherit_from_nodes(self):
+        _, deployment_id, _, deployment = self.put_deployment(
+            self.DEPLOYMENT_ID, blueprint_file_name='modify2.yaml')
+        nodes = {node.id: node for node in
+                 self.client.nodes.list(deployment_id=deployment_id)}
+        self.assertEqual(nodes['node1'].number_of_instances, 2)
+
+        instances = self.client.node_instances.list(
+            deployment_id=deployment_id)
+        self.assertEqual(3, len(instances))
+        node1_indexes = sorted(instance['index'] for instance in instances
+                               if instance.node_id == 'node1')
+        self.assertEqual(node1_indexes, [1, 2])
+        for instance in instances:
+            self.assertEqual(instance.state, 'uninitialized')
+            self.assertEqual(instance.version, 1)
+            self.assertEqual(instance['tenant_name'],
+                             deployment['tenant_name'])
+            self.assertEqual(instance['created_by'],
+                             deployment['created_by'])
+            self.assertEqual(instance['visibility'],
+                             deployment['visibility'])
+
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_create_deployments_bulk(self):
+        self.put_deployment(self.DEPLOYMENT_ID,
+                            blueprint_file_name='modify2.yaml',
+                            blueprint_id='blueprint')
+        response = self.post('/deployments/bulk', {
+            'blueprint_id': 'blueprint',
+            'deployments': [{'id': 'dep1'},
+                            {'id': self.DEPLOYMENT_ID},
+                            {'id': 'dep2'},
+                            {'id': 'dep1'},
+                            {'id': 'illegal id'}],
+        })
+        self.assertEqual(response.status_code, 201)
+        results = response.json['items']
+        self.assertEqual([r['deployment_id'] for r in results],
+                         ['dep1', self.DEPLOYMENT_ID, 'dep2', 'dep1',
+                          'illegal id'])
+        for result in results[1], results[3]:
+            self.assertEqual(result['error_code'], 'conflict_error')
+            self.assertIsNone(result['deployment'])
+        self.assertIn('illegal characters', results[4]['error'])
+
+        for result in results[0], results[2]:
+            self.assertIsNone(result['error'])
+            deployment_id = result['deployment_id']
+            self.assertEqual(result['deployment']['id'], deployment_id)
+            self.assertEqual(result['execution']['workflow_id'],
+                             'create_deployment_environment')
+            self.assertEqual(result['execution']['deployment_id'],
+                             deployment_id)
+            instances = self.client.node_instances.list(
+                deployment_id=deployment_id)
+            self.assertEqual(3, len(instances))
+            node1_indexes = sorted(instance['index'] for instance in instances
+                                   if instance.node_id == 'node1')
+            self.assertEqual(node1_indexes, [1, 2])
+
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_create_deployments_bulk_missing_blueprint(self):
+        response = self.post('/deployments/bulk', {
+            'blueprint_id': 'nonexistent',
+            'deployments': [{'id': 'dep1'}],
+        })
+        self.assertEqual(response.status_code, 404)
+
     def test_delete_deployment_folder_from_file_server(self):
         (blueprint_id, deployment_id, blueprint_response,
          deployment_response) = self.put_deployment(self.DEPLOYMENT_ID)
@@ -13,6 +13,7 @@
 #  * limitations under the License.
 
 from collections import namedtuple
+from datetime import datetime, timedelta
 from copy import deepcopy
 from random import choice
 from unittest import TestCase
@@ -20,6 +21,7 @@ from unittest import TestCase
 from faker import Faker
 from flask import Flask
 from mock import patch
+from manager_rest.test import base_test
 from manager_rest.test.attribute import attr
 
 from manager_rest.manager_exceptions import BadParametersError
@@ -669,6 +671,81 @@ class SelectEventsSortTest(SelectEventsBaseTest):
         self._sort_by_timestamp('@timestamp', 'desc')
 
 
+@attr(client_min_version=1, client_max_version=1)
+class SelectEventsMergedTest(SelectEventsBaseTest):
+
+    """Select events and logs without a union, page by page."""
+
+    DEFAULT_FILTERS = {
+        'type': ['cloudify_event', 'cloudify_log']
+    }
+
+    def _select_merged(self, direction='asc', filters=None, **pagination):
+        return EventsV1._select_merged(
+            filters or self.DEFAULT_FILTERS,
+            'timestamp',
+            direction,
+            {},
+            self.tenant.id,
+            pagination
+        )
+
+    def _assert_sorted(self, direction):
+        events, total, next_cursor = self._select_merged(direction, size=100)
+        expected_timestamps = sorted(
+            (event.timestamp for event in self.events),
+            reverse=direction == 'desc',
+        )
+        self.assertListEqual(
+            [event.timestamp for event in events], expected_timestamps)
+        self.assertEqual(total, len(self.events))
+        self.assertIsNone(next_cursor)
+
+    def test_sort_ascending(self):
+        self._assert_sorted('asc')
+
+    def test_sort_descending(self):
+        self._assert_sorted('desc')
+
+    def test_offset(self):
+        all_events, _, _ = self._select_merged(size=100)
+        events, _, _ = self._select_merged(size=10, offset=20)
+        self.assertListEqual(
+            [event.id for event in events],
+            [event.id for event in all_events[20:30]])
+
+    def test_cursor(self):
+        """Paging with a cursor returns every event once, in order."""
+        for direction in ['asc', 'desc']:
+            all_events, _, _ = self._select_merged(direction, size=100)
+            event_ids = []
+            cursor = ''
+            while cursor is not None:
+                events, total, cursor = self._select_merged(
+                    direction, size=7, cursor=cursor, count='none')
+                self.assertIsNone(total)
+                event_ids += [event.id for event in events]
+            self.assertListEqual(
+                event_ids, [event.id for event in all_events])
+
+    def test_filter_by_execution(self):
+        execution = choice(self.executions)
+        filters = dict(self.DEFAULT_FILTERS, execution_id=[execution.id])
+        events, total, _ = self._select_merged(filters=filters, size=100)
+        expected_events = [
+            event for event in self.events
+            if event._execution_fk == execution._storage_id
+        ]
+        self.assertEqual(
+            sorted(event.id for event in events),
+            sorted(event.id for event in expected_events))
+        self.assertEqual(total, len(expected_events))
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(BadParametersError):
+            self._select_merged(size=10, cursor='invalid')
+
+
 @attr(client_min_version=1, client_max_version=1)
 class SelectEventsRangeFilterTest(SelectEventsBaseTest):
 
@@ -929,3 +1006,71 @@ class MapEventToDictTestV1(TestCase):
         es_log = EventsV1._map_event_to_dict(None, sql_log)
 
         self.assertDictEqual(es_log, expected_es_log)
+
+
+@attr(client_min_version=2, client_max_version=base_test.LATEST_API_VERSION)
+class ListEventsPagesTest(base_test.BaseServerTestCase):
+
+    """Pages of the events list sorted by timestamp."""
+
+    def setUp(self):
+        super(ListEventsPagesTest, self).setUp()
+        blueprint = self._add_blueprint()
+        deployment = self._add_deployment(blueprint)
+        self.execution = self._add_execution(deployment)
+        self.start = datetime.utcnow()
+        for i in range(5):
+            event = Event(
+                id='event_{0}'.format(i),
+                timestamp=self.start + timedelta(seconds=i),
+                reported_timestamp=self.start + timedelta(seconds=i),
+                event_type='workflow_started',
+                message='event {0}'.format(i),
+            )
+            event.set_execution(self.execution)
+            self.sm.put(event)
+
+    def _list(self, **query_params):
+        query_params.update(execution_id=self.execution.id,
+                            _sort='timestamp')
+        response = self.get('/events', query_params=query_params)
+        self.assertEqual(response.status_code, 200)
+        return [event['message'] for event in response.json['items']]
+
+    def test_offset_not_merged(self):
+        """Pages at an offset skip the offset in SQL, rather than merging"""
+        with patch.object(EventsV1, '_select_merged') as merged:
+            messages = self._list(_offset=2, _size=2)
+        merged.assert_not_called()
+        self.assertEqual(messages, ['event 2', 'event 3'])
+        self.assertEqual(self._list(_size=2), ['event 0', 'event 1'])
+
+    def test_offset_not_counted(self):
+        """Pages at an offset are counted according to `_count`"""
+        response = self.get('/events', query_params={
+            'execution_id': self.execution.id,
+            '_sort': 'timestamp',
+            '_offset': 2,
+            '_count': 'none',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json['items']), 3)
+        self.assertIsNone(response.json['metadata']['pagination']['total'])
+
+    def test_offset_same_timestamp(self):
+        """Events and logs with the same timestamp are in the same order
+        in the merged first page and in the pages at an offset.
+        """
+        log = Log(
+            id='log_0',
+            timestamp=self.start + timedelta(seconds=1),
+            reported_timestamp=self.start + timedelta(seconds=1),
+            logger='<logger>',
+            level='info',
+            message='log 0',
+        )
+        log.set_execution(self.execution)
+        self.sm.put(log)
+        self.assertEqual(self._list(_size=2), ['event 0', 'event 1'])
+        self.assertEqual(self._list(_offset=2, _size=2),
+                         ['log 0', 'event 2'])
@@ -0,0 +1,124 @@
+#########
+# Copyright (c) 2020 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import json
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from manager_rest import config
+from manager_rest.events_listener import EventsListener
+from manager_rest.rest.resources_v3_1.events import _acquire_stream_slot
+from manager_rest.storage import models
+from manager_rest.test import base_test
+from manager_rest.test.attribute import attr
+
+
+@attr(client_min_version=1, client_max_version=1)
+class EventsListenerTest(TestCase):
+    def setUp(self):
+        self.listener = EventsListener(Mock())
+        self.listener.connected = True
+
+    def test_wait_notified(self):
+        position = self.listener.position
+        self.listener._notify(['1', '2'])
+        self.assertTrue(self.listener.wait([2], position, 1))
+        self.assertTrue(self.listener.wait(None, position, 1))
+
+    def test_wait_timeout(self):
+        position = self.listener.position
+        self.listener._notify(['1', 'invalid'])
+        self.assertFalse(self.listener.wait([2], position, 0.01))
+        # notifications from before the position don't count
+        self.assertFalse(self.listener.wait([1], position + 1, 0.01))
+
+
+@attr(client_min_version=3.1, client_max_version=base_test.LATEST_API_VERSION)
+class EventsStreamTest(base_test.BaseServerTestCase):
+    def setUp(self):
+        super(EventsStreamTest, self).setUp()
+        patcher = patch(
+            'manager_rest.rest.resources_v3_1.events.STREAM_END_DELAY', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        blueprint = self._add_blueprint()
+        deployment = self._add_deployment(blueprint)
+        self.execution = self._add_execution(deployment)
+        start = datetime.utcnow()
+        for i in range(5):
+            event = models.Event(
+                id='event_{0}'.format(i),
+                timestamp=start + timedelta(seconds=i),
+                reported_timestamp=start + timedelta(seconds=i),
+                event_type='workflow_started',
+                message='event {0}'.format(i),
+            )
+            event.set_execution(self.execution)
+            self.sm.put(event)
+
+    def _stream(self, **query_params):
+        query_params.setdefault('execution_id', self.execution.id)
+        response = self.get('/events/stream', query_params=query_params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        messages = []
+        for block in response.data.decode('utf-8').split('\n\n'):
+            message = {}
+            for line in block.splitlines():
+                field, _, value = line.partition(': ')
+                message[field] = value
+            if 'data' in message:
+                messages.append(message)
+        return messages
+
+    def test_stream_ended_execution(self):
+        messages = self._stream()
+        self.assertEqual([json.loads(message['data'])['message']
+                          for message in messages[:-1]],
+                         ['event {0}'.format(i) for i in range(5)])
+        self.assertEqual(messages[-1]['event'], 'end')
+
+    def test_resume(self):
+        messages = self._stream()
+        resumed = self._stream(_cursor=messages[1]['id'])
+        self.assertEqual([message.get('id') for message in resumed[:-1]],
+                         [message['id'] for message in messages[2:-1]])
+
+    def test_invalid_arguments(self):
+        response = self.get('/events/stream', query_params={
+            'execution_id': self.execution.id,
+            'deployment_id': self.execution.deployment_id,
+        })
+        self.assertEqual(response.status_code, 400)
+        response = self.get('/events/stream', query_params={
+            'execution_id': self.execution.id,
+            '_cursor': 'invalid',
+        })
+        self.assertEqual(response.status_code, 400)
+
+    def test_too_many_streams(self):
+        with patch.object(config.instance, 'max_event_streams', 1):
+            slot = _acquire_stream_slot()
+            try:
+                response = self.get('/events/stream', query_params={
+                    'execution_id': self.execution.id})
+                self.assertEqual(response.status_code, 503)
+            finally:
+                slot.close()
+            # the slot was released, and so is the one of this stream
+            self._stream()
+            self._stream()
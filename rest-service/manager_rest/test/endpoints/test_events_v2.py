@@ -12,8 +12,16 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
+import os
+import gzip
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
 from mock import patch
 
+from manager_rest.events_deletion import delete_deployment_events
+from manager_rest.storage import models
 from manager_rest.test.attribute import attr
 
 from manager_rest.test import base_test
@@ -57,15 +65,106 @@ class EventsTest(base_test.BaseServerTestCase):
 
     @attr(client_min_version=3,
           client_max_version=base_test.LATEST_API_VERSION)
-    @patch('manager_rest.rest.resources_v2.events.Events._store_log_entries')
-    def test_delete_events_store_before(self, store_log_entries):
+    @patch('manager_rest.events_deletion.open_archive')
+    def test_delete_events_store_before(self, open_archive):
         response = self.client.events.delete(
             '<deployment_id>', include_logs=False,
             store_before='true')
-        self.assertEqual(store_log_entries.call_count, 1)
+        self.assertEqual(open_archive.call_count, 1)
         self.assertEqual(response.items, [0])
         response = self.client.events.delete(
             '<deployment_id>', include_logs=True,
             store_before='true')
-        self.assertEqual(store_log_entries.call_count, 3)
+        self.assertEqual(open_archive.call_count, 3)
         self.assertEqual(response.items, [0])
+
+    @attr(client_min_version=3,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_delete_events_in_background(self):
+        response = self.delete('/events', query_params={
+            'deployment_id': '<deployment_id>',
+            'type': ['cloudify_event', 'cloudify_log'],
+            'background': 'true',
+        })
+        self.assertEqual(response.status_code, 200)
+        execution = self.sm.get(
+            models.Execution, response.json['metadata']['execution_id'])
+        self.assertEqual(execution.workflow_id, 'delete_events')
+        self.assertEqual(execution.parameters['deployment_id'],
+                         '<deployment_id>')
+        self.assertTrue(execution.parameters['include_logs'])
+
+
+@attr(client_min_version=3, client_max_version=base_test.LATEST_API_VERSION)
+class EventsDeletionTest(base_test.BaseServerTestCase):
+    def setUp(self):
+        super(EventsDeletionTest, self).setUp()
+        blueprint = self._add_blueprint()
+        self.deployment = self._add_deployment(blueprint)
+        self.execution = self._add_execution(self.deployment)
+        self.start = datetime.utcnow()
+        for i in range(5):
+            event = models.Event(
+                id='event_{0}'.format(i),
+                timestamp=self.start + timedelta(seconds=i),
+                reported_timestamp=self.start + timedelta(seconds=i),
+                event_type='workflow_started',
+                message='event {0}'.format(i),
+            )
+            event.set_execution(self.execution)
+            self.sm.put(event)
+        log = models.Log(
+            id='log_0',
+            timestamp=self.start,
+            reported_timestamp=self.start,
+            logger='cloudify.test',
+            level='info',
+            message='log 0',
+        )
+        log.set_execution(self.execution)
+        self.sm.put(log)
+
+        self.archive_directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_directory)
+        patcher = patch('manager_rest.events_deletion.ARCHIVE_DIRECTORY',
+                        self.archive_directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _delete(self, **kwargs):
+        progress = []
+        deleted = delete_deployment_events(
+            self.deployment.id, self.execution._tenant_id,
+            batch_size=2,
+            progress=lambda table, count: progress.append((table, count)),
+            **kwargs)
+        return deleted, progress
+
+    def test_delete_in_batches(self):
+        deleted, progress = self._delete(include_logs=True)
+        self.assertEqual(deleted, 6)
+        self.assertEqual(progress, [('events', 2), ('events', 4),
+                                    ('events', 5), ('logs', 1)])
+        self.assertEqual(self.sm.count(models.Event), 0)
+        self.assertEqual(self.sm.count(models.Log), 0)
+
+    def test_delete_range(self):
+        deleted, _ = self._delete(range_filters={
+            'timestamp': {'to': self.start + timedelta(seconds=2.5)}})
+        self.assertEqual(deleted, 3)
+        self.assertEqual(
+            sorted(event.id for event in self.sm.list(models.Event)),
+            ['event_3', 'event_4'])
+        self.assertEqual(self.sm.count(models.Log), 1)
+
+    def test_archive(self):
+        self._delete(store_before=True)
+        archive_name, = os.listdir(self.archive_directory)
+        self.assertTrue(archive_name.startswith(
+            'events_{0}_'.format(self.deployment.id)))
+        with gzip.open(os.path.join(self.archive_directory,
+                                    archive_name)) as archive:
+            lines = archive.read().decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertIn('event 0', lines[0])
+        self.assertIn('event 4', lines[4])
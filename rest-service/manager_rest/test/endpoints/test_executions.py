@@ -26,7 +26,8 @@ from cloudify.workflows import tasks as cloudify_tasks
 from cloudify.constants import CLOUDIFY_EXECUTION_TOKEN_HEADER
 
 from manager_rest.storage import models
-from manager_rest import utils, manager_exceptions
+from manager_rest import config, utils, manager_exceptions
+from manager_rest.resource_manager import get_resource_manager
 from manager_rest.test.attribute import attr
 from manager_rest.test.base_test import BaseServerTestCase, LATEST_API_VERSION
 
@@ -955,6 +956,41 @@ class ExecutionsTestCase(BaseServerTestCase):
         self._create_execution_and_update_token('deployment_2', token)
         self._assert_invalid_execution_token(token)
 
+    @attr(client_min_version=3.1, client_max_version=LATEST_API_VERSION)
+    def test_execution_token_status_change(self):
+        """The cached token execution is dropped when its status changes"""
+        token = uuid.uuid4().hex
+        execution_id = self._create_execution_and_update_token(
+            'deployment_1', token)
+        self._assert_valid_execution_token(token)
+        self.client.executions.update(execution_id, ExecutionState.FAILED)
+        self._assert_invalid_execution_token(token)
+
+    @attr(client_min_version=3.1, client_max_version=LATEST_API_VERSION)
+    def test_execution_token_cancelled_running_operations(self):
+        token = uuid.uuid4().hex
+        execution_id = self._create_execution_and_update_token(
+            'deployment_1', token)
+        execution = self.sm.get(models.Execution, execution_id)
+        tasks_graph = self.sm.put(models.TasksGraph(
+            _execution_fk=execution._storage_id,
+            name='install',
+            created_at=datetime.now()
+        ))
+        operation = self.sm.put(models.Operation(
+            _tasks_graph_fk=tasks_graph._storage_id,
+            state=cloudify_tasks.TASK_STARTED,
+            created_at=datetime.now()
+        ))
+        self._modify_execution_status_in_database(execution,
+                                                  ExecutionState.CANCELLED)
+        # operations of the cancelled execution are still running
+        self._assert_valid_execution_token(token)
+
+        operation.state = cloudify_tasks.TASK_SUCCEEDED
+        self.sm.update(operation)
+        self._assert_invalid_execution_token(token)
+
     def _create_execution_and_update_token(self, deployment_id, token):
         self.put_deployment(deployment_id, blueprint_id=deployment_id)
         execution = self.client.executions.start(deployment_id, 'install')
@@ -980,3 +1016,139 @@ class ExecutionsTestCase(BaseServerTestCase):
         client = self.create_client(headers=headers)
         executions = client.executions.list()
         self.assertEqual(2, len(executions))
+
+    @attr(client_min_version=3.1, client_max_version=LATEST_API_VERSION)
+    def test_execute_bulk(self):
+        for deployment_id in ['dep1', 'dep2']:
+            self.put_deployment(deployment_id, blueprint_id=deployment_id)
+        response = self.post('/executions/bulk', {
+            'deployment_ids': ['dep1', 'nonexistent', 'dep2'],
+            'workflow_id': 'install',
+        })
+        self.assertEqual(response.status_code, 201)
+        results = response.json['items']
+        self.assertEqual([r['deployment_id'] for r in results],
+                         ['dep1', 'nonexistent', 'dep2'])
+        self.assertEqual(results[1]['error_code'], 'not_found_error')
+        self.assertIsNone(results[1]['execution'])
+        for result in [results[0], results[2]]:
+            self.assertIsNone(result['error'])
+            execution = self.sm.get(models.Execution,
+                                    result['execution']['id'])
+            self.assertEqual(execution.deployment_id, result['deployment_id'])
+            self.assertEqual(execution.workflow_id, 'install')
+            self.assertTrue(execution.token)
+
+    @attr(client_min_version=3.1, client_max_version=LATEST_API_VERSION)
+    def test_execute_bulk_running_execution(self):
+        self.put_deployment(self.DEPLOYMENT_ID)
+        execution = self.client.executions.start(self.DEPLOYMENT_ID,
+                                                 'install')
+        self._modify_execution_status_in_database(execution,
+                                                  ExecutionState.STARTED)
+        results = self.post('/executions/bulk', {
+            'deployment_ids': [self.DEPLOYMENT_ID],
+            'workflow_id': 'install',
+        }).json['items']
+        self.assertEqual(results[0]['error_code'],
+                         'existing_running_execution_error')
+
+        with mock.patch('manager_rest.resource_manager.send_event') as send:
+            results = self.post('/executions/bulk', {
+                'deployment_ids': [self.DEPLOYMENT_ID],
+                'workflow_id': 'install',
+                'queue': True,
+            }).json['items']
+        self.assertEqual(results[0]['execution']['status'],
+                         ExecutionState.QUEUED)
+        send.assert_called_once()
+
+    def test_execute_with_running_execution(self):
+        self.put_deployment(self.DEPLOYMENT_ID)
+        execution = self.client.executions.start(self.DEPLOYMENT_ID,
+                                                 'install')
+        self._modify_execution_status_in_database(execution,
+                                                  ExecutionState.STARTED)
+        with self.assertRaisesRegex(exceptions.CloudifyClientError,
+                                    execution.id):
+            self.client.executions.start(self.DEPLOYMENT_ID, 'install')
+        forced = self.client.executions.start(self.DEPLOYMENT_ID, 'install',
+                                              force=True)
+        # the mocked workflow executor ends the started executions at once
+        self.assertEqual(forced.status, ExecutionState.TERMINATED)
+
+    def test_execute_with_running_system_wide_execution(self):
+        self.put_deployment(self.DEPLOYMENT_ID)
+        system_execution = self.sm.put(models.Execution(
+            id='system-execution',
+            status=ExecutionState.STARTED,
+            workflow_id='create_snapshot',
+            created_at=utils.get_formatted_timestamp(),
+            error='',
+            parameters={},
+            is_system_workflow=True,
+        ))
+        with self.assertRaisesRegex(exceptions.CloudifyClientError,
+                                    system_execution.id):
+            self.client.executions.start(self.DEPLOYMENT_ID, 'install')
+        rm = get_resource_manager()
+        with self.assertRaises(
+                manager_exceptions.ExistingRunningExecutionError):
+            rm.assert_no_snapshot_creation_running_or_queued()
+
+        system_execution.status = ExecutionState.TERMINATED
+        self.sm.update(system_execution)
+        rm.assert_no_snapshot_creation_running_or_queued()
+        execution = self.client.executions.start(self.DEPLOYMENT_ID,
+                                                 'install')
+        self.assertEqual(execution.status, ExecutionState.TERMINATED)
+
+    def _get_status(self, execution):
+        return self.client.executions.get(execution.id).status
+
+    def test_queued_executions_started_per_deployment(self):
+        self.put_deployment('dep1', blueprint_id='bp1')
+        self.put_deployment('dep2', blueprint_id='bp2')
+        running1 = self.client.executions.start('dep1', 'install')
+        running2 = self.client.executions.start('dep2', 'install')
+        for execution in [running1, running2]:
+            self._modify_execution_status_in_database(
+                execution, ExecutionState.STARTED)
+        with mock.patch('manager_rest.resource_manager.send_event'):
+            queued1 = [self.client.executions.start('dep1', 'install',
+                                                    queue=True)
+                       for _ in range(2)]
+            queued2 = self.client.executions.start('dep2', 'install',
+                                                   queue=True)
+        for execution in queued1 + [queued2]:
+            self.assertEqual(execution.status, ExecutionState.QUEUED)
+
+        # the mocked workflow executor ends the started executions at once,
+        # without starting the next queued ones
+        self._modify_execution_status(running1.id, ExecutionState.TERMINATED)
+        self.assertEqual(self._get_status(queued1[0]),
+                         ExecutionState.TERMINATED)
+        self.assertEqual(self._get_status(queued1[1]), ExecutionState.QUEUED)
+        self.assertEqual(self._get_status(queued2), ExecutionState.QUEUED)
+
+        self._modify_execution_status(running2.id, ExecutionState.TERMINATED)
+        self.assertEqual(self._get_status(queued2), ExecutionState.TERMINATED)
+        self.assertEqual(self._get_status(queued1[1]), ExecutionState.QUEUED)
+
+    def test_queued_executions_tenant_limit(self):
+        self.put_deployment('dep1', blueprint_id='bp1')
+        self.put_deployment('dep2', blueprint_id='bp2')
+        running = self.client.executions.start('dep1', 'install')
+        self._modify_execution_status_in_database(running,
+                                                  ExecutionState.STARTED)
+        with mock.patch.object(config.instance,
+                               'max_concurrent_executions_per_tenant', 1), \
+                mock.patch('manager_rest.resource_manager.send_event'):
+            queued = self.client.executions.start('dep2', 'install',
+                                                  queue=True)
+            self.assertEqual(queued.status, ExecutionState.QUEUED)
+
+            self._modify_execution_status(running.id,
+                                          ExecutionState.TERMINATED)
+            self.assertEqual(self._get_status(queued),
+                             ExecutionState.TERMINATED)
@@ -24,7 +24,11 @@ from manager_rest.test import base_test
 from manager_rest.storage import models
 from manager_rest.test.attribute import attr
 from manager_rest.test.base_test import BaseServerTestCase
-from manager_rest.maintenance import get_maintenance_file_path
+from manager_rest.maintenance import (clear_running_executions_check,
+                                      get_maintenance_file_path,
+                                      get_maintenance_state,
+                                      has_running_executions,
+                                      prepare_maintenance_dict)
 from manager_rest.constants import (MAINTENANCE_MODE_ACTIVATED,
                                     MAINTENANCE_MODE_ACTIVATING,
                                     MAINTENANCE_MODE_DEACTIVATED,
@@ -39,6 +43,7 @@ class MaintenanceModeTest(BaseServerTestCase):
             os.remove(get_maintenance_file_path())
         except OSError:
             pass
+        clear_running_executions_check()
 
     def test_maintenance_mode_inactive(self):
         response = self.client.maintenance_mode.status()
@@ -78,6 +83,41 @@ class MaintenanceModeTest(BaseServerTestCase):
         state = utils.read_json_file(maintenance_file)
         self.assertEqual(state['status'], MAINTENANCE_MODE_ACTIVATED)
 
+    def test_maintenance_state_cache(self):
+        self.assertIsNone(get_maintenance_state())
+        maintenance_file = get_maintenance_file_path()
+        utils.write_dict_to_json_file(
+            maintenance_file,
+            prepare_maintenance_dict(MAINTENANCE_MODE_ACTIVATING))
+        self.assertEqual(MAINTENANCE_MODE_ACTIVATING,
+                         get_maintenance_state()['status'])
+        with patch('manager_rest.utils.read_json_file') as read_mock:
+            self.assertEqual(MAINTENANCE_MODE_ACTIVATING,
+                             get_maintenance_state()['status'])
+        read_mock.assert_not_called()
+
+        # a changed file is read again
+        utils.write_dict_to_json_file(
+            maintenance_file,
+            prepare_maintenance_dict(MAINTENANCE_MODE_ACTIVATED,
+                                     activated_at='now'))
+        self.assertEqual(MAINTENANCE_MODE_ACTIVATED,
+                         get_maintenance_state()['status'])
+        os.remove(maintenance_file)
+        self.assertIsNone(get_maintenance_state())
+
+    def test_running_executions_check(self):
+        execution = self._start_maintenance_transition_mode()
+        with patch('manager_rest.maintenance.db.session') as session_mock:
+            # the previous request found the running execution
+            self.assertTrue(has_running_executions())
+        session_mock.query.assert_not_called()
+
+        self._terminate_execution(execution.id)
+        self.assertFalse(has_running_executions())
+        response = self.client.maintenance_mode.status()
+        self.assertEqual(MAINTENANCE_MODE_ACTIVATED, response.status)
+
     def test_request_denial_in_maintenance_mode(self):
         self._activate_maintenance_mode()
         self.assertRaises(exceptions.MaintenanceModeActiveError,
@@ -343,6 +343,39 @@ class ModifyTests(base_test.BaseServerTestCase):
                             in node2_instance.relationships]
         self.assertEqual(set(node1_instance_ids), set(node2_target_ids))
 
+    def test_modify_add_instance_index_and_versions(self):
+        _, _, _, deployment = self.put_deployment(
+            deployment_id='d{0}'.format(uuid.uuid4()),
+            blueprint_file_name='modify2.yaml')
+        node_instances1 = {i.id: i for i in self.client.node_instances.list(
+            deployment_id=deployment.id)}
+
+        modification = self.client.deployment_modifications.start(
+            deployment.id, nodes={'node1': {'instances': 3}})
+
+        node_instances2 = self.client.node_instances.list(
+            deployment_id=deployment.id)
+        new_instances = [i for i in node_instances2
+                         if i.id not in node_instances1]
+        self.assertEqual(1, len(new_instances))
+        self.assertEqual('node1', new_instances[0].node_id)
+        self.assertEqual(1, new_instances[0].version)
+        self.assertEqual(3, new_instances[0]['index'])
+        # only the related node instance is updated
+        for instance in node_instances2:
+            if instance.id in node_instances1:
+                expected_version = node_instances1[instance.id].version
+                if instance.node_id == 'node2':
+                    expected_version += 1
+                self.assertEqual(expected_version, instance.version)
+
+        self.client.deployment_modifications.rollback(modification.id)
+        node_instances3 = self.client.node_instances.list(
+            deployment_id=deployment.id)
+        self.assertEqual(
+            sorted(node_instances1.values(), key=lambda _i: _i.id),
+            sorted(node_instances3, key=lambda _i: _i.id))
+
     def test_modify_remove_instance(self):
         _, _, _, deployment = self.put_deployment(
             deployment_id='d{0}'.format(uuid.uuid4()),
@@ -424,3 +424,53 @@ class NodesTest(base_test.BaseServerTestCase):
                 self.assertEqual(1, len(scaling_groups))
                 self.assertDictContainsSubset({'name': 'group1'},
                                               scaling_groups[0])
+
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_patch_node_instances_batch(self):
+        for instance_id in ['ni1', 'ni2', 'ni3']:
+            put_node_instance(self.sm,
+                              instance_id=instance_id,
+                              deployment_id='111',
+                              runtime_properties={'key': 'value'})
+        # ni2 is already at version 2
+        self.client.node_instances.update('ni2', state='started', version=1)
+
+        response = self.patch('/node-instances', {'items': [
+            {'id': 'ni1', 'version': 1, 'state': 'started',
+             'runtime_properties': {'key': 'new_value'}},
+            {'id': 'ni2', 'version': 1, 'state': 'deleted'},
+            {'id': 'ni3', 'version': 1, 'runtime_properties': {'a': 'b'}},
+            {'id': 'missing', 'version': 1},
+        ]})
+        self.assertEqual(200, response.status_code)
+        results = {item['id']: item for item in response.json['items']}
+        self.assertEqual(2, results['ni1']['version'])
+        self.assertIsNone(results['ni1']['error_code'])
+        self.assertEqual(2, results['ni3']['version'])
+        self.assertEqual('conflict_error', results['ni2']['error_code'])
+        self.assertEqual(2, results['ni2']['version'])
+        self.assertEqual('not_found_error', results['missing']['error_code'])
+
+        ni1 = self.client.node_instances.get('ni1')
+        self.assertEqual('started', ni1.state)
+        self.assertEqual({'key': 'new_value'}, ni1.runtime_properties)
+        self.assertEqual({'a': 'b'},
+                         self.client.node_instances.get('ni3')
+                         .runtime_properties)
+        # the conflicting update wasn't applied
+        ni2 = self.client.node_instances.get('ni2')
+        self.assertEqual('started', ni2.state)
+
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_patch_node_instances_batch_duplicate(self):
+        put_node_instance(self.sm, instance_id='ni1', deployment_id='111')
+        response = self.patch('/node-instances', {'items': [
+            {'id': 'ni1', 'version': 1, 'state': 'a'},
+            {'id': 'ni1', 'version': 1, 'state': 'b'},
+        ]})
+        self.assertEqual(400, response.status_code)
+        response = self.patch('/node-instances', {'items': [
+            {'id': 'ni1', 'state': 'a'}]})
+        self.assertEqual(400, response.status_code)
@@ -70,6 +70,30 @@ class PaginateTest(TestCase):
                 with self.assertRaises(Invalid):
                     paginate(verify)()
 
+    def test_cursor_and_count(self):
+        """Cursor and count mode are passed through."""
+        def verify(pagination):
+            self.assertEqual(pagination['cursor'], 'abc')
+            self.assertEqual(pagination['count'], 'estimate')
+            return Mock()
+
+        with patch('manager_rest.rest.rest_decorators.request') as request:
+            request.args = {
+                '_cursor': 'abc',
+                '_count': 'estimate',
+            }
+            paginate(verify)()
+
+    def test_invalid_count(self):
+        """Exception raised when an unknown count mode is passed."""
+        def verify(pagination):
+            return Mock()
+
+        with patch('manager_rest.rest.rest_decorators.request') as request:
+            request.args = {'_count': 'approximately'}
+            with self.assertRaises(Invalid):
+                paginate(verify)()
+
 
 @attr(client_min_version=2, client_max_version=base_test.LATEST_API_VERSION)
 class RangeableTest(TestCase):
@@ -179,6 +179,24 @@ class StorageManagerTests(base_test.BaseServerTestCase):
         self.assertEqual(dep.permalink, deserialized_dep.permalink)
         self.assertEqual(dep.description, deserialized_dep.description)
 
+    def test_resource_fields_cached(self):
+        fields = models.Deployment.resource_fields
+        self.assertIs(fields, models.Deployment.resource_fields)
+        self.assertEqual(fields, models.Deployment._get_resource_fields())
+        with self.assertRaises(TypeError):
+            fields['new_field'] = None
+        # a copy can be modified freely
+        fields_copy = fields.copy()
+        fields_copy['new_field'] = None
+        self.assertNotIn('new_field', models.Deployment.resource_fields)
+
+        # overrides in subclasses are cached per class
+        self.assertIn('key', models.Secret.resource_fields)
+        self.assertNotIn('id', models.Secret.resource_fields)
+        self.assertNotIn('token', models.Execution.resource_fields)
+        self.assertNotIn('id', models.Site.response_fields)
+        self.assertIn('workflows', models.Deployment.response_fields)
+
     def test_fields_query(self):
         now = utils.get_formatted_timestamp()
         blueprint = models.Blueprint(id='blueprint-id',
@@ -13,6 +13,10 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 #
+import json
+
+from cloudify_rest_client.exceptions import CloudifyClientError
+
 from manager_rest.test.attribute import attr
 
 from manager_rest.test import base_test
@@ -40,6 +44,19 @@ class ResourceListTestCase(BaseListTest):
                 self.assertEqual(response.items,
                                  all_results[offset:offset + size])
 
+    def _test_cursor_pagination(self, list_func, total):
+        all_results = list_func(_cursor='').items
+        self.assertGreaterEqual(len(all_results), total)
+        for size in range(1, len(all_results) + 1):
+            results = []
+            cursor = ''
+            while cursor is not None:
+                response = list_func(_cursor=cursor, _size=size)
+                self.assertLessEqual(len(response.items), size)
+                results.extend(response.items)
+                cursor = response.metadata.pagination['next_cursor']
+            self.assertEqual(results, all_results)
+
     def test_deployments_list_paginated(self):
         self._put_n_deployments(id_prefix='test', number_of_deployments=4)
         self._test_pagination(self.client.deployments.list, 4,
@@ -83,3 +100,56 @@ class ResourceListTestCase(BaseListTest):
     def test_snapshots_list_paginated(self):
         self._put_n_snapshots(3)
         self._test_pagination(self.client.snapshots.list, 3)
+
+    def test_deployments_list_cursor(self):
+        self._put_n_deployments(id_prefix='test', number_of_deployments=4)
+        self._test_cursor_pagination(self.client.deployments.list, 4)
+
+    def test_node_instances_list_cursor(self):
+        self._put_n_deployments(id_prefix='test', number_of_deployments=3)
+        self._test_cursor_pagination(self.client.node_instances.list, 6)
+
+    def test_cursor_with_include(self):
+        self._put_n_deployments(id_prefix='test', number_of_deployments=3)
+        self._test_cursor_pagination(
+            lambda **kw: self.client.deployments.list(_include=['id'], **kw),
+            3)
+
+    def test_cursor_with_sort(self):
+        self._put_n_deployments(id_prefix='test', number_of_deployments=2)
+        with self.assertRaisesRegex(CloudifyClientError, '_cursor'):
+            self.client.deployments.list(_cursor='', _sort=['id'])
+
+    def test_invalid_cursor(self):
+        with self.assertRaisesRegex(CloudifyClientError, '_cursor'):
+            self.client.deployments.list(_cursor='not a cursor')
+
+    def test_count_modes(self):
+        self._put_n_deployments(id_prefix='test', number_of_deployments=3)
+        for count, expected in [('exact', 3), ('estimate', 3), ('none', None)]:
+            response = self.client.deployments.list(_count=count, _size=1)
+            self.assertEqual(response.metadata.pagination.total, expected)
+            self.assertEqual(len(response.items), 1)
+
+    def test_node_instances_list_stream(self):
+        self._put_n_deployments(id_prefix='test', number_of_deployments=3)
+        all_results = self.client.node_instances.list(_sort=['id']).items
+        response = self.client.node_instances.list(_stream='true',
+                                                   _sort=['id'])
+        self.assertEqual(response.items, all_results)
+        self.assertEqual(response.metadata.pagination.total, len(all_results))
+
+    def test_executions_list_stream_ndjson(self):
+        self._put_n_deployments(id_prefix='test', number_of_deployments=2)
+        all_results = self.client.executions.list(_sort=['id']).items
+        response = self.get('/executions', query_params={
+            '_stream': 'ndjson', '_sort': 'id', '_include': 'id,status'})
+        self.assertEqual(response.content_type, 'application/x-ndjson')
+        lines = response.data.decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line) for line in lines],
+                         [{'id': e.id, 'status': e.status}
+                          for e in all_results])
+
+    def test_invalid_stream(self):
+        with self.assertRaisesRegex(CloudifyClientError, '_stream'):
+            self.client.deployments.list(_stream='xml')
@@ -36,9 +36,10 @@ from dsl_parser.constants import HOST_AGENT_PLUGINS_TO_INSTALL
 from cloudify import logs
 from cloudify.constants import BROKER_PORT_SSL
 from cloudify.models_states import VisibilityState
-from cloudify.amqp_client import create_events_publisher, get_client
+from cloudify.amqp_client import get_client
 
 from manager_rest import constants, config, manager_exceptions
+from manager_rest.amqp_publisher import EVENT_DESTINATIONS, get_publisher_pool
 
 
 def check_allowed_endpoint(allowed_endpoints):
@@ -300,18 +301,11 @@ def remove(path):
 
 def send_event(event, message_type):
     logs.populate_base_item(event, 'cloudify_event')
-    events_publisher = create_events_publisher(
-        amqp_host=config.instance.amqp_host,
-        amqp_user=config.instance.amqp_username,
-        amqp_pass=config.instance.amqp_password,
-        amqp_port=BROKER_PORT_SSL,
-        amqp_vhost='/',
-        ssl_enabled=True,
-        ssl_cert_path=config.instance.amqp_ca_path
-    )
-
-    events_publisher.publish_message(event, message_type)
-    events_publisher.close()
+    exchange, exchange_type, routing_key = EVENT_DESTINATIONS[message_type]
+    get_publisher_pool().publish(event,
+                                 exchange=exchange,
+                                 routing_key=routing_key,
+                                 exchange_type=exchange_type)
 
 
 def is_visibility_wider(first, second):
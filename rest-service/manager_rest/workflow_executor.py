@@ -20,16 +20,10 @@ from datetime import datetime
 
 from flask_security import current_user
 
-from cloudify.amqp_client import (get_client,
-                                  SendHandler,
-                                  ScheduledExecutionHandler)
+from cloudify.constants import MGMTWORKER_QUEUE
 
-from cloudify.constants import (
-    MGMTWORKER_QUEUE,
-    BROKER_PORT_SSL
-)
-
-from manager_rest import config, utils
+from manager_rest import utils
+from manager_rest.amqp_publisher import get_publisher_pool
 from manager_rest.storage import get_storage_manager, models
 
 
@@ -46,7 +40,8 @@ def execute_workflow(name,
                      execution_creator=None,
                      scheduled_time=None,
                      resume=False,
-                     execution_token=None):
+                     execution_token=None,
+                     batch=None):
 
     execution_parameters = execution_parameters or {}
     task_name = workflow['operation']
@@ -93,7 +88,8 @@ def execute_workflow(name,
                          execution_parameters=execution_parameters,
                          context=context,
                          execution_creator=execution_creator,
-                         scheduled_time=scheduled_time)
+                         scheduled_time=scheduled_time,
+                         batch=batch)
 
 
 def execute_system_workflow(wf_id,
@@ -105,7 +101,9 @@ def execute_system_workflow(wf_id,
                             update_execution_status=True,
                             dry_run=False,
                             is_system_workflow=True,
-                            execution_creator=None):
+                            execution_creator=None,
+                            execution_token=None,
+                            batch=None):
     execution_parameters = execution_parameters or {}
     context = {
         'type': 'workflow',
@@ -117,7 +115,8 @@ def execute_system_workflow(wf_id,
         'dry_run': dry_run,
         'update_execution_status': update_execution_status,
         'is_system_workflow': is_system_workflow,
-        'execution_token': generate_execution_token(task_id),
+        'execution_token': (execution_token or
+                            generate_execution_token(task_id)),
     }
 
     if deployment:
@@ -126,47 +125,36 @@ def execute_system_workflow(wf_id,
 
     return _execute_task(execution_id=context['task_id'],
                          execution_parameters=execution_parameters,
-                         context=context, execution_creator=execution_creator)
+                         context=context, execution_creator=execution_creator,
+                         batch=batch)
 
 
 def generate_execution_token(execution_id):
     sm = get_storage_manager()
     execution = sm.get(models.Execution, execution_id)
-    execution_token = uuid.uuid4().hex
-
-    # Store the token hashed in the DB
-    execution.token = hashlib.sha256(
-        execution_token.encode('ascii')).hexdigest()
+    execution_token, execution.token = new_execution_token()
     sm.update(execution)
     return execution_token
 
 
-def _get_tenant_dict():
-    return {'name': utils.current_tenant.name}
+def new_execution_token():
+    """Return a new execution token, and its hash to store in the DB"""
+    execution_token = uuid.uuid4().hex
+    return (execution_token,
+            hashlib.sha256(execution_token.encode('ascii')).hexdigest())
 
 
-def _get_amqp_client():
-    client = get_client(
-        amqp_host=config.instance.amqp_host,
-        amqp_user=config.instance.amqp_username,
-        amqp_pass=config.instance.amqp_password,
-        amqp_port=BROKER_PORT_SSL,
-        amqp_vhost='/',
-        ssl_enabled=True,
-        ssl_cert_path=config.instance.amqp_ca_path
-    )
-    return client
+def _get_tenant_dict():
+    return {'name': utils.current_tenant.name}
 
 
 def _send_mgmtworker_task(message, exchange=MGMTWORKER_QUEUE,
                           exchange_type='direct', routing_key='workflow'):
     """Send a message to the mgmtworker exchange"""
-    client = _get_amqp_client()
-    send_handler = SendHandler(exchange, exchange_type,
-                               routing_key=routing_key)
-    client.add_handler(send_handler)
-    with client:
-        send_handler.publish(message)
+    get_publisher_pool().publish(message,
+                                 exchange=exchange,
+                                 routing_key=routing_key,
+                                 exchange_type=exchange_type)
 
 
 def _send_task_to_dlx(message, message_ttl, routing_key='workflow'):
@@ -183,27 +171,50 @@ def _send_task_to_dlx(message, message_ttl, routing_key='workflow'):
     3. When ttl is passed the task will automatically be sent to the
         MGMTWORKER queue and will be executed normally.
     """
-    dlx_exchange = message['dlx_id']
-    dlx_routing_key = message['dlx_id'] + '_queue'
+    get_publisher_pool().publish_delayed(message,
+                                         exchange=message['dlx_id'],
+                                         ttl=message_ttl,
+                                         target_exchange=MGMTWORKER_QUEUE,
+                                         target_routing_key=routing_key)
 
-    client = _get_amqp_client()
-    send_handler = ScheduledExecutionHandler(exchange=dlx_exchange,
-                                             exchange_type='direct',
-                                             routing_key=dlx_routing_key,
-                                             target_exchange=MGMTWORKER_QUEUE,
-                                             target_routing_key=routing_key,
-                                             ttl=message_ttl)
-    client.add_handler(send_handler)
-    with client:
-        send_handler.publish(message)
 
+class TaskBatch(object):
+    """Workflow tasks, to be sent to the mgmtworker together.
 
-def _execute_task(execution_id, execution_parameters,
-                  context, execution_creator, scheduled_time=None):
+    Pass a batch to `execute_workflow` or `execute_system_workflow` to add
+    the task to it, instead of sending it right away, and then call `send`
+    to send all of the tasks over a single broker connection. The managers'
+    addresses are only looked up once for the whole batch.
+    """
+    def __init__(self):
+        self.messages = []
+        self._rest_host = None
+
+    @property
+    def rest_host(self):
+        if self._rest_host is None:
+            self._rest_host = _get_rest_host()
+        return self._rest_host
+
+    def send(self, routing_key='workflow'):
+        if self.messages:
+            get_publisher_pool().publish_many(self.messages,
+                                              exchange=MGMTWORKER_QUEUE,
+                                              routing_key=routing_key)
+        self.messages = []
+
+
+def _get_rest_host():
     # Get the host ip info and return them
     sm = get_storage_manager()
     managers = sm.list(models.Manager)
-    context['rest_host'] = [manager.private_ip for manager in managers]
+    return [manager.private_ip for manager in managers]
+
+
+def _execute_task(execution_id, execution_parameters,
+                  context, execution_creator, scheduled_time=None,
+                  batch=None):
+    context['rest_host'] = batch.rest_host if batch else _get_rest_host()
     context['rest_token'] = execution_creator.get_auth_token()
     context['tenant'] = _get_tenant_dict()
     context['task_target'] = MGMTWORKER_QUEUE
@@ -219,6 +230,9 @@ def _execute_task(execution_id, execution_parameters,
         message['dlx_id'] = execution_id
         _send_task_to_dlx(message, message_ttl)
         return
+    if batch is not None:
+        batch.messages.append(message)
+        return
     _send_mgmtworker_task(message)
 
 
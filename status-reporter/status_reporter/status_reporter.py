@@ -60,6 +60,10 @@ class InitializationError(Exception):
 
 
 CA_DEFAULT_PATH = '/etc/cloudify/ssl/status_reporter_cert.pem'
+# Seconds between fetching the managers list from the manager
+MANAGERS_REFRESH_INTERVAL = 60
+# Seconds between full reports, when delta reports are enabled
+FULL_REPORT_INTERVAL = 60
 
 
 class Reporter(object):
@@ -100,7 +104,21 @@ class Reporter(object):
 
         self._current_reporting_freq = self._config.get('reporting_freq')
         self._request_timeout = self._config.get('request_timeout')
+        self._managers_refresh_interval = self._config.get(
+            'managers_refresh_interval', MANAGERS_REFRESH_INTERVAL)
+        self._delta_reports = self._config.get('delta_reports', False)
+        self._full_report_interval = self._config.get(
+            'full_report_interval', FULL_REPORT_INTERVAL)
         self._node_type = node_type
+        # The clients are kept between reports, so that their connections
+        # are reused instead of having a new one (with a TLS handshake)
+        # for every report
+        self._clients = {}
+        self._last_managers_refresh = 0
+        # The services of the last report that was sent, when delta reports
+        # are enabled, and when the last full report was sent
+        self._last_services = None
+        self._last_full_report = 0
         if issues:
             raise InitializationError('Failed initialization of status '
                                       'reporter due to:\n {issues}'.
@@ -119,18 +137,56 @@ class Reporter(object):
                            'services': services}
                 }
 
+    def _build_delta_report(self, status, services):
+        """Build a report of only the services that changed.
+
+        The manager merges a delta report into the last report of the node,
+        so a full report is sent first, once in a while, and whenever the
+        delta can't describe the change (a service that was removed).
+        """
+        if (not self._delta_reports
+                or self._last_services is None
+                or set(services) != set(self._last_services)
+                or time.time() - self._last_full_report >=
+                self._full_report_interval):
+            return self._build_report(status, services), False
+
+        changed_services = {
+            name: service for name, service in services.items()
+            if self._last_services[name] != service
+        }
+        report = self._build_report(status, changed_services)
+        report['delta'] = True
+        return report, True
+
     def _update_managers_ips_list(self, client):
+        if (time.time() - self._last_managers_refresh <
+                self._managers_refresh_interval):
+            return
         try:
             response = client.manager.get_managers()
-            self._managers_ips = [manager.get('private_ip') for manager in
-                                  response]
+        except Exception as e:
+            logger.error('Failed updating the managers ips list with the '
+                         'following: {0}'.format(e))
+            return
+        self._last_managers_refresh = time.time()
+
+        managers_ips = [manager.get('private_ip') for manager in response]
+        if set(managers_ips) == set(self._managers_ips):
+            return
+        logger.info('The managers ips changed to: {0}'.format(
+            ', '.join(managers_ips)))
+        self._managers_ips = managers_ips
+        for host in list(self._clients):
+            if host not in managers_ips:
+                del self._clients[host]
+        try:
             update_yaml_file(CONFIGURATION_PATH, {
                 'managers_ips': self._managers_ips
             })
         except Exception as e:
             logger.error('Failed updating the managers ips list with the '
                          'following: {0}'.format(e))
-            return
 
     def _report_status(self, client, report):
         client.cluster_status.report_node_status(self._node_type,
@@ -139,6 +195,11 @@ class Reporter(object):
         return True
 
     def _get_cloudify_http_client(self, host):
+        if host not in self._clients:
+            self._clients[host] = self._create_cloudify_http_client(host)
+        return self._clients[host]
+
+    def _create_cloudify_http_client(self, host):
         if self._ca_cert_valid:
             return CloudifyClient(host=host,
                                   username=self._cloudify_user_name,
@@ -186,7 +247,7 @@ class Reporter(object):
         if not self._validate_status_format(status, services):
             return
 
-        report = self._build_report(status, services)
+        report, is_delta = self._build_delta_report(status, services)
 
         # If there is a malfunctioning manager,
         # let's try to avoid using the same manager always.
@@ -201,12 +262,21 @@ class Reporter(object):
                     json.dumps(report, indent=1)))
                 break
             except Exception as e:
+                # don't reuse a client that might have a broken connection
+                self._clients.pop(manager_ip, None)
                 logger.debug('Error had occurred while trying to report '
                              'status: {0}'
                              .format(e))
         if reporting_result:
+            if self._delta_reports:
+                self._last_services = services
+                if not is_delta:
+                    self._last_full_report = time.time()
             self._update_managers_ips_list(client)
         else:
+            # a delta report is rejected when the manager doesn't have the
+            # previous report of the node, so send a full report next
+            self._last_services = None
             logger.error('Could not find an active manager to '
                          'report the current status,'
                          ' tried %s', ','.join(self._managers_ips))
@@ -0,0 +1,55 @@
+#########
+# Copyright (c) 2020 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import json
+import subprocess
+
+from cloudify.decorators import workflow
+from cloudify.exceptions import NonRecoverableError
+
+from .snapshots.constants import MANAGER_PYTHON
+
+
+@workflow(system_wide=True)
+def delete(ctx, deployment_id, include_logs=False, store_before=False,
+           range_filters=None, **_):
+    """Delete the events, and optionally the logs, of a deployment.
+
+    The events are deleted in batches by manager_rest.events_deletion,
+    run with the manager's python; every line that it prints, about its
+    progress or about a failure, is logged.
+    """
+    parameters = {
+        'deployment_id': deployment_id,
+        'tenant_name': ctx.tenant_name,
+        'include_logs': include_logs,
+        'store_before': store_before,
+        'range_filters': range_filters or {},
+    }
+    command = [MANAGER_PYTHON, '-m', 'manager_rest.events_deletion',
+               json.dumps(parameters)]
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT)
+    try:
+        for line in iter(proc.stdout.readline, b''):
+            ctx.logger.info(line.decode('utf-8', 'replace').rstrip())
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+    if proc.returncode != 0:
+        raise NonRecoverableError(
+            'Failed deleting the events of deployment {0}'
+            .format(deployment_id))
@@ -59,10 +59,20 @@ class Postgres(object):
                        'licenses']
     _CONFIG_TABLES = ['config', 'rabbitmq_brokers', 'certificates', 'managers',
                       'db_nodes']
-    _TABLES_TO_EXCLUDE_ON_DUMP = _TABLES_TO_KEEP + ['snapshots'] + \
-        _CONFIG_TABLES
+    # status reports are sent every few seconds, there's no point in
+    # restoring the ones of the snapshot's manager
+    _TABLES_TO_EXCLUDE_ON_DUMP = _TABLES_TO_KEEP + \
+        ['snapshots', 'status_reports'] + _CONFIG_TABLES
     _TABLES_TO_RESTORE = ['users', 'tenants']
     _STAGE_TABLES_TO_EXCLUDE = ['"SequelizeMeta"']
+    # events and logs are stored in partitions: tables inheriting from them
+    _PARTITIONED_TABLES = ['events', 'logs']
+    _PARTITIONS_QUERY = """
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = CAST(%s AS regclass)
+    """
     _COMPOSER_TABLES_TO_EXCLUDE = ['"SequelizeMeta"']
 
     def __init__(self, config):
@@ -107,18 +117,24 @@ class Postgres(object):
                         .format(include_logs, include_events))
         destination_path = os.path.join(tempdir, self._POSTGRES_DUMP_FILENAME)
         admin_dump_path = os.path.join(tempdir, ADMIN_DUMP_FILE)
+        partitioned_tables = list(self._PARTITIONED_TABLES)
         try:
             if not include_logs:
                 self._TABLES_TO_EXCLUDE_ON_DUMP = \
-                    self._TABLES_TO_EXCLUDE_ON_DUMP + ['logs']
+                    self._TABLES_TO_EXCLUDE_ON_DUMP + ['logs', 'logs_[0-9]*']
+                partitioned_tables.remove('logs')
             if not include_events:
                 self._TABLES_TO_EXCLUDE_ON_DUMP = \
-                    self._TABLES_TO_EXCLUDE_ON_DUMP + ['events']
+                    self._TABLES_TO_EXCLUDE_ON_DUMP + ['events',
+                                                       'events_[0-9]*']
+                partitioned_tables.remove('events')
             self._dump_to_file(
                 destination_path,
                 self._db_name,
                 exclude_tables=self._TABLES_TO_EXCLUDE_ON_DUMP
             )
+            self._prepend_create_partitions(destination_path,
+                                            partitioned_tables)
             self._dump_admin_user_to_file(
                 admin_dump_path,
                 self._db_name,
@@ -184,6 +200,25 @@ class Postgres(object):
         # Will either be an empty list, or a list with 1 in it
         return bool(response['all'])
 
+    def _prepend_create_partitions(self, dump_file, tables):
+        """Make the restore create the partitions before their data is copied
+
+        The dump only has the data, so the partitions are recreated using
+        the get_events_partition database function.
+        """
+        queries = []
+        for table in tables:
+            partitions = self.run_query(self._PARTITIONS_QUERY, (table, ))
+            for partition, in partitions['all'] or []:
+                queries.append(
+                    "SELECT get_events_partition('{0}', '{1}');"
+                    .format(table, partition[len(table) + 1:]))
+        if not queries:
+            return
+        new_dump_file = self._prepend_dump(dump_file, queries)
+        os.remove('{0}.pre'.format(dump_file))
+        os.rename(new_dump_file, dump_file)
+
     def _append_delete_current_execution(self, dump_file):
         """Append to the dump file a query that deletes the current execution
         """